@@ -0,0 +1,65 @@
+"""
+Microbenchmark: get_listening_ports via /proc/net/tcp{,6} versus the old `ss -tulpen` path.
+
+Opens many listening sockets so the socket tables are large, then times both readers:
+
+    python -m benchmarks.bench_listening_ports --sockets 4000 --repeat 20
+"""
+import argparse
+import resource
+import socket
+import time
+
+from vllmctl.core.vllm_probe import get_listening_ports, get_listening_ports_ss
+from vllmctl.core.proc_net import read_listening_sockets
+
+
+def open_listeners(count):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, count + 256)
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+        count = min(count, wanted - 256)
+    socks = []
+    for i in range(count):
+        family, addr = (socket.AF_INET6, "::1") if i % 4 == 3 else (socket.AF_INET, "127.0.0.1")
+        s = socket.socket(family, socket.SOCK_STREAM)
+        s.bind((addr, 0))
+        s.listen(1)
+        socks.append(s)
+    return socks
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    total = 0.0
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        dt = time.perf_counter() - t
+        best = min(best, dt)
+        total += dt
+    return best, total / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    socks = open_listeners(args.sockets)
+    print(f"listening sockets opened: {len(socks)}")
+    rows = [
+        ("proc (get_listening_ports)", get_listening_ports),
+        ("proc + pids", lambda: read_listening_sockets(with_pids=True)),
+        ("ss -tulpen (old path)", get_listening_ports_ss),
+    ]
+    for name, fn in rows:
+        best, mean, result = timeit(fn, args.repeat)
+        print(f"{name:28s} best {best * 1000:8.2f} ms  mean {mean * 1000:8.2f} ms  entries {len(result)}")
+    for s in socks:
+        s.close()
+
+
+if __name__ == "__main__":
+    main()
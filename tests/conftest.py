@@ -0,0 +1,91 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_state_dir(tmp_path, monkeypatch):
+    # Keep the endpoint registry and other local state out of the real home directory.
+    monkeypatch.setenv("VLLMCTL_STATE_DIR", str(tmp_path / "state"))
+
+
+PROC_NET_TCP = """  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+   0: 0100007F:1F40 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 1111 1 0000000000000000 100 0 0 10 0
+   1: 00000000:3EE4 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 2222 1 0000000000000000 100 0 0 10 0
+   2: 0100007F:1F40 0100007F:C350 01 00000000:00000000 00:00000000 00000000  1000        0 3333 1 0000000000000000 100 0 0 10 0
+   3: 0501A8C0:0016 00000000:0000 0A 00000000:00000000 00:00000000 00000000     0        0 4444 1 0000000000000000 100 0 0 10 0
+"""
+
+PROC_NET_TCP6 = """  sl  local_address                         remote_address                        st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+   0: 00000000000000000000000001000000:3EE5 00000000000000000000000000000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 5555 1 0000000000000000 100 0 0 10 0
+   1: 00000000000000000000000000000000:3EE6 00000000000000000000000000000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 6666 1 0000000000000000 100 0 0 10 0
+"""
+
+
+@pytest.fixture
+def proc_tables(tmp_path):
+    """Paths of a sample /proc/net/tcp and tcp6 with a mix of LISTEN and other sockets."""
+    tcp, tcp6 = tmp_path / "tcp", tmp_path / "tcp6"
+    tcp.write_text(PROC_NET_TCP)
+    tcp6.write_text(PROC_NET_TCP6)
+    return str(tcp), str(tcp6)
+
+
+def _start_backend(name, waiting=0.0):
+    """A stand-in vLLM server: /v1/models, /metrics and (streaming) completions."""
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, body, ctype="application/json"):
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(f"vllm:num_requests_waiting{{model_name=\"m\"}} {waiting}\n".encode(), "text/plain")
+            else:
+                self._send(json.dumps({"data": [{"id": "m"}]}).encode())
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            hits.append(req)
+            if not req.get("stream"):
+                return self._send(json.dumps({"backend": name}).encode())
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for piece in (f"data: {name}-1\n\n", f"data: {name}-2\n\n", "data: [DONE]\n\n"):
+                data = piece.encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, hits
+
+
+@pytest.fixture
+def make_backend():
+    """Factory for stand-in vLLM servers (see _start_backend); all are shut down after the test."""
+    servers = []
+
+    def make(name, waiting=0.0):
+        srv, hits = _start_backend(name, waiting)
+        servers.append(srv)
+        return srv, hits
+
+    yield make
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
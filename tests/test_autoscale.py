@@ -0,0 +1,172 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from vllmctl.core.autoscale import Autoscaler, AutoscalePolicy, place_replica
+from vllmctl.core.gateway import Replica
+from vllmctl.core.metrics import scrape_metrics
+from vllmctl.core.placement import parse_gpu_query
+
+
+class FakeFleet:
+    """Replicas of one model, each a local /metrics endpoint whose queue the test sets."""
+
+    def __init__(self):
+        self.servers = {}
+        self.load = {}
+        self.launched = 0
+        self.retired = []
+
+    def add(self, host="gpu"):
+        load = self.load
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                port = self.server.server_address[1]
+                running, waiting = load[port]
+                body = (f'vllm:num_requests_running{{model_name="m"}} {running}\n'
+                        f'vllm:num_requests_waiting{{model_name="m"}} {waiting}\n').encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        port = srv.server_address[1]
+        self.servers[port] = (srv, host)
+        self.load[port] = (0, 0)
+        return port
+
+    def launch(self):
+        self.launched += 1
+        return self.add(f"gpu{self.launched}")
+
+    def retire(self, port):
+        srv, _ = self.servers.pop(port)
+        srv.shutdown()
+        srv.server_close()
+        self.retired.append(port)
+        return True
+
+    def set_load(self, running, waiting):
+        for port in self.servers:
+            self.load[port] = (running, waiting)
+
+    def discover(self):
+        return [Replica(port=p, model="m", host=h) for p, (_, h) in self.servers.items()]
+
+    def close(self):
+        for port in list(self.servers):
+            self.retire(port)
+
+
+@pytest.fixture
+def fleet():
+    f = FakeFleet()
+    yield f
+    f.close()
+
+
+def make_scaler(fleet, now, **policy):
+    defaults = dict(min_replicas=1, max_replicas=3, scale_up_waiting=4, scale_down_waiting=0.5, smoothing=0.5,
+                    idle_after=60, up_cooldown=30, down_cooldown=120)
+    defaults.update(policy)
+    return Autoscaler(
+        "m", AutoscalePolicy(**defaults), fleet.launch, fleet.retire,
+        discover=fleet.discover, scrape=lambda port: scrape_metrics(port, timeout=2), clock=lambda: now[0]
+    )
+
+
+def run_for(scaler, now, seconds, step=5):
+    actions = []
+    end = now[0] + seconds
+    while now[0] < end:
+        decision = scaler.step()
+        scaler.join()
+        if decision.action != "hold":
+            actions.append(decision.action)
+        now[0] += step
+    return actions
+
+
+def test_fills_minimum_then_scales_up_on_queue_with_cooldown(fleet):
+    now = [0.0]
+    scaler = make_scaler(fleet, now, min_replicas=2)
+    assert run_for(scaler, now, 10) == ["up", "up"]
+    assert len(fleet.servers) == 2
+
+    fleet.set_load(8, 10)
+    # one scale-up per cooldown, capped at max
+    actions = run_for(scaler, now, 60)
+    assert actions == ["up"]
+    assert len(fleet.servers) == 3
+    fleet.set_load(8, 10)
+    assert run_for(scaler, now, 60) == []
+    assert scaler.decide(now[0]).reason.endswith("already at maximum")
+
+
+def test_short_spike_is_smoothed_away(fleet):
+    now = [0.0]
+    fleet.add()
+    scaler = make_scaler(fleet, now, smoothing=0.2)
+    run_for(scaler, now, 20)
+    fleet.set_load(2, 12)  # one sample above the threshold
+    assert run_for(scaler, now, 5) == []
+    fleet.set_load(0, 0)
+    assert run_for(scaler, now, 20) == []
+
+
+def test_hysteresis_band_and_scale_down_of_idle_replicas(fleet):
+    now = [0.0]
+    for _ in range(3):
+        fleet.add()
+    scaler = make_scaler(fleet, now)
+    # a moderate queue sits between the thresholds: nothing happens
+    fleet.set_load(4, 2)
+    assert run_for(scaler, now, 300) == []
+    fleet.set_load(0, 0)
+    actions = run_for(scaler, now, 600)
+    assert actions == ["down", "down"]
+    assert len(fleet.servers) == 1  # never below the minimum
+    # down_cooldown kept the two removals apart
+    downs = [e.time for e in scaler.events if e.decision.action == "down"]
+    assert downs[1] - downs[0] >= 120
+
+
+def test_busy_and_external_replicas_are_not_removed(fleet):
+    now = [0.0]
+    busy, idle, external = fleet.add(), fleet.add(), fleet.add()
+    fleet.load[busy] = (1, 0)
+    scaler = make_scaler(fleet, now, down_cooldown=0)
+    scaler.managed = lambda port: port != external
+    run_for(scaler, now, 300)
+    assert fleet.retired == [idle]
+
+
+def test_dry_run_reports_without_acting(fleet):
+    now = [0.0]
+    fleet.add()
+    scaler = make_scaler(fleet, now)
+    scaler.dry_run = True
+    fleet.set_load(8, 20)
+    actions = run_for(scaler, now, 60)
+    assert actions == ["up", "up"]  # repeated once per cooldown, as nothing changes
+    assert fleet.launched == 0 and len(fleet.servers) == 1
+    assert all(e.result == "dry run" for e in scaler.events)
+
+
+def test_policy_rejects_inverted_thresholds():
+    with pytest.raises(ValueError):
+        AutoscalePolicy(scale_up_waiting=1, scale_down_waiting=2).validate()
+
+
+def test_place_replica_picks_feasible_host():
+    out = {
+        "full": "0, 90, 70000, 81920\n__vllm__\n1\n",
+        "free": "0, 0, 500, 81920\n1, 0, 500, 81920\n__vllm__\n0\n",
+    }
+    placement = place_replica(["full", "free"], ["--tensor-parallel-size", "2"], query=lambda h, timeout: parse_gpu_query(h, out[h]))
+    assert placement.host == "free" and placement.gpus == [0, 1]
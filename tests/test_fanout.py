@@ -0,0 +1,43 @@
+import time
+from vllmctl.core.fanout import fan_out
+
+
+def test_fan_out_runs_hosts_concurrently():
+    delays = {f"h{i}": 0.2 for i in range(10)}
+    start = time.monotonic()
+    results = list(fan_out(delays, lambda host, t: time.sleep(delays[host]) or host, max_workers=10))
+    elapsed = time.monotonic() - start
+    assert sorted(r.value for r in results) == sorted(delays)
+    assert all(r.ok for r in results)
+    assert elapsed < 1.0
+
+
+def test_fan_out_streams_fast_hosts_first():
+    delays = {"slow": 0.5, "fast": 0.0}
+    order = [r.host for r in fan_out(delays, lambda host, t: time.sleep(delays[host]))]
+    assert order == ["fast", "slow"]
+
+
+def test_fan_out_reports_errors_and_host_timeouts(monkeypatch):
+    monkeypatch.setattr("vllmctl.core.fanout.HOST_GRACE", 0.0)
+
+    def probe(host, timeout):
+        if host == "broken":
+            raise RuntimeError("boom")
+        if host == "hung":
+            time.sleep(1.0)
+        return "up"
+
+    start = time.monotonic()
+    results = {r.host: r for r in fan_out(["ok", "broken", "hung"], probe, host_timeout=0.2)}
+    assert time.monotonic() - start < 0.8
+    assert results["ok"].value == "up"
+    assert results["broken"].error == "boom"
+    assert results["hung"].timed_out
+
+
+def test_fan_out_global_deadline_covers_queued_hosts():
+    hosts = ["a", "b", "c", "d"]
+    results = list(fan_out(hosts, lambda host, t: time.sleep(0.5), max_workers=1, host_timeout=5, deadline=0.2))
+    assert len(results) == 4
+    assert all(r.timed_out for r in results)
@@ -42,4 +42,91 @@ def test_forwardsession_both_dead():
     with patch('vllmctl.core.forward.run_ssh_command', mock_run_ssh_command_dead), \
          patch('vllmctl.core.forward.ping_vllm', mock_ping_vllm_dead):
         assert s.check_alive() is False
-        assert s.reason == "No tmux session on remote" 
\ No newline at end of file
+        assert s.reason == "No tmux session on remote" 
+
+
+def test_get_tmux_ports_batches_tmux_and_psutil(monkeypatch):
+    import subprocess
+    from vllmctl.core.forward import get_tmux_ports
+    from vllmctl.core.instrument import call_counts, reset_call_counts
+
+    sessions = {f"vllmctl_host{i}_8000_{16100 + i}": 1000 + i for i in range(50)}
+    panes_out = "".join(f"{name}\t{pid}\n" for name, pid in sessions.items()) + "work\t1\n"
+    monkeypatch.setattr(subprocess, "run", lambda cmd, *a, **kw: type("R", (), {"stdout": panes_out, "stderr": "", "returncode": 0})())
+
+    class Proc:
+        def __init__(self, **info):
+            self.info = info
+
+    procs = [Proc(pid=1, ppid=0, name="bash", cmdline=["bash"], create_time=0.0)]
+    for i, (name, pane_pid) in enumerate(sessions.items()):
+        procs.append(Proc(pid=pane_pid, ppid=1, name="sh", cmdline=["sh"], create_time=0.0))
+        procs.append(Proc(pid=5000 + i, ppid=pane_pid, name="ssh",
+                          cmdline=["ssh", "-N", "-L", f"{16100 + i}:localhost:8000", f"host{i}"], create_time=0.0))
+    iterations = []
+    monkeypatch.setattr("psutil.process_iter", lambda attrs=None: iterations.append(1) or iter(procs))
+
+    reset_call_counts()
+    ports = get_tmux_ports()
+    assert call_counts() == {"subprocess": 1}
+    assert len(iterations) == 1
+    assert len(ports) == 50
+    assert ports[16107] == {"session": "vllmctl_host7_8000_16107", "remote_port": 8000,
+                            "ssh_cmd": "ssh -N -L 16107:localhost:8000 host7"}
+
+
+def test_wait_for_tunnel_returns_on_listen_or_exit(tmp_path):
+    import os
+    import socket
+    import subprocess
+    from vllmctl.core.forward import wait_for_tunnel
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    port = server.getsockname()[1]
+    assert wait_for_tunnel(port, os.getpid(), timeout=5).status == "up"
+    server.close()
+    # ssh already gone: the captured stderr is reported instead of waiting out the timeout
+    err = tmp_path / "ssh.err"
+    err.write_text("bind [127.0.0.1]:16100: Address already in use\nExiting\n")
+    dead = subprocess.Popen(["true"])
+    dead.wait()
+    result = wait_for_tunnel(port, dead.pid, timeout=30, error_file=str(err))
+    assert (result.status, result.error) == ("failed", "Exiting")
+
+
+def test_create_forwards_runs_concurrently(monkeypatch):
+    import threading
+    from vllmctl.core import forward
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_create(host, remote_port, local_port, mux=False):
+        barrier.wait()  # only passes if all three tunnels are being created at once
+        return forward.TunnelResult("up", local_port)
+
+    monkeypatch.setattr(forward, "create_forward", fake_create)
+    results = forward.create_forwards([("gpu1", 8000, 16100), ("gpu2", 8000, 16101), ("gpu3", 8000, 16102)])
+    assert [r.local_port for r in results] == [16100, 16101, 16102]
+
+
+def test_timed_out_tunnel_is_killed_and_not_registered(monkeypatch):
+    import os
+    import socket
+    import subprocess
+    from vllmctl.core import forward
+    from vllmctl.core.registry import get_registry
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]  # nothing listens on it once closed
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        # the pane (this process) stays alive, as ssh does while it is still connecting
+        return subprocess.CompletedProcess(cmd, 0, f"{os.getpid()}\n", "")
+
+    monkeypatch.setattr(forward, "run_command", fake_run)
+    result = forward.create_tmux_ssh_forward(None, "gpu1", 8000, port, timeout=0.2)
+    assert result.status == "timeout" and not result.ok
+    assert ["tmux", "kill-session", "-t", f"vllmctl_gpu1_8000_{port}"] in calls
+    assert get_registry().get(port) is None
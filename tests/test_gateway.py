@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import requests
+from vllmctl.core.gateway import Gateway, Replica, ReplicaPool
+from vllmctl.core.metrics import parse_prometheus
+
+
+@pytest.fixture
+def backends(make_backend):
+    return [make_backend("a"), make_backend("b")]
+
+
+def start_gateway(backends, **kw):
+    pool = ReplicaPool(**kw)
+    pool.update([Replica(port=srv.server_address[1], model="m") for srv, _ in backends])
+    gw = Gateway(pool, port=0, health_interval=3600)
+    gw.start()
+    return gw, f"http://127.0.0.1:{gw.port}"
+
+
+def test_parse_prometheus_sums_labelled_samples():
+    text = '# HELP x\nvllm:num_requests_waiting{model_name="a b"} 3.0\nvllm:num_requests_waiting{model_name="c"} 2\nvllm:x 1 1700000000\n'
+    assert parse_prometheus(text) == {"vllm:num_requests_waiting": 5.0, "vllm:x": 1.0}
+
+
+def test_gateway_balances_and_streams(backends):
+    gw, url = start_gateway(backends)
+    try:
+        assert [m["id"] for m in requests.get(f"{url}/v1/models").json()["data"]] == ["m"]
+        seen = {requests.post(f"{url}/v1/completions", json={"model": "m", "prompt": "hi"}).json()["backend"] for _ in range(20)}
+        assert seen == {"a", "b"}
+        with requests.post(f"{url}/v1/chat/completions", json={"model": "m", "stream": True}, stream=True) as r:
+            body = b"".join(r.iter_content(chunk_size=None)).decode()
+        assert body.count("data:") == 3 and body.endswith("data: [DONE]\n\n")
+        assert requests.post(f"{url}/v1/completions", json={"model": "other"}).status_code == 404
+    finally:
+        gw.stop()
+
+
+def test_gateway_counts_concurrent_requests(backends):
+    gw, url = start_gateway(backends)
+    try:
+        post = lambda _: requests.post(f"{url}/v1/completions", json={"model": "m", "prompt": "hi"}).status_code
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert set(executor.map(post, range(40))) == {200}
+        assert (gw.requests, gw.retries) == (40, 0)
+    finally:
+        gw.stop()
+
+
+def test_gateway_prefers_shorter_queue_and_ejects_dead_replica(backends, make_backend):
+    busy, _ = make_backend("busy", waiting=50)
+    pool = ReplicaPool(max_failures=1)
+    pool.update([Replica(port=busy.server_address[1], model="m"), Replica(port=backends[0][0].server_address[1], model="m")])
+    gw = Gateway(pool, port=0, health_interval=3600)
+    gw.start()
+    try:
+        url = f"http://127.0.0.1:{gw.port}"
+        assert {requests.post(f"{url}/v1/completions", json={"model": "m"}).json()["backend"] for _ in range(5)} == {"a"}
+        backends[0][0].shutdown()
+        backends[0][0].server_close()
+        gw.http.close()
+        # the dead replica fails over to the busy one and is ejected
+        assert requests.post(f"{url}/v1/completions", json={"model": "m"}).json()["backend"] == "busy"
+        states = {r.port: r.healthy for r in pool.snapshot()}
+        assert states[backends[0][0].server_address[1]] is False
+    finally:
+        gw.stop()
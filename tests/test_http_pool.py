@@ -0,0 +1,47 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from vllmctl.core.http_pool import HTTPSessionPool
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"vllm:num_requests_waiting 3.0\n"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def port():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv.server_address[1]
+    srv.shutdown()
+
+
+def test_pool_reuses_connection(port):
+    pool = HTTPSessionPool()
+    for _ in range(5):
+        assert pool.get(port, "/metrics", timeout=1).status_code == 200
+    assert pool.port_stats(port) == {"requests": 5, "connections": 1, "reused": 4}
+
+
+def test_pool_bounds_number_of_ports(port):
+    pool = HTTPSessionPool(max_ports=2)
+    for p in (port, port + 1, port + 2):
+        pool.session(p)
+    assert pool.stats()["ports"] == 2
+
+
+def test_pool_counts_errors():
+    pool = HTTPSessionPool()
+    with pytest.raises(Exception):
+        pool.get(1, "/v1/models", timeout=0.2)
+    assert pool.stats()["errors"] == 1
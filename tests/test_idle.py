@@ -0,0 +1,80 @@
+import requests
+from vllmctl.core.idle import IdleTracker, ScaleToZero, request_target
+
+
+def test_idle_tracker_counts_counter_moves_and_in_flight():
+    tracker = IdleTracker(idle_after=60, now=0)
+    assert tracker.observe({"vllm:request_success_total": 5.0}, now=10) is False
+    assert tracker.observe({"vllm:request_success_total": 6.0}, now=20) is True
+    assert tracker.observe({"vllm:request_success_total": 6.0, "vllm:num_requests_running": 1.0}, now=50) is True
+    assert tracker.observe(None, now=200) is False  # an unanswered scrape is no evidence either way
+    assert tracker.observe({"vllm:request_success_total": 6.0}, now=100) is False
+    assert tracker.is_idle(110) and not tracker.is_idle(109)
+    tracker.reset(120)
+    assert tracker.observe({"vllm:request_success_total": 0.0}, now=130) is False
+    assert not tracker.is_idle(130)
+
+
+def test_request_target():
+    assert request_target(b"GET /v1/models?x=1 HTTP/1.1\r\nHost: a\r\n\r\n") == ("GET", "/v1/models")
+    assert request_target(b"\r\n") == (None, None)
+
+
+def test_scale_to_zero_stops_when_idle_and_wakes_on_request(make_backend):
+    srv, hits = make_backend("a")
+    now = [0.0]
+    calls = []
+
+    def start():
+        calls.append("start")
+        return True
+
+    def stop():
+        calls.append("stop")
+        return True
+
+    listener = ScaleToZero(
+        0, srv.server_address[1], "m", start, stop, idle_after=60,
+        scrape=lambda port: {"vllm:request_success_total": 3.0}, ping=lambda port: {"data": [{"id": "m", "max_model_len": 4096}]},
+        clock=lambda: now[0],
+    )
+    listener.start()
+    base = f"http://127.0.0.1:{listener.port}"
+    try:
+        assert listener.check() is False
+        # relayed to the running server
+        assert requests.post(f"{base}/v1/completions", json={"model": "m"}, timeout=5).json() == {"backend": "a"}
+        now[0] = 61
+        assert listener.check() is True
+        assert calls == ["stop"] and not listener.awake
+
+        # discovery does not wake it and sees the card saved before stopping
+        models = requests.get(f"{base}/v1/models", timeout=5).json()
+        assert models["data"][0]["max_model_len"] == 4096
+        assert requests.get(f"{base}/metrics", timeout=5).text == ""
+        assert calls == ["stop"]
+
+        # a real request does, and is answered once the server is back
+        assert requests.post(f"{base}/v1/completions", json={"model": "m"}, timeout=5).json() == {"backend": "a"}
+        assert calls == ["stop", "start"] and listener.awake and listener.wakeups == 1
+        assert len(hits) == 2
+        assert listener.check() is False  # the idle timer restarted with the server
+    finally:
+        listener.close()
+
+
+def test_failed_wakeup_answers_503_and_stays_stopped(make_backend):
+    srv, hits = make_backend("a")
+    listener = ScaleToZero(
+        0, srv.server_address[1], "m", lambda: False, lambda: True, idle_after=0,
+        scrape=lambda port: {}, ping=lambda port: None,
+    )
+    listener.start()
+    try:
+        assert listener.check() is True
+        resp = requests.post(f"http://127.0.0.1:{listener.port}/v1/completions", json={"model": "m"}, timeout=5)
+        assert resp.status_code == 503
+        assert not listener.awake and listener.failed_wakeups == 1 and hits == []
+        assert requests.get(f"http://127.0.0.1:{listener.port}/v1/models", timeout=5).json()["data"][0]["id"] == "m"
+    finally:
+        listener.close()
@@ -0,0 +1,52 @@
+from vllmctl.core.launch_timing import ENV_READY_MARKER, LaunchTimeline, append_history, load_history, waterfall_table
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timeline_phases_from_local_events_and_log_lines():
+    clock = Clock()
+    tl = LaunchTimeline("gpu1", "Qwen/Qwen3-4B", clock=clock)
+    steps = [
+        (0.5, "tunnel", None),
+        (1.0, "session", None),
+        (4.0, None, ENV_READY_MARKER),
+        (6.0, None, "INFO vLLM API server version 0.9.1"),
+        (9.0, None, "INFO Starting to load model Qwen/Qwen3-4B..."),
+        (40.0, None, "INFO Time spent downloading weights for Qwen/Qwen3-4B: 25.5 seconds"),
+        (41.0, None, "INFO Model loading took 7.6 GiB and 30.1 seconds"),
+        (50.0, None, "INFO Capturing cudagraphs for decoding."),
+        (62.0, None, "INFO Graph capturing finished in 12 secs, took 0.5 GiB"),
+        (63.0, None, "INFO Uvicorn running on http://0.0.0.0:8000"),
+    ]
+    for t, event, line in steps:
+        clock.now = 100.0 + t
+        if event:
+            tl.mark(event)
+        else:
+            tl.observe_line(line)
+    clock.now = 163.5
+    tl.finish("ready")
+    phases = {p["phase"]: p for p in tl.phases()}
+    assert list(phases) == ["tunnel", "session", "env", "vllm_start", "load_start", "weights_loaded", "graphs_start", "graphs_done", "bound", "ready"]
+    assert phases["env"]["duration"] == 3.0
+    assert phases["weights_loaded"]["duration"] == 32.0
+    assert phases["weights_loaded"]["reported"] == {"download": 25.5, "model_load": 30.1}
+    assert phases["graphs_done"]["reported"] == {"graphs": 12.0}
+    record = tl.record()
+    assert record["vllm_version"] == "0.9.1" and record["total"] == 63.5 and record["outcome"] == "ready"
+    assert waterfall_table(tl).row_count == len(phases)
+
+
+def test_history_roundtrip(tmp_path):
+    path = str(tmp_path / "h.jsonl")
+    append_history({"host": "gpu1", "model": "a", "total": 1.0}, path)
+    append_history({"host": "gpu2", "model": "a", "total": 2.0}, path)
+    append_history({"host": "gpu2", "model": "b", "total": 3.0}, path)
+    assert [r["total"] for r in load_history(path, model="a")] == [1.0, 2.0]
+    assert [r["total"] for r in load_history(path, host="gpu2")] == [2.0, 3.0]
@@ -0,0 +1,51 @@
+from vllmctl.core.placement import HostGpus, GpuInfo, arg_value, estimate_model_memory, parse_gpu_query, rank_hosts, score_host
+
+GIB = 1024
+
+
+def gpus(*specs):
+    return [GpuInfo(i, util, used * GIB, 80 * GIB) for i, (util, used) in enumerate(specs)]
+
+
+def test_parse_gpu_query_and_model_estimate():
+    out = "0, 3, 1024, 81920\n1, 97, 70000, 81920\n__vllm__\n1\n"
+    stats = parse_gpu_query("gpu1", out)
+    assert [g.index for g in stats.gpus] == [0, 1] and stats.vllm_instances == 1
+    assert stats.gpus[0].mem_free == 80896
+    assert parse_gpu_query("gpu1", "NVIDIA-SMI has failed\n__vllm__\n0\n") is None
+    assert estimate_model_memory("Qwen/Qwen3-32B") // GIB == 59
+    assert estimate_model_memory("Qwen/Qwen3-32B-AWQ") < estimate_model_memory("Qwen/Qwen3-32B", ["--quantization", "fp8"]) < estimate_model_memory("Qwen/Qwen3-32B")
+    assert estimate_model_memory("meta-llama/Llama-3.1-8B-Instruct") // GIB == 14
+    assert estimate_model_memory("my-finetune") is None
+    assert arg_value(["--tensor-parallel-size=4"], ["--tensor-parallel-size"]) == "4"
+
+
+def test_score_needs_enough_free_devices():
+    host = HostGpus("a", gpus((0, 1), (50, 1), (0, 40), (0, 1)))
+    p = score_host(host, tensor_parallel_size=2)
+    assert p.feasible and p.gpus == [0, 3]
+    assert not score_host(host, tensor_parallel_size=4).feasible
+    # ~120 GiB of weights needs two 80 GB devices to leave room for the KV cache
+    assert not score_host(host, 1, model_memory=120 * GIB).feasible
+    assert score_host(host, 2, model_memory=120 * GIB).feasible
+    # a lower gpu_memory_utilization lets a half-used device qualify
+    assert score_host(host, 4, gpu_memory_utilization=0.4).gpus == [0, 1, 2, 3]
+
+
+def test_rank_hosts_prefers_idle_hosts_without_vllm():
+    fleet = {
+        "busy": HostGpus("busy", gpus((90, 2), (90, 2))),
+        "idle": HostGpus("idle", gpus((0, 1), (0, 1))),
+        "shared": HostGpus("shared", gpus((0, 1), (0, 1)), vllm_instances=2),
+        "full": HostGpus("full", gpus((0, 79), (0, 79))),
+    }
+    ranked = rank_hosts(list(fleet) + ["down"], tensor_parallel_size=2, query=lambda h, t: fleet.get(h))
+    assert [p.host for p in ranked] == ["idle", "shared", "busy", "down", "full"]
+    assert [p.feasible for p in ranked] == [True, True, True, False, False]
+
+
+def test_pinned_devices_use_nvidia_smi_order():
+    from vllmctl.core.launcher import vllm_serve_command
+    cmd = vllm_serve_command("m", [], "env", 8000, gpus=[2, 3])
+    assert "CUDA_DEVICE_ORDER=PCI_BUS_ID CUDA_VISIBLE_DEVICES=2,3 vllm serve m" in cmd
+    assert "CUDA_" not in vllm_serve_command("m", [], "env", 8000)
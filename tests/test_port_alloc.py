@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from vllmctl.core.port_alloc import PortAllocator, lowest_free, occupancy_bitmap
+
+
+def test_bitmap_lowest_free():
+    bits = occupancy_bitmap([16100, 16101, 16103, 9999], 16100, 16199)
+    assert lowest_free(bits, 100) == 2
+    assert lowest_free(occupancy_bitmap(range(16100, 16200), 16100, 16199), 100) is None
+
+
+def test_reserve_skips_busy_and_reserved(tmp_path):
+    alloc = PortAllocator(str(tmp_path / "ports.json"))
+    assert alloc.reserve((16100, 16102), busy=[16100]) == 16101
+    assert alloc.reserve((16100, 16102), busy=[16100]) == 16102
+    assert alloc.reserve((16100, 16102), busy=[16100]) is None
+    alloc.release(16101)
+    assert alloc.reserve((16100, 16102), busy=[16100]) == 16101
+
+
+def test_expired_and_orphaned_reservations_are_reclaimed(tmp_path):
+    import json
+    path = tmp_path / "ports.json"
+    dead_pid = 2 ** 22 + 12345  # above pid_max
+    path.write_text(json.dumps({"16100": {"pid": dead_pid, "expires": 1e12}, "16101": {"pid": 1, "expires": 0}}))
+    alloc = PortAllocator(str(path))
+    assert alloc.reserve((16100, 16101)) == 16100
+    assert set(alloc.reserved()) == {16100}
+
+
+def _allocate_many(path, n):
+    alloc = PortAllocator(path)
+    return [alloc.reserve((20000, 29999)) for _ in range(n)]
+
+
+def test_concurrent_allocations_never_collide(tmp_path):
+    path = str(tmp_path / "ports.json")
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        ports = _allocate_many(path, 10)
+        with lock:
+            results.extend(ports)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        for ports in pool.map(_allocate_many, [path] * 4, [10] * 4):
+            results.extend(ports)
+        # join while the pool's processes (owners of their reservations) are still alive
+        for t in threads:
+            t.join()
+    assert None not in results
+    assert len(results) == len(set(results)) == 200
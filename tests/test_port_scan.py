@@ -0,0 +1,69 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from vllmctl.core.port_scan import scan_vllm_ports, parse_http_json
+
+
+class ModelsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/v1/models":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps({"data": [{"id": self.server.model_id}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servers():
+    started = []
+    for model_id in ("model-a", "model-b"):
+        srv = ThreadingHTTPServer(("127.0.0.1", 0), ModelsHandler)
+        srv.model_id = model_id
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        started.append(srv)
+    yield {srv.server_address[1]: srv.model_id for srv in started}
+    for srv in started:
+        srv.shutdown()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_scan_finds_models_and_skips_closed_ports(servers):
+    closed = [free_port() for _ in range(50)]
+    found = scan_vllm_ports(list(servers) + closed)
+    assert {p: info["data"][0]["id"] for p, info in found.items()} == servers
+
+
+def test_scan_silent_listener_is_bounded_by_read_timeout(servers):
+    silent = socket.socket()
+    silent.bind(("127.0.0.1", 0))
+    silent.listen(8)
+    try:
+        start = time.monotonic()
+        found = scan_vllm_ports(list(servers) + [silent.getsockname()[1]], read_timeout=0.3)
+        assert time.monotonic() - start < 2.0
+        assert set(found) == set(servers)
+    finally:
+        silent.close()
+
+
+def test_parse_http_json():
+    chunked = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\n{"a":\r\n2\r\n1}\r\n0\r\n\r\n'
+    assert parse_http_json(chunked) == {"a": 1}
+    assert parse_http_json(b"HTTP/1.1 404 Not Found\r\n\r\n{}") is None
+    assert parse_http_json(b"SSH-2.0-OpenSSH_9.6\r\n") is None
@@ -0,0 +1,57 @@
+from unittest.mock import patch
+from vllmctl.core import prefetch
+from vllmctl.core.prefetch import CacheInventory, Prefetcher, blobs_to_copy, ignore_patterns, expected_bytes, parse_inventory
+
+A, B, C = "a" * 64, "b" * 64, "c" * 40
+
+
+def test_parse_inventory_and_diff():
+    out = f"rev 0123\nbroken 0\nblob {A} 100\nblob {B}.incomplete 7\nblob {C} 5\n"
+    inv = parse_inventory(out)
+    assert inv.revision == "0123" and inv.blobs == {A: 100, C: 5} and inv.incomplete == 7
+    assert inv.bytes == 112 and not inv.complete
+    assert parse_inventory("missing\n") == CacheInventory()
+    assert parse_inventory("[ssh error: timed out]") is None
+    src = CacheInventory("0123", {A: 100, B: 50, C: 5})
+    assert blobs_to_copy(src, inv) == [B]
+    assert blobs_to_copy(src, CacheInventory(blobs={A: 99})) == [A, B, C]
+
+
+def test_ignore_patterns_prefer_safetensors():
+    files = {"config.json": 1, "model.safetensors": 100, "pytorch_model.bin": 100, "original/consolidated.pth": 100}
+    assert expected_bytes(files, ignore_patterns(files)) == 101
+    assert "*.bin" not in ignore_patterns(["pytorch_model.bin"])
+
+
+def test_prefetcher_copies_only_missing_blobs_from_peer():
+    fleet = {
+        "src": CacheInventory("0123", {A: 100, B: 50, C: 5}),
+        "half": CacheInventory("0123", {A: 100}),
+        "full": CacheInventory("0123", {A: 100, B: 50, C: 5}),
+        "empty": CacheInventory(),
+    }
+    copies = []
+
+    def copy(source, target, model, names):
+        copies.append((source, target, names))
+        fleet[target] = fleet[source]
+
+    with patch.object(prefetch, "remote_inventory", lambda host, model, timeout=5: fleet.get(host)), \
+         patch.object(prefetch, "copy_blobs", copy), \
+         patch.object(prefetch, "hub_files", side_effect=AssertionError("the Hub is not used with a peer")):
+        statuses = Prefetcher(["half", "full", "empty", "down"], "org/m", source="src").run(interval=0.01)
+    assert sorted(copies) == [("src", "empty", [A, B, C]), ("src", "half", [B, C])]
+    assert {h: s.state for h, s in statuses.items()} == {"half": "done", "full": "up to date", "empty": "done", "down": "failed"}
+    assert statuses["half"].bytes_done == statuses["half"].bytes_total == 155
+
+
+def test_prefetcher_auto_source_and_hub_fallback():
+    fleet = {"has": CacheInventory("0123", {A: 100}), "needs": CacheInventory()}
+    with patch.object(prefetch, "remote_inventory", lambda host, model, timeout=5: fleet.get(host)), \
+         patch.object(prefetch, "copy_blobs", lambda *a: None):
+        p = Prefetcher(["needs", "has"], "org/m", source="auto")
+        p.plan()
+        assert p.source == "has"
+        p = Prefetcher(["needs"], "org/m", source="auto")
+        p.plan()
+        assert p.source is None
@@ -0,0 +1,36 @@
+import socket
+import sys
+import pytest
+from vllmctl.core.proc_net import read_listening_sockets
+
+
+def test_read_listening_sockets(proc_tables):
+    tcp, tcp6 = proc_tables
+    socks = read_listening_sockets(tcp_path=tcp, tcp6_path=tcp6)
+    found = {(s.family, s.address, s.port, s.inode) for s in socks}
+    assert found == {
+        (socket.AF_INET, "127.0.0.1", 8000, 1111),
+        (socket.AF_INET, "0.0.0.0", 16100, 2222),
+        (socket.AF_INET, "192.168.1.5", 22, 4444),
+        (socket.AF_INET6, "::1", 16101, 5555),
+        (socket.AF_INET6, "::", 16102, 6666),
+    }
+    assert sorted(s.port for s in socks if s.is_local) == [8000, 16100, 16101, 16102]
+
+
+def test_missing_tables(tmp_path):
+    assert read_listening_sockets(tcp_path=str(tmp_path / "nope"), tcp6_path=str(tmp_path / "nope6")) == []
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/net/tcp")
+def test_owner_pid_of_own_socket():
+    import os
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    s.listen(1)
+    try:
+        port = s.getsockname()[1]
+        mine = [x for x in read_listening_sockets(with_pids=True) if x.port == port]
+        assert mine and mine[0].pid == os.getpid()
+    finally:
+        s.close()
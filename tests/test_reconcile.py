@@ -0,0 +1,69 @@
+from vllmctl.core import reconcile
+from vllmctl.core.forward import TunnelResult
+from vllmctl.core.reconcile import ForwardReconciler, HostState, diff_forwards
+
+
+def models(*names):
+    return {"data": [{"id": n} for n in names]}
+
+
+def test_diff_forwards_only_touches_what_changed():
+    desired = {"gpu1": HostState({8000: "a", 8001: "b"}), "gpu2": HostState({})}
+    actual = {16100: ("gpu1", 8000, 1), 16101: ("gpu2", 8000, 2), 16102: ("other", 8000, 3)}
+    creates, kills, kept = diff_forwards(desired, actual)
+    assert creates == [("gpu1", 8001, "b")]
+    assert kills == [("gpu2", 8000, 16101)]
+    assert kept == [("gpu1", 8000, 16100)]
+
+
+def test_reconciler_reprobes_only_stale_or_broken_hosts(monkeypatch):
+    remote = {"gpu1": {8000: models("a")}, "gpu2": {8000: models("b")}, "gpu3": {}}
+    forwards = {}
+    alive = set()
+    probed = []
+    removed = []
+
+    def probe(host, timeout):
+        probed.append(host)
+        return remote[host]
+
+    def create_forwards(specs, mux=False):
+        for host, rport, lport in specs:
+            forwards[lport] = (host, rport, 99)
+            alive.add(lport)
+        return [TunnelResult("up", lport) for _, _, lport in specs]
+
+    def remove_forward(host, rport, lport):
+        removed.append(lport)
+        forwards.pop(lport)
+
+    next_port = iter(range(16100, 16200))
+    monkeypatch.setattr(reconcile, "get_ssh_forwardings", lambda: dict(forwards))
+    monkeypatch.setattr(reconcile, "scan_vllm_ports", lambda ports: {p: models("x") for p in ports if p in alive})
+    monkeypatch.setattr(reconcile, "create_forwards", create_forwards)
+    monkeypatch.setattr(reconcile, "remove_forward", remove_forward)
+    monkeypatch.setattr(reconcile, "find_free_local_port", lambda rng, exclude=(): next(next_port))
+    now = [0.0]
+    rec = ForwardReconciler(["gpu1", "gpu2", "gpu3"], stale_after=100, probe=probe, clock=lambda: now[0])
+
+    first = rec.cycle()
+    assert (first.probed, first.creates, first.kills) == (3, 2, 0)
+    probed.clear()
+    now[0] = 10
+    second = rec.cycle()
+    assert (second.probed, second.creates, second.kills, second.kept) == (0, 0, 0, 2)
+    assert second.local_checks == 2
+
+    # gpu2's model went away and its tunnel stopped answering: only gpu2 is re-probed
+    remote["gpu2"] = {}
+    alive.discard(16101)
+    third = rec.cycle()
+    assert probed == ["gpu2"]
+    assert (third.kills, third.kept) == (1, 1) and removed == [16101]
+
+    # everything is re-probed once stale
+    probed.clear()
+    now[0] = 200
+    fourth = rec.cycle()
+    assert sorted(probed) == ["gpu1", "gpu2", "gpu3"]
+    assert "probed 3/3 hosts" in fourth.summary()
@@ -0,0 +1,68 @@
+import json
+import os
+import threading
+from vllmctl.core.registry import SUPERVISOR_KEY, EndpointRegistry
+
+
+def test_register_update_touch_remove(tmp_path):
+    reg = EndpointRegistry(str(tmp_path / "endpoints.json"))
+    reg.register(16100, host="gpu1", remote_port=8000, tmux_session="vllmctl_gpu1_8000_16100")
+    reg.update(16100, model="Qwen/Qwen3-4B", extra={"remote_session": "vllmctl_server_8000"})
+    reg.touch({16100: "Qwen/Qwen3-4B", 16999: "ignored"})
+    ep = reg.get(16100)
+    assert (ep.host, ep.remote_port, ep.model) == ("gpu1", 8000, "Qwen/Qwen3-4B")
+    assert ep.extra == {"remote_session": "vllmctl_server_8000"}
+    assert ep.last_seen >= ep.created
+    assert set(reg.all()) == {16100}
+    reg.prune(listening_ports=[])
+    assert reg.all() == {}
+
+
+def test_reregistering_the_same_tunnel_keeps_its_metadata(tmp_path):
+    reg = EndpointRegistry(str(tmp_path / "endpoints.json"))
+    reg.register(16100, host="gpu1", remote_port=8000, tmux_session="vllmctl_gpu1_8000_16100")
+    reg.update(16100, model="m", extra={"remote_session": "vllmctl_server_8000", "serve": {"model": "m"}})
+    # a reconnect makes the same tunnel again
+    reg.register(16100, host="gpu1", remote_port=8000, tmux_session="vllmctl_gpu1_8000_16100")
+    ep = reg.get(16100)
+    assert ep.model == "m"
+    assert ep.extra == {"remote_session": "vllmctl_server_8000", "serve": {"model": "m"}}
+    # a different kind of endpoint on the port starts afresh
+    reg.register(16100, host="gpu1", remote_port=8000, tmux_session="vllmctl_mux_gpu1", mux=True)
+    assert reg.get(16100).extra == {"mux": True}
+
+
+def test_prune_keeps_forwards_a_live_supervisor_owns(tmp_path):
+    reg = EndpointRegistry(str(tmp_path / "endpoints.json"))
+    reg.register(16100, host="gpu1", remote_port=8000)
+    reg.register(16101, host="gpu1", remote_port=8001)
+    reg.update(16100, extra={SUPERVISOR_KEY: os.getpid()})
+    reg.prune(listening_ports=[])
+    assert set(reg.all()) == {16100}
+
+
+def test_concurrent_registrations_are_not_lost(tmp_path):
+    path = str(tmp_path / "endpoints.json")
+
+    def worker(base):
+        reg = EndpointRegistry(path)
+        for i in range(20):
+            reg.register(base + i, host=f"h{base}", remote_port=8000)
+
+    threads = [threading.Thread(target=worker, args=(16000 + 100 * t,)) for t in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(EndpointRegistry(path).all()) == 100
+    with open(path) as f:
+        assert len(json.load(f)) == 100
+
+
+def test_corrupt_file_is_treated_as_empty(tmp_path):
+    path = tmp_path / "endpoints.json"
+    path.write_text("{not json")
+    reg = EndpointRegistry(str(path))
+    assert reg.all() == {}
+    reg.register(16100, host="gpu1", remote_port=8000)
+    assert set(reg.all()) == {16100}
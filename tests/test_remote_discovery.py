@@ -0,0 +1,64 @@
+import json
+import socket
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from vllmctl.core import remote_discovery
+from vllmctl.core.proc_net import read_listening_sockets
+from vllmctl.core.remote_discovery import discover_remote_instances
+
+
+class FakeVLLMHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({"object": "list", "data": [{"id": "Qwen/Qwen3-4B", "max_model_len": 32768}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_vllm():
+    server = HTTPServer(("127.0.0.1", 0), FakeVLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+
+
+def run_locally(host, command, timeout=5, input=None):
+    # Execute the discovery script on this machine instead of over ssh.
+    args = command.split()[1:]
+    result = subprocess.run([sys.executable] + args, input=input, capture_output=True, text=True, timeout=timeout)
+    return result.stdout
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/net/tcp")
+def test_discovery_finds_local_instance(monkeypatch, fake_vllm):
+    monkeypatch.setattr(remote_discovery, "run_ssh_command", run_locally)
+    instances = discover_remote_instances("localhost", timeout=20)
+    by_port = {i.port: i for i in instances}
+    assert fake_vllm in by_port
+    inst = by_port[fake_vllm]
+    assert inst.model_name == "Qwen/Qwen3-4B"
+    assert inst.max_model_len == 32768
+    assert inst.info["data"][0]["id"] == "Qwen/Qwen3-4B"
+
+
+def test_discovery_unavailable(monkeypatch):
+    monkeypatch.setattr(remote_discovery, "run_ssh_command", lambda *a, **kw: "bash: python3: command not found")
+    assert discover_remote_instances("host") is None
+
+
+def test_remote_script_parses_tables_like_proc_net(proc_tables):
+    tcp, tcp6 = proc_tables
+    namespace = {}
+    exec(remote_discovery._remote_prelude(), namespace)
+    remote = [namespace["_parse_table"](tcp, socket.AF_INET), namespace["_parse_table"](tcp6, socket.AF_INET6)]
+    remote = {(s.family, s.address, s.port, s.inode) for table in remote for s in table}
+    local = read_listening_sockets(tcp_path=tcp, tcp6_path=tcp6)
+    assert remote == {(s.family, s.address, s.port, s.inode) for s in local}
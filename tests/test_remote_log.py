@@ -0,0 +1,57 @@
+import time
+from unittest.mock import patch
+from vllmctl.core import launcher
+from vllmctl.core.remote_log import LogChunk, RemoteLogTail, classify_log_line
+
+
+class FakeLog(RemoteLogTail):
+    """Replays scripted (lines, alive) chunks instead of running ssh."""
+
+    def __init__(self, chunks):
+        super().__init__("gpu1", "vllmctl_server_8000")
+        self.chunks = list(chunks)
+        self.polls = 0
+
+    def poll(self):
+        self.polls += 1
+        lines, alive = self.chunks.pop(0) if self.chunks else ([], True)
+        self.tail.extend(lines)
+        return LogChunk(lines=lines, alive=alive)
+
+
+def test_feed_tracks_offset_and_partial_lines():
+    log = RemoteLogTail("gpu1", "s")
+    chunk = log.feed(b"INFO start\nINFO loa\n__vllmctl_status__ alive\n")
+    assert chunk.lines == ["INFO start"] and chunk.alive is True
+    assert log.offset == len(b"INFO start\nINFO loa")
+    chunk = log.feed(b"ding\nUvicorn running on http://0.0.0.0:8000\n\n__vllmctl_status__ dead\n")
+    assert chunk.lines == ["INFO loading", "Uvicorn running on http://0.0.0.0:8000"] and chunk.alive is False
+    assert log.feed(b"ssh: connect to host gpu1 port 22: Connection refused").alive is None
+    assert classify_log_line(chunk.lines[1]) == "bound"
+    assert classify_log_line("torch.OutOfMemoryError: CUDA out of memory.") == "failed"
+
+
+def test_wait_fails_fast_on_traceback():
+    log = FakeLog([(["INFO loading weights"], True), (["Traceback (most recent call last):", '  File "x.py"'], True)])
+    start = time.monotonic()
+    with patch.object(launcher, "_api_ready", return_value=False), patch.object(launcher, "LOG_GRACE", 0):
+        assert launcher.wait_for_vllm_api(16100, timeout=60, log=log, interval=0.01) is False
+    assert time.monotonic() - start < 5
+    assert log.polls == 3  # the last poll picks up the rest of the traceback
+    assert '  File "x.py"' in log.tail
+
+
+def test_wait_fails_when_session_exits():
+    log = FakeLog([([], True), (["vllm: error: unrecognized arguments: --bogus"], False)])
+    with patch.object(launcher, "_api_ready", return_value=False):
+        assert launcher.wait_for_vllm_api(16100, timeout=60, log=log, interval=0.01) is False
+
+
+def test_wait_polls_fast_after_bind():
+    ready = iter([False, False, False, False, True])
+    sleeps = []
+    log = FakeLog([([], True), (["INFO Uvicorn running on http://0.0.0.0:8000"], True)])
+    with patch.object(launcher, "_api_ready", side_effect=lambda port: next(ready)), \
+         patch.object(launcher.time, "sleep", side_effect=sleeps.append):
+        assert launcher.wait_for_vllm_api(16100, timeout=60, log=log, interval=2.0, fast_interval=0.1) is True
+    assert sleeps[:2] == [2.0, 0.1]
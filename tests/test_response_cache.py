@@ -0,0 +1,72 @@
+import os
+import requests
+from vllmctl.core.gateway import Gateway, Replica, ReplicaPool
+from vllmctl.core.response_cache import ResponseCache, cache_key, existing_cache_stats, is_cacheable
+
+
+def test_is_cacheable_only_deterministic_requests():
+    assert is_cacheable({"prompt": "x", "temperature": 0})
+    assert not is_cacheable({"prompt": "x"})
+    assert not is_cacheable({"prompt": "x", "temperature": 0.7})
+    assert not is_cacheable({"prompt": "x", "temperature": 0, "stream": True})
+    assert not is_cacheable({"prompt": "x", "temperature": 0, "n": 2})
+    assert not is_cacheable({"prompt": "x", "temperature": "zero"})
+    assert not is_cacheable({"prompt": "x", "temperature": [0]})
+    assert cache_key("/v1/completions", "m", {"a": 1, "b": 2}) == cache_key("/v1/completions", "m", {"b": 2, "a": 1})
+    assert cache_key("/v1/completions", "m", {"a": 1}) != cache_key("/v1/chat/completions", "m", {"a": 1})
+    # keyed on the model that serves the request, whether or not the body names it
+    assert cache_key("/v1/completions", "m", {"a": 1}) == cache_key("/v1/completions", "m", {"a": 1, "model": "m"})
+    assert cache_key("/v1/completions", "m", {"a": 1}) != cache_key("/v1/completions", "other", {"a": 1})
+
+
+def test_cache_evicts_lru_and_expires(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_bytes=25, ttl=100)
+    cache.put("a", 200, "application/json", b"x" * 10, now=0)
+    cache.put("b", 200, "application/json", b"y" * 10, now=1)
+    assert cache.get("a", now=2)[2] == b"x" * 10  # a is now more recent than b
+    cache.put("c", 200, "application/json", b"z" * 10, now=3)
+    assert cache.get("b", now=4) is None
+    assert cache.get("a", now=4) is not None
+    assert cache.get("c", now=200) is None  # past its ttl
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 2, 1)
+    assert stats["bytes_saved"] == 20
+
+
+def test_gateway_serves_repeats_from_cache(tmp_path, make_backend):
+    srv, hits = make_backend("a")
+    pool = ReplicaPool()
+    pool.update([Replica(port=srv.server_address[1], model="m")])
+    gw = Gateway(pool, port=0, health_interval=3600, cache=ResponseCache(str(tmp_path / "c.sqlite")))
+    gw.start()
+    try:
+        url = f"http://127.0.0.1:{gw.port}/v1/completions"
+        req = {"model": "m", "prompt": "hi", "temperature": 0}
+        first = requests.post(url, json=req)
+        second = requests.post(url, json=req)
+        assert first.json() == second.json() == {"backend": "a"}
+        assert "X-Vllmctl-Cache" not in first.headers and second.headers["X-Vllmctl-Cache"] == "hit"
+        # leaving out the model resolves to the same one, so it is the same entry
+        unnamed = {k: v for k, v in req.items() if k != "model"}
+        assert requests.post(url, json=unnamed).headers["X-Vllmctl-Cache"] == "hit"
+        requests.post(url, json={**req, "temperature": 0.5})
+        requests.post(url, json={**req, "temperature": 0.5})
+        assert len(hits) == 3
+        # a malformed temperature is passed through uncached instead of failing the request
+        assert requests.post(url, json={**req, "temperature": "hot"}).json() == {"backend": "a"}
+    finally:
+        gw.stop()
+
+
+def test_existing_cache_stats_reads_without_writing(tmp_path):
+    path = tmp_path / "c.sqlite"
+    assert existing_cache_stats(str(path)) is None and not path.exists()
+    cache = ResponseCache(str(path))
+    cache.put("a", 200, "application/json", b"x" * 10)
+    cache.get("a")
+    expected = cache.stats()
+    os.chmod(path, 0o444)
+    try:
+        assert existing_cache_stats(str(path)) == expected
+    finally:
+        os.chmod(path, 0o644)
@@ -0,0 +1,64 @@
+from vllmctl.core.gateway import Replica, ReplicaPool
+from vllmctl.core.metrics import prefix_cache_hit_rate
+from vllmctl.core.routing import BoundedLoadRing, routing_key
+
+
+def test_routing_key_prefers_conversation_id_then_prefix():
+    chat = {"messages": [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hi"}]}
+    assert routing_key(chat, {"X-Conversation-Id": "c1"}) == "conv:c1"
+    assert routing_key({**chat, "metadata": {"conversation_id": 7}}) == "conv:7"
+    assert routing_key({"prompt": ["abc", "def"]}) == "prefix:abc"
+    assert routing_key({"prompt": None}) is None
+
+
+def test_chat_key_is_stable_across_turns():
+    system = {"role": "system", "content": "You are a helpful assistant."}
+    turn1 = {"messages": [system, {"role": "user", "content": "What is the capital of France?"}]}
+    turn2 = {"messages": turn1["messages"] + [
+        {"role": "assistant", "content": "Paris."},
+        {"role": "user", "content": "And of Germany?"},
+    ]}
+    assert routing_key(turn1) == routing_key(turn2)
+    # conversations sharing a long system prompt still get their own keys
+    long_system = {"role": "system", "content": "Rules. " * 200}
+    a = {"messages": [long_system, {"role": "user", "content": "Question A"}]}
+    b = {"messages": [long_system, {"role": "user", "content": "Question B"}]}
+    assert routing_key(a) != routing_key(b)
+    assert routing_key({"messages": []}) is None
+
+
+def test_ring_is_sticky_and_bounded():
+    ring = BoundedLoadRing(["a", "b", "c"])
+    loads = {"a": 0, "b": 0, "c": 0}
+    keys = [f"conv:{i}" for i in range(300)]
+    first = {k: ring.pick(k, loads.get) for k in keys}
+    assert set(first.values()) == {"a", "b", "c"}
+    assert all(ring.pick(k, loads.get) == first[k] for k in keys)
+    # a hot key spills to the next replica once its own is over the bound
+    hot = first[keys[0]]
+    loads[hot] = 10
+    assert ring.pick(keys[0], loads.get) != hot
+    # removing a node only remaps that node's keys
+    smaller = BoundedLoadRing(["a", "b"])
+    zero = {"a": 0, "b": 0}
+    moved = [k for k in keys if first[k] != "c" and smaller.pick(k, zero.get) != first[k]]
+    assert moved == []
+
+
+def test_sticky_pool_routes_conversation_to_one_replica():
+    pool = ReplicaPool(sticky=True)
+    pool.update([Replica(port=p, model="m") for p in (16100, 16101, 16102)])
+    picks = set()
+    for _ in range(10):
+        replica = pool.pick("m", key="conv:abc")
+        picks.add(replica.port)
+        pool.release(replica, ok=True)
+    assert len(picks) == 1
+
+
+def test_prefix_cache_hit_rate_v0_and_v1():
+    assert prefix_cache_hit_rate({"vllm:gpu_prefix_cache_hit_rate": 0.25}) == 0.25
+    v1 = {"vllm:prefix_cache_queries_total": 200.0, "vllm:prefix_cache_hits_total": 50.0}
+    assert prefix_cache_hit_rate(v1) == 0.25
+    assert prefix_cache_hit_rate(v1, previous=(100.0, 0.0)) == 0.5
+    assert prefix_cache_hit_rate(None) is None
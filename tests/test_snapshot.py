@@ -0,0 +1,103 @@
+import json
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from vllmctl.core import snapshot as snapshot_mod, vllm_probe
+from vllmctl.core.snapshot import collect_snapshot
+from vllmctl.core.vllm_probe import list_local_models
+from vllmctl.core.forward import list_forward_sessions
+from vllmctl.core.instrument import call_counts, reset_call_counts
+
+
+class ModelsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({"data": [{"id": "Qwen2.5"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def forwarded_port(monkeypatch):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), ModelsHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    port = srv.server_address[1]
+
+    class Completed:
+        def __init__(self, stdout):
+            self.stdout = stdout
+            self.stderr = ""
+            self.returncode = 0
+
+    class Proc:
+        info = {"pid": 4242, "name": "ssh", "create_time": 1.0}
+
+        def cmdline(self):
+            return ["ssh", "-N", "-L", f"{port}:localhost:8000", "gpu1"]
+
+    def fake_run(cmd, *a, **kw):
+        if cmd[:2] == ["tmux", "list-panes"]:
+            return Completed(f"vllmctl_gpu1_8000_{port}\t4241\nwork\t100\n")
+        return Completed("")
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setattr("psutil.process_iter", lambda attrs=None: iter([Proc()]))
+    vllm_probe._ssh_parse_cache.clear()
+    monkeypatch.setattr(snapshot_mod, "get_listening_ports", lambda: [port])
+    yield port
+    srv.shutdown()
+
+
+def test_snapshot_is_immutable(forwarded_port):
+    snap = collect_snapshot()
+    assert snap.tmux_sessions == {f"vllmctl_gpu1_8000_{forwarded_port}", "work"}
+    assert snap.model_id(forwarded_port) == "Qwen2.5"
+    with pytest.raises(TypeError):
+        snap.models[1] = {}
+
+
+def test_consumers_make_no_extra_calls(forwarded_port):
+    reset_call_counts()
+    snap = collect_snapshot()
+    collected = call_counts()
+    # one 'tmux list-panes' (forwards come from the process table), one probe per listening port
+    assert collected == {"subprocess": 1, "http": 1}
+    models = list_local_models(snapshot=snap)
+    sessions = list_forward_sessions(snapshot=snap)
+    assert call_counts() == collected
+    assert models[forwarded_port]['server'] == "gpu1"
+    assert models[forwarded_port]['tmux'] == f"vllmctl_gpu1_8000_{forwarded_port}"
+    assert [(s.local_port, s.model_name, s.alive) for s in sessions] == [(forwarded_port, "Qwen2.5", True)]
+
+
+def test_known_snapshot_probes_registered_endpoints_only(forwarded_port, monkeypatch):
+    from vllmctl.core.registry import get_registry
+    from vllmctl.core.snapshot import collect_known_snapshot
+    monkeypatch.setattr(snapshot_mod, "get_listening_ports", lambda: [forwarded_port] + list(range(20000, 20050)))
+    get_registry().register(forwarded_port, host="gpu1", remote_port=8000)
+    reset_call_counts()
+    snap = collect_known_snapshot()
+    assert call_counts()["http"] == 1
+    assert snap.model_id(forwarded_port) == "Qwen2.5"
+    assert get_registry().get(forwarded_port).model == "Qwen2.5"
+    reset_call_counts()
+    collect_known_snapshot(scan=True)
+    assert call_counts()["http"] == 51
+
+
+def test_known_snapshot_prunes_dead_forwards(forwarded_port, monkeypatch):
+    from vllmctl.core.registry import get_registry
+    from vllmctl.core.snapshot import collect_known_snapshot
+    get_registry().register(forwarded_port, host="gpu1", remote_port=8000)
+    get_registry().register(20001, host="gpu2", remote_port=8000)
+    collect_known_snapshot()
+    assert set(get_registry().all()) == {forwarded_port}
+    # a failed port scan leaves the registry alone
+    monkeypatch.setattr(snapshot_mod, "get_listening_ports", lambda: [])
+    collect_known_snapshot()
+    assert set(get_registry().all()) == {forwarded_port}
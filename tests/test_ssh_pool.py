@@ -0,0 +1,87 @@
+import os
+import subprocess
+import pytest
+from vllmctl.core.ssh_pool import SSHControlPool
+
+
+class FakeCompleted:
+    def __init__(self, returncode=0):
+        self.stdout = ""
+        self.stderr = ""
+        self.returncode = returncode
+
+
+@pytest.fixture
+def fake_ssh(monkeypatch):
+    state = {"calls": [], "check_rc": 0, "master_ok": True}
+
+    def fake_run(cmd, *a, **kw):
+        state["calls"].append(cmd)
+        path = next(o.split("=", 1)[1] for o in cmd if o.startswith("ControlPath="))
+        if "-M" in cmd:
+            if state["master_ok"]:
+                open(path, "w").close()
+            return FakeCompleted()
+        if "-O" in cmd and cmd[cmd.index("-O") + 1] == "check":
+            return FakeCompleted(state["check_rc"])
+        if "-O" in cmd and cmd[cmd.index("-O") + 1] == "exit":
+            return FakeCompleted()
+        return FakeCompleted()
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    return state
+
+
+def masters_opened(state):
+    return sum(1 for c in state["calls"] if "-M" in c)
+
+
+def test_pool_reuses_master(tmp_path, fake_ssh):
+    pool = SSHControlPool(control_dir=str(tmp_path))
+    first = pool.ssh_args("gpu1")
+    second = pool.ssh_args("gpu1")
+    assert first == second == pool.client_args("gpu1")
+    assert masters_opened(fake_ssh) == 1
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 1
+
+
+def test_pool_replaces_stale_socket(tmp_path, fake_ssh):
+    pool = SSHControlPool(control_dir=str(tmp_path), check_interval=0)
+    open(pool.control_path("gpu1"), "w").close()
+    fake_ssh["check_rc"] = 255
+    assert pool.ssh_args("gpu1") == pool.client_args("gpu1")
+    assert pool.stats()["stale"] == 1
+    assert masters_opened(fake_ssh) == 1
+
+
+def test_pool_falls_back_to_plain_ssh(tmp_path, fake_ssh):
+    fake_ssh["master_ok"] = False
+    pool = SSHControlPool(control_dir=str(tmp_path), retry_after=60)
+    assert pool.ssh_args("gpu1") == []
+    assert pool.ssh_args("gpu1") == []
+    # The second call must not retry the handshake during the back-off window.
+    assert masters_opened(fake_ssh) == 1
+    assert pool.stats()["failures"] == 1
+
+
+def test_master_open_is_bounded_by_caller_timeout(tmp_path, monkeypatch):
+    timeouts = []
+
+    def fake_run(cmd, *a, **kw):
+        timeouts.append(kw.get("timeout"))
+        return FakeCompleted()
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    pool = SSHControlPool(control_dir=str(tmp_path), connect_timeout=10)
+    pool.ssh_args("gpu1", timeout=3)
+    assert timeouts == [3]
+    pool = SSHControlPool(control_dir=str(tmp_path / "b"), connect_timeout=10)
+    pool.ssh_args("gpu1")
+    assert timeouts[-1] == 15
+
+
+def test_pool_disabled(tmp_path, fake_ssh):
+    pool = SSHControlPool(control_dir=str(tmp_path), enabled=False)
+    assert pool.ssh_args("gpu1") == []
+    assert fake_ssh["calls"] == []
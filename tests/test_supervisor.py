@@ -0,0 +1,116 @@
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from vllmctl.core.registry import SUPERVISOR_KEY, get_registry
+from vllmctl.core.supervisor import (
+    ForwardSupervisor, SupervisedForward, backoff_delay, claim_forwards, forward_is_healthy, registered_forwards
+)
+
+
+class ModelsHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0: each probe opens a new connection, as it would after a tunnel drops
+    def do_GET(self):
+        body = json.dumps({"data": [{"id": "stand-in"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    # restart on the same port right after drop()
+    allow_reuse_address = True
+
+
+class StandInTunnel:
+    """A local HTTP server playing the far end of a tunnel: drop() kills it, start() brings it back."""
+
+    def __init__(self):
+        self.server = None
+        self.port = None
+
+    def start(self):
+        self.server = _Server(("127.0.0.1", self.port or 0), ModelsHandler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def drop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_backoff_grows_with_jitter_and_caps():
+    rng = random.Random(0)
+    delays = [backoff_delay(n, 1.0, 8.0, rng) for n in range(1, 8)]
+    assert 0.5 <= delays[0] <= 1.0
+    assert 4.0 <= delays[-1] <= 8.0
+    assert all(d <= 8.0 for d in delays)
+
+
+def test_supervisor_reconnects_dropped_forward():
+    tunnel = StandInTunnel()
+    tunnel.start()
+    clock = FakeClock()
+    down_for = {"checks": 0}
+
+    def reconnect(forward):
+        # the first attempt fails (host unreachable), the second brings the tunnel back
+        down_for["checks"] += 1
+        if down_for["checks"] >= 2:
+            tunnel.start()
+        return down_for["checks"] >= 2
+
+    sup = ForwardSupervisor(
+        [SupervisedForward("gpu1", 8000, tunnel.port)],
+        health=forward_is_healthy, reconnect=reconnect,
+        interval=5, base_delay=2, max_delay=30, clock=clock, sleep=clock.sleep, rng=random.Random(1)
+    )
+    sup.run(iterations=2)  # healthy for 5s
+    tunnel.drop()
+    events = []
+    sup.run(iterations=6, on_pass=events.extend)
+    st = sup.stats()[0]
+    assert st["up"]
+    assert st["reconnects"] == 2 and st["recoveries"] == 1
+    assert st["last_time_to_recover"] > 0
+    assert any("down" in e for e in events) and any("recovered" in e for e in events)
+    assert st["uptime"] >= 5
+    tunnel.drop()
+
+
+def test_supervisor_follows_the_registry_and_claims_its_forwards():
+    registry = get_registry()
+    registry.register(16100, host="gpu1", remote_port=8000, tmux_session="vllmctl_gpu1_8000_16100")
+    reconnected = []
+    sup = ForwardSupervisor(
+        source=lambda: claim_forwards(registered_forwards(), pid=4242),
+        health=lambda f: f.local_port != 16101, reconnect=lambda f: reconnected.append(f.local_port) or False,
+        clock=FakeClock(), rng=random.Random(0),
+    )
+    sup.check_once()
+    assert list(sup.forwards) == [16100]
+    assert registry.get(16100).extra[SUPERVISOR_KEY] == 4242
+
+    # registered after the supervisor started: picked up on the next pass
+    registry.register(16101, host="gpu2", remote_port=8001, tmux_session="vllmctl_gpu2_8001_16101")
+    sup.check_once()
+    assert sorted(sup.forwards) == [16100, 16101] and reconnected == [16101]
+    # removed from the registry (e.g. killed by the user): no longer supervised
+    registry.remove([16100])
+    sup.check_once()
+    assert list(sup.forwards) == [16101]
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+from vllmctl.core import swap
+from vllmctl.core.registry import get_registry
+from vllmctl.core.swap import drain, pick_remote_port, plan_swap, swap_model
+
+
+class FakeTunnels:
+    """Records forward changes on the shared master and mirrors them in the registry like the real one."""
+
+    def __init__(self):
+        self.forwards = {}
+        self.log = []
+
+    def ensure_master(self, host):
+        return True
+
+    def add_forward(self, host, local_port, remote_port):
+        self.log.append(("add", local_port, remote_port))
+        self.forwards[local_port] = (host, remote_port)
+        get_registry().register(local_port, host=host, remote_port=remote_port, tmux_session=f"vllmctl_mux_{host}", mux=True)
+        return True
+
+    def cancel_forward(self, host, local_port, remote_port):
+        self.log.append(("cancel", local_port, remote_port))
+        self.forwards.pop(local_port, None)
+        get_registry().remove([local_port])
+        return True
+
+
+def test_pick_remote_port_skips_listeners_and_server_sessions():
+    assert pick_remote_port({8000, 8001, 22}, ["vllmctl_server_8002", "other"], start=8000) == 8003
+    assert pick_remote_port({8999}, [], start=8998) == 8000
+
+
+def test_drain_waits_for_quiet_server():
+    samples = iter([{"vllm:num_requests_running": 2.0, "vllm:num_requests_waiting": 1.0},
+                    {"vllm:num_requests_running": 1.0}, {}, {}])
+    assert drain(1, timeout=60, scrape=lambda port: next(samples), sleep=lambda s: None)[0] is True
+    busy = drain(1, timeout=0, scrape=lambda port: {"vllm:num_requests_running": 1.0}, sleep=lambda s: None)
+    assert busy[0] is False
+
+
+def test_drain_treats_failed_scrape_as_unknown():
+    samples = iter([None, {"vllm:num_requests_running": 5.0}, None, {}, None, {}])
+    polls = []
+    drained, _ = drain(1, timeout=60, scrape=lambda port: next(samples), sleep=lambda s: None, on_poll=polls.append)
+    assert drained is True and len(polls) == 6
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += 1
+
+    # a server that never answers is not drained
+    assert drain(1, timeout=5, scrape=lambda port: None, clock=lambda: now[0], sleep=sleep)[0] is False
+
+
+def test_swap_cuts_over_then_drains_and_stops_old():
+    tunnels = FakeTunnels()
+    tunnels.add_forward("gpu1", 16100, 8000)
+    get_registry().update(16100, model="old/model", extra={"remote_session": "vllmctl_server_8000"})
+    plan = plan_swap(16100)
+    assert plan.mux and plan.remote_session == "vllmctl_server_8000"
+
+    def launch(remote_port):
+        tunnels.add_forward("gpu1", 16150, remote_port)
+        get_registry().update(16150, model="new/model", extra={"remote_session": f"vllmctl_server_{remote_port}"})
+        return 16150
+
+    in_flight = iter([3.0, 1.0, 0.0, 0.0])
+    stopped = []
+    with patch.object(swap, "stop_remote_session", lambda host, session: stopped.append((host, session)) or True), \
+         patch.object(swap, "DRAIN_POLL", 0), patch.object(swap, "port_accepts", lambda port: False):
+        result = swap_model(plan, launch, 8001, tunnels=tunnels,
+                            scrape=lambda port: {"vllm:num_requests_running": next(in_flight)})
+    assert result.ok and result.drained and result.old_stopped
+    assert tunnels.forwards == {16100: ("gpu1", 8001)}
+    # the public port moves before the temporary one is turned around to watch the old server
+    assert tunnels.log[2:] == [
+        ("cancel", 16100, 8000), ("add", 16100, 8001),
+        ("cancel", 16150, 8001), ("add", 16150, 8000), ("cancel", 16150, 8000),
+    ]
+    assert stopped == [("gpu1", "vllmctl_server_8000")]
+    ep = get_registry().get(16100)
+    assert (ep.remote_port, ep.model, ep.extra["remote_session"]) == (8001, "new/model", "vllmctl_server_8001")
+
+
+def test_failed_launch_leaves_old_server_alone():
+    tunnels = FakeTunnels()
+    tunnels.add_forward("gpu1", 16100, 8000)
+    result = swap_model(plan_swap(16100), lambda port: None, 8001, tunnels=tunnels)
+    assert not result.ok and tunnels.forwards == {16100: ("gpu1", 8000)}
@@ -0,0 +1,90 @@
+import subprocess
+import pytest
+from vllmctl.core import vllm_probe
+from vllmctl.core.ssh_pool import SSHControlPool
+from vllmctl.core.tunnels import HostTunnelManager
+from vllmctl.core.registry import get_registry
+
+
+class FakeSSH:
+    """Stands in for tmux/ssh: opening the pool's master creates its control socket."""
+
+    def __init__(self):
+        self.calls = []
+        self.sessions = set()
+
+    def __call__(self, cmd, **kwargs):
+        self.calls.append(cmd)
+        rc = 0
+        if cmd[0] == "ssh" and "-M" in cmd:
+            path = next(o.split("=", 1)[1] for o in cmd if o.startswith("ControlPath="))
+            open(path, "w").close()
+        elif cmd[:2] == ["tmux", "new-session"]:
+            self.sessions.add(cmd[cmd.index("-s") + 1])
+        elif cmd[:2] == ["tmux", "has-session"]:
+            rc = 0 if cmd[-1].lstrip("=") in self.sessions else 1
+        elif cmd[:2] == ["tmux", "kill-session"]:
+            self.sessions.discard(cmd[-1])
+        return subprocess.CompletedProcess(cmd, rc, "", "")
+
+
+@pytest.fixture
+def fake_ssh(monkeypatch):
+    fake = FakeSSH()
+    monkeypatch.setattr(subprocess, "run", fake)
+    return fake
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return HostTunnelManager(SSHControlPool(control_dir=str(tmp_path / "cm")))
+
+
+def test_forwards_ride_the_pooled_master(manager, fake_ssh):
+    assert manager.add_forward("gpu1", 16100, 8000)
+    assert manager.add_forward("gpu1", 16101, 8001)
+    masters = [c for c in fake_ssh.calls if c[0] == "ssh" and "-M" in c]
+    assert len(masters) == 1 and f"ControlPath={manager.pool.control_path('gpu1')}" in masters[0]
+    holders = [c for c in fake_ssh.calls if c[:2] == ["tmux", "new-session"]]
+    assert len(holders) == 1 and holders[0][4] == "vllmctl_mux_gpu1" and "ControlMaster=no" in holders[0][-1]
+    forwards = [c for c in fake_ssh.calls if "forward" in c]
+    assert [c[c.index("-L") + 1] for c in forwards] == ["16100:localhost:8000", "16101:localhost:8001"]
+    assert all(f"ControlPath={manager.pool.control_path('gpu1')}" in c for c in forwards)
+    assert sorted(manager.forwards("gpu1")) == [("gpu1", 16100, 8000), ("gpu1", 16101, 8001)]
+    ep = get_registry().get(16100)
+    assert ep.tmux_session == "vllmctl_mux_gpu1" and ep.extra["mux"]
+    assert ep.extra["control_path"] == manager.pool.control_path("gpu1")
+
+    manager.cancel_forward("gpu1", 16100, 8000)
+    assert any("cancel" in c for c in fake_ssh.calls)
+    assert manager.forwards() == [("gpu1", 16101, 8001)]
+    manager.close("gpu1")
+    assert manager.forwards() == [] and fake_ssh.sessions == set()
+    # the master itself is left to expire through ControlPersist
+    assert not any("exit" in c for c in fake_ssh.calls)
+
+
+def test_forward_fails_without_a_master(tmp_path, fake_ssh):
+    manager = HostTunnelManager(SSHControlPool(control_dir=str(tmp_path / "cm"), enabled=False))
+    assert not manager.add_forward("gpu1", 16100, 8000)
+    assert not any("forward" in c for c in fake_ssh.calls)
+    assert get_registry().get(16100) is None
+
+
+def test_registered_mux_forwards_are_discovered(manager, fake_ssh, monkeypatch):
+    manager.add_forward("gpu2", 16102, 8002)
+    path = manager.control_path("gpu2")
+
+    class Proc:
+        info = {"pid": 42, "name": "ssh", "create_time": 1.0}
+
+        def cmdline(self):
+            return ["ssh", "-M", "-N", "-f", "-o", f"ControlPath={path}", "-o", "ControlPersist=300", "gpu2"]
+
+    vllm_probe._ssh_parse_cache.clear()
+    monkeypatch.setattr("psutil.process_iter", lambda attrs=None: iter([Proc()]))
+    assert vllm_probe.get_ssh_forwardings() == {16102: ("gpu2", 8002, 42)}
+    # without a live master the registered forward is not reported
+    vllm_probe._ssh_parse_cache.clear()
+    monkeypatch.setattr("psutil.process_iter", lambda attrs=None: iter([]))
+    assert vllm_probe.get_ssh_forwardings() == {}
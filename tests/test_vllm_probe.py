@@ -0,0 +1,72 @@
+import pytest
+from vllmctl.core import vllm_probe
+from vllmctl.core.registry import get_registry
+from vllmctl.core.vllm_probe import get_ssh_forwardings, parse_ssh_argv
+
+
+class FakeProc:
+    def __init__(self, pid, argv, create_time=1.0, name="ssh"):
+        self.info = {"pid": pid, "name": name, "create_time": create_time}
+        self.argv = argv
+        self.cmdline_calls = 0
+
+    def cmdline(self):
+        self.cmdline_calls += 1
+        return self.argv
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    vllm_probe._ssh_parse_cache.clear()
+
+
+def test_parse_ssh_argv_variants():
+    p = parse_ssh_argv(["ssh", "-NT", "-o", "ServerAliveInterval=30", "-L127.0.0.1:16101:localhost:8001",
+                        "-L", "[::1]:16102:127.0.0.1:8002", "-p", "2222", "gpu2", "sleep", "1"])
+    assert p["host"] == "gpu2"
+    assert p["forwards"] == [("127.0.0.1", 16101, "localhost", 8001), ("[::1]", 16102, "127.0.0.1", 8002)]
+    p = parse_ssh_argv(["ssh", "-o", "LocalForward=16104 localhost:8004", "gpu4"])
+    assert p["forwards"] == [(None, 16104, "localhost", 8004)]
+
+
+def test_get_ssh_forwardings_from_process_table(monkeypatch):
+    procs = [
+        FakeProc(10, ["ssh", "-N", "-L", "16100:localhost:8000", "-L", "16101:localhost:8001", "gpu1"]),
+        FakeProc(11, ["ssh", "-M", "-N", "-o", "ControlPath=/tmp/cm-gpu2", "gpu2"]),
+        FakeProc(13, ["ssh", "-L", "5432:db.internal:5432", "bastion"]),
+        FakeProc(14, ["bash"], name="bash"),
+    ]
+    monkeypatch.setattr("psutil.process_iter", lambda attrs=None: iter(procs))
+    # forwards added with 'ssh -O forward' are known from the registry only
+    get_registry().register(16102, host="gpu2", remote_port=8002, mux=True, control_path="/tmp/cm-gpu2")
+    assert get_ssh_forwardings() == {
+        16100: ("gpu1", 8000, 10),
+        16101: ("gpu1", 8001, 10),
+        16102: ("gpu2", 8002, 11),
+    }
+
+
+def test_get_ssh_forwardings_parses_each_process_once(monkeypatch):
+    old = FakeProc(10, ["ssh", "-N", "-L", "16100:localhost:8000", "gpu1"])
+    procs = [old]
+    monkeypatch.setattr("psutil.process_iter", lambda attrs=None: iter(procs))
+    for _ in range(5):
+        assert get_ssh_forwardings() == {16100: ("gpu1", 8000, 10)}
+    assert old.cmdline_calls == 1
+    # same pid reused by a new process is parsed again
+    procs[:] = [FakeProc(10, ["ssh", "-N", "-L", "16200:localhost:9000", "gpu9"], create_time=2.0)]
+    assert get_ssh_forwardings() == {16200: ("gpu9", 9000, 10)}
+    assert list(vllm_probe._ssh_parse_cache) == [(10, 2.0)]
+
+
+def test_tmux_forwards_of_a_shared_master_belong_to_its_holder_session():
+    holder = ["ssh", "-T", "-o", "ControlMaster=no", "-o", "ControlPath=/tmp/cm-gpu2", "gpu2", "cat"]
+    procs = vllm_probe.ProcessTable([
+        {"pid": 20, "ppid": 1, "name": "ssh", "cmdline": holder},
+        {"pid": 21, "ppid": 1, "name": "ssh", "cmdline": ["ssh", "-N", "-L", "16100:localhost:8000", "gpu1"]},
+    ])
+    get_registry().register(16102, host="gpu2", remote_port=8002, mux=True, control_path="/tmp/cm-gpu2")
+    panes = {"vllmctl_mux_gpu2": [20], "vllmctl_gpu1_8000_16100": [21]}
+    found = vllm_probe.get_tmux_ssh_forwards(panes=panes, procs=procs)
+    assert [f[:2] for f in found["vllmctl_mux_gpu2"]] == [(16102, 8002)]
+    assert [f[:2] for f in found["vllmctl_gpu1_8000_16100"]] == [(16100, 8000)]
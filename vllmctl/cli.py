@@ -1,13 +1,42 @@
 import typer
+from typing import List
 import re as regexlib
-from vllmctl.core.vllm_probe import list_local_models, get_listening_ports, ping_vllm, get_tmux_sessions
+from vllmctl.core.vllm_probe import list_local_models, get_listening_ports, ping_vllm, get_tmux_sessions, scan_local_vllm, get_tmux_ssh_forwards
 from vllmctl.core.ssh_utils import parse_ssh_config, list_remote_models, run_ssh_command
-from vllmctl.core.forward import auto_forward_ports
-from vllmctl.core.launcher import launch_vllm_with_args, parse_lifetime_to_seconds, create_tmux_ssh_forward
-from rich.progress import track
+from vllmctl.core.forward import auto_forward_ports, iter_auto_forward, kill_tmux_session, forget_tmux_session, release_local_port
+from vllmctl.core.port_scan import scan_vllm_ports
+from vllmctl.core.remote_discovery import discover_remote_instances, RemoteInstance
+from vllmctl.core.fanout import fan_out, DEFAULT_MAX_WORKERS, DEFAULT_HOST_TIMEOUT
+from vllmctl.core.launch_timing import load_history
+from vllmctl.core.prefetch import Prefetcher, is_hub_model, DEFAULT_PREFETCH_WORKERS
+from vllmctl.core.placement import rank_hosts, score_host, estimate_model_memory, arg_value, query_host_gpus, DEFAULT_GPU_MEMORY_UTILIZATION
+from vllmctl.core.swap import plan_swap, pick_remote_port, remote_ports_and_sessions, swap_model, DEFAULT_DRAIN_TIMEOUT
+from vllmctl.core.launcher import launch_vllm_with_args, launch_many, parse_lifetime_to_seconds, create_tmux_ssh_forward, create_tmux_session
+from vllmctl.core.autoscale import (
+    Autoscaler, AutoscalePolicy, is_managed, place_replica, free_remote_port, retire_replica,
+    DEFAULT_INTERVAL as DEFAULT_AUTOSCALE_INTERVAL, DEFAULT_DRAIN_TIMEOUT as DEFAULT_AUTOSCALE_DRAIN_TIMEOUT
+)
+from vllmctl.core.idle import (
+    ScaleToZero, plan_scale_to_zero, takeover_port, record_listener, restore_port, server_controls,
+    DEFAULT_IDLE_TIMEOUT, DEFAULT_CHECK_INTERVAL, DEFAULT_WAKE_TIMEOUT, IDLE_SESSION_PREFIX
+)
+from vllmctl.core.ssh_pool import get_ssh_pool
+from vllmctl.core.snapshot import collect_snapshot, collect_known_snapshot
+from vllmctl.core.registry import get_registry
+from vllmctl.core.http_pool import get_http_pool
+from vllmctl.core.metrics import scrape_metrics, prefix_cache_hit_rate, prefix_cache_counters
+from vllmctl.core.tunnels import get_tunnel_manager, mux_session_name, MUX_SESSION_PREFIX
+from vllmctl.core.reconcile import ForwardReconciler, DEFAULT_STALE_AFTER
+from vllmctl.core.supervisor import ForwardSupervisor, claim_forwards, registered_forwards, DEFAULT_INTERVAL, DEFAULT_MAX_DELAY
+from vllmctl.core.gateway import Gateway, ReplicaPool, discover_replicas, DEFAULT_GATEWAY_PORT, DEFAULT_HEALTH_INTERVAL, DEFAULT_MAX_FAILURES
+from vllmctl.core.routing import DEFAULT_LOAD_FACTOR
+from vllmctl.core.response_cache import ResponseCache, existing_cache_stats, DEFAULT_TTL as DEFAULT_CACHE_TTL
 from rich.table import Table
 from rich.console import Console
+import os
+import shlex
 import subprocess
+import sys
 import psutil
 import requests
 import time
@@ -21,15 +50,15 @@ from rich.text import Text
 app = typer.Typer()
 
 @app.command()
-def list_local():
+def list_local(
+    scan: bool = typer.Option(False, help="Probe every listening port, not only endpoints vllmctl has registered")
+):
     """Show local vllm-models (by ports, including forwarded)."""
-    ports = get_listening_ports()
-    tmux_sessions = get_tmux_sessions()
-    models = {}
-    for port in track(ports, description="Checking ports..."):
-        info = ping_vllm(port)
-        if info:
-            models[port] = info
+    console = Console()
+    with console.status("Checking ports..."):
+        snapshot = collect_known_snapshot(scan=scan)
+    tmux_sessions = snapshot.tmux_sessions
+    models = snapshot.models
     table = Table(title="Local vllm models")
     table.add_column("Server")
     table.add_column("Remote\nport")
@@ -39,7 +68,7 @@ def list_local():
     if not models:
         typer.echo("No available vllm models on local ports.")
     else:
-        local_models = list_local_models()
+        local_models = list_local_models(snapshot=snapshot)
         for port, info in models.items():
             entry = local_models.get(port, {})
             model_name = entry.get('model_name', '-')
@@ -62,14 +91,16 @@ def list_local():
                         status = f"tmux: {tmux_name}"
                         break
             table.add_row(server, remote_port, local_port, status, model_name)
-    console = Console()
     console.print(table)
 
 @app.command()
 def list_remote(
     host_regex: str = typer.Option(None, help="Regex for filtering servers by name"),
     debug: bool = typer.Option(False, help="Show detailed information and empty servers"),
-    remote_port: int = typer.Option(8000, help="Port for checking on remote servers (default 8000)")
+    remote_port: int = typer.Option(None, help="Only check this port on remote servers (default: discover all vllm ports)", show_default=False),
+    workers: int = typer.Option(DEFAULT_MAX_WORKERS, help="Number of hosts probed concurrently"),
+    host_timeout: float = typer.Option(DEFAULT_HOST_TIMEOUT, help="Per-host timeout (sec)"),
+    deadline: float = typer.Option(None, help="Overall deadline for the scan (sec)", show_default=False)
 ):
     """Show vllm-models on all servers from ssh-config."""
     hosts = parse_ssh_config()
@@ -82,29 +113,54 @@ def list_remote(
     table.add_column("Server")
     table.add_column("Remote\nport")
     table.add_column("Model")
-    for host in track(hosts, description="Checking servers..."):
-        try:
-            models = list_remote_models(host, port=remote_port)
-        except Exception as e:
-            if debug:
-                table.add_row(host, str(remote_port), f"Error: {e}")
-            continue
-        if models:
-            for port, info in models.items():
-                model_name = info['data'][0]['id'] if info.get('data') and info['data'] else 'unknown'
-                table.add_row(host, str(port), model_name)
-        elif debug:
-            table.add_row(host, str(remote_port), "-")
+    table.add_column("Max\nlen")
+    table.add_column("Tmux")
+
+    def probe(host, t):
+        if remote_port is None:
+            instances = discover_remote_instances(host, timeout=t)
+            if instances is not None:
+                return instances
+        models = list_remote_models(host, port=remote_port or 8000, timeout=t)
+        return [RemoteInstance(port=port, models=info.get('data') or [], info=info) for port, info in models.items()]
+
     console = Console()
-    console.print(table)
+    with Live(table, console=console, refresh_per_second=8):
+        done = 0
+        for res in fan_out(hosts, probe, max_workers=workers, host_timeout=host_timeout, deadline=deadline):
+            done += 1
+            table.caption = f"{done}/{len(hosts)} hosts checked"
+            shown_port = str(remote_port) if remote_port else "-"
+            if not res.ok:
+                if debug:
+                    table.add_row(res.host, shown_port, "Timed out" if res.timed_out else f"Error: {res.error}", "-", "-")
+                continue
+            if res.value:
+                for inst in res.value:
+                    table.add_row(
+                        res.host,
+                        str(inst.port),
+                        inst.model_name,
+                        str(inst.max_model_len) if inst.max_model_len else "-",
+                        inst.tmux_session or "-"
+                    )
+            elif debug:
+                table.add_row(res.host, shown_port, "-", "-", "-")
 
 @app.command()
 def auto_forward(
     host_regex: str = typer.Option(None, help="Regex for filtering servers by name"),
-    remote_port: int = typer.Option(8000, help="Port for checking on remote servers (default 8000)"),
+    remote_port: int = typer.Option(None, help="Only forward this remote port (default: every vllm port found)", show_default=False),
     local_range: str = typer.Option("16100-16199", help="Range of local ports for forwarding (e.g., 16100-16199)"),
     no_kill: bool = typer.Option(False, help="Do not kill forwarding if model not found"),
-    debug: bool = typer.Option(False, help="Detailed output")
+    debug: bool = typer.Option(False, help="Detailed output"),
+    workers: int = typer.Option(DEFAULT_MAX_WORKERS, help="Number of hosts probed concurrently"),
+    host_timeout: float = typer.Option(DEFAULT_HOST_TIMEOUT, help="Per-host timeout (sec)"),
+    deadline: float = typer.Option(None, help="Overall deadline for the scan (sec)", show_default=False),
+    mux: bool = typer.Option(False, help="Carry all forwards to a host over one shared ssh connection"),
+    watch: bool = typer.Option(False, help="Keep reconciling forwards until interrupted"),
+    interval: float = typer.Option(30.0, help="Seconds between reconcile cycles (with --watch)"),
+    stale_after: float = typer.Option(DEFAULT_STALE_AFTER, help="Re-probe a host at least this often (sec, with --watch)")
 ):
     """Automatically forward ports with models to local machine."""
     hosts = parse_ssh_config()
@@ -119,12 +175,19 @@ def auto_forward(
     except Exception:
         typer.echo("Error in local_range format. Example: 16100-16199")
         return
-    results = auto_forward_ports(
+    if watch:
+        watch_forwards(hosts, remote_port, local_range_tuple, no_kill, workers, host_timeout, mux, interval, stale_after)
+        return
+    results = iter_auto_forward(
         hosts,
         remote_port=remote_port,
         local_range=local_range_tuple,
         no_kill=no_kill,
-        debug=debug
+        debug=debug,
+        max_workers=workers,
+        host_timeout=host_timeout,
+        deadline=deadline,
+        mux=mux
     )
     table = Table(title="Auto-forward results")
     table.add_column("Server")
@@ -132,32 +195,111 @@ def auto_forward(
     table.add_column("Local\nport")
     table.add_column("Status")
     table.add_column("Model")
-    for host, rport, lport, status, model in results:
-        show_model = False
-        if status.startswith("Forwarded") or status.startswith("Already forwarded") or status.startswith("duplicate session"):
-            show_model = True
-        elif debug and model:
-            show_model = True
+    console = Console()
+    with Live(table, console=console, refresh_per_second=8):
+        for host, rport, lport, status, model in results:
+            show_model = False
+            if status.startswith("Forwarded") or status.startswith("Already forwarded") or status.startswith("duplicate session"):
+                show_model = True
+            elif debug and model:
+                show_model = True
+            table.add_row(
+                str(host),
+                str(rport),
+                str(lport) if lport else "-",
+                status,
+                model if (show_model and model) else "-"
+            )
+
+def watch_forwards(hosts, remote_port, local_range, no_kill, workers, host_timeout, mux, interval, stale_after):
+    reconciler = ForwardReconciler(
+        hosts, remote_port=remote_port, local_range=local_range, no_kill=no_kill,
+        stale_after=stale_after, max_workers=workers, host_timeout=host_timeout, mux=mux
+    )
+    console = Console()
+    state = {"rows": [], "caption": "starting..."}
+
+    def make_table():
+        table = Table(title="Auto-forward (watching)", caption=state["caption"])
+        table.add_column("Server")
+        table.add_column("Remote\nport")
+        table.add_column("Local\nport")
+        table.add_column("Status")
+        table.add_column("Model")
+        for host, rport, lport, status, model in sorted(state["rows"], key=lambda r: (r[0], r[1])):
+            table.add_row(str(host), str(rport), str(lport) if lport else "-", status, model or "-")
+        return table
+
+    with Live(make_table(), console=console, refresh_per_second=2) as live:
+        def on_cycle(report):
+            state["rows"] = report.rows
+            state["caption"] = report.summary()
+            live.update(make_table())
+        try:
+            reconciler.run(interval, on_cycle=on_cycle)
+        except KeyboardInterrupt:
+            pass
+
+def place_servers(console, servers, model, vllm_extra_args, host_regex=None, model_memory=None):
+    """Replace each 'auto' in servers with the best remaining host; returns (servers, {host: gpu indices})."""
+    explicit = [s for s in servers if s != "auto"]
+    hosts = [h for h in parse_ssh_config() if h not in explicit]
+    if host_regex:
+        hosts = [h for h in hosts if re.search(host_regex, h)]
+    tp = int(arg_value(vllm_extra_args, ["--tensor-parallel-size", "-tp", "-t"]) or 1)
+    gpu_util = float(arg_value(vllm_extra_args, ["--gpu-memory-utilization"]) or DEFAULT_GPU_MEMORY_UTILIZATION)
+    need = int(model_memory * 1024) if model_memory else estimate_model_memory(model, vllm_extra_args)
+    with console.status(f"Checking GPUs on {len(hosts)} hosts..."):
+        placements = rank_hosts(hosts, tp, need, gpu_util)
+    table = Table(title=f"Placement of {model} (TP={tp}, weights ~{need / 1024:.0f} GiB)" if need else f"Placement of {model} (TP={tp})")
+    table.add_column("Host")
+    table.add_column("Score", justify="right")
+    table.add_column("GPUs")
+    table.add_column("Util (%)", justify="right")
+    table.add_column("vLLM\nrunning", justify="right")
+    table.add_column("Note")
+    for p in placements:
+        stats = p.stats
         table.add_row(
-            str(host),
-            str(rport),
-            str(lport) if lport else "-",
-            status,
-            model if (show_model and model) else "-"
+            p.host,
+            f"{p.score:.2f}" if p.feasible else "-",
+            ",".join(map(str, p.gpus)) or "-",
+            f"{stats.avg_util:.0f}" if stats else "-",
+            str(stats.vllm_instances) if stats else "-",
+            p.reason or ""
         )
-    console = Console()
     console.print(table)
+    feasible = iter(p for p in placements if p.feasible)
+    resolved, gpus = [], {}
+    for s in servers:
+        if s != "auto":
+            resolved.append(s)
+            continue
+        best = next(feasible, None)
+        if best is None:
+            console.print("[red]No host has enough free GPU memory for this model[/red]")
+            return [], {}
+        console.print(f"[green]Placing {model} on {best.host} (GPUs {','.join(map(str, best.gpus))})[/green]")
+        resolved.append(best.host)
+        gpus[best.host] = best.gpus
+    return resolved, gpus
 
 @app.command(context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
 def serve(
     ctx: typer.Context,
-    server: str = typer.Option(..., "--server", help="Server name (from ssh-config)"),
+    server: List[str] = typer.Option(..., "--server", help="Server name (from ssh-config), or 'auto' to pick the host with the most room; repeat to launch on several servers at once"),
     conda_env: str = typer.Option("vllm_env", "--conda-env", help="Conda environment for running vllm on server"),
     local_range: str = typer.Option("16100-16199", "--local-range", help="Range of local ports for forwarding (e.g., 16100-16199)"),
     timeout: int = typer.Option(600, "--timeout", help="Maximum waiting time for vllm start (sec)"),
     lifetime: str = typer.Option(None, "--lifetime", help="Maximum lifetime for vllm process (e.g., 10m, 2h, 1d, 30s)"),
     tensor_parallel_size: int = typer.Option(None, "--tensor-parallel-size", help="tensor-parallel-size for vllm serve", show_default=False),
     remote_port: int = typer.Option(8000, "--remote-port", help="Port on server for vllm serve"),
+    mux: bool = typer.Option(False, "--mux", help="Add the tunnel to the server's shared ssh connection"),
+    host_regex: str = typer.Option(None, "--host-regex", help="With --server auto: only consider hosts matching this regex"),
+    model_memory: float = typer.Option(None, "--model-memory", help="With --server auto: model weight size in GiB (default: estimated from the model name)", show_default=False),
+    prefetch: bool = typer.Option(False, "--prefetch", help="Stage the model weights in the servers' Hugging Face cache before launching"),
+    prefetch_source: str = typer.Option(None, "--prefetch-source", help="With --prefetch: copy the weights from this host (or 'auto': a target that has them) instead of the Hub"),
+    idle_timeout: str = typer.Option(None, "--idle-timeout", help="Stop the server after this long without requests and restart it on the next one (e.g. 15m); runs scale-to-zero in a local tmux session"),
     model: str = typer.Argument(help="Model name or path to serve"),
 ):
     """
@@ -166,6 +308,7 @@ def serve(
     vllmctl serve --server server1 Qwen/Qwen2.5-32B --tensor-parallel-size 8 --port 8000
     vllmctl serve --server gpu-node --lifetime 2h \
         Qwen/Qwen3-32B --reasoning-parser deepseek_r1 --tensor-parallel-size 8
+    vllmctl serve --server auto --host-regex 'gpu-.*' Qwen/Qwen3-32B --tensor-parallel-size 2
     """
     console = Console()
     try:
@@ -174,6 +317,12 @@ def serve(
     except Exception:
         console.print("[red]Error in local_range format. Example: 16100-16199[/red]")
         raise typer.Exit(1)
+    if idle_timeout:
+        try:
+            parse_lifetime_to_seconds(idle_timeout)
+        except ValueError as e:
+            console.print(f"[red]--idle-timeout: {e}[/red]")
+            raise typer.Exit(1)
 
     vllm_extra_args = []
     if ctx and ctx.args:
@@ -184,19 +333,309 @@ def serve(
     if remote_port is not None and not any(a in ["--port", "-p"] for a in vllm_extra_args):
         vllm_extra_args += ["--port", str(remote_port)]
 
+    gpus = {}
+    if "auto" in server:
+        server, gpus = place_servers(console, server, model, vllm_extra_args, host_regex, model_memory)
+        if not server:
+            raise typer.Exit(1)
+
+    if prefetch:
+        if not is_hub_model(model):
+            console.print(f"[yellow]{model} is not a Hub repo id, skipping prefetch[/yellow]")
+        else:
+            statuses = run_prefetch(console, server, model, source=prefetch_source, conda_env=conda_env)
+            failed = [h for h, st in statuses.items() if not st.ok]
+            if failed:
+                console.print(f"[yellow]Prefetch failed on {', '.join(failed)}; vLLM will download the weights itself there[/yellow]")
+
     # Логика запуска перенесена из launch
-    local_port = launch_vllm_with_args(
-        server=server,
-        model=model,
-        vllm_extra_args=vllm_extra_args,
-        local_range=local_range_tuple,
-        conda_env=conda_env,
-        timeout=timeout,
-        lifetime=lifetime,
-        console=console
+    launches = [
+        dict(
+            server=host,
+            gpus=gpus.get(host),
+            model=model,
+            vllm_extra_args=list(vllm_extra_args),
+            local_range=local_range_tuple,
+            conda_env=conda_env,
+            timeout=timeout,
+            lifetime=lifetime,
+            console=console,
+            mux=mux
+        )
+        for host in server
+    ]
+    ports = launch_many(launches)
+    if len(server) > 1:
+        table = Table(title=f"Launches of {model}")
+        table.add_column("Server")
+        table.add_column("Local port")
+        for host, port in zip(server, ports):
+            table.add_row(host, str(port) if port else "[red]failed[/red]")
+        console.print(table)
+    if idle_timeout:
+        for port in ports:
+            if port is None:
+                continue
+            session = f"{IDLE_SESSION_PREFIX}{port}"
+            cmd = f"{shlex.quote(sys.executable)} -m vllmctl scale-to-zero --local-port {port} --idle-timeout {idle_timeout} --local-range {local_range}"
+            try:
+                create_tmux_session(session, cmd)
+                console.print(f"[green]Port {port} scales to zero after {idle_timeout} idle[/green] (local tmux session {session})")
+            except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                console.print(f"[yellow]Could not start scale-to-zero for port {port}: {e}[/yellow]")
+    if any(port is None for port in ports):
+        raise typer.Exit(1)
+
+@app.command(context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
+def swap(
+    ctx: typer.Context,
+    local_port: int = typer.Option(..., "--local-port", help="Forwarded local port whose server is replaced"),
+    conda_env: str = typer.Option("vllm_env", "--conda-env", help="Conda environment for running vllm on server"),
+    local_range: str = typer.Option("16100-16199", "--local-range", help="Range for the temporary local port used while the new server starts"),
+    timeout: int = typer.Option(600, "--timeout", help="Maximum waiting time for the new server to start (sec)"),
+    lifetime: str = typer.Option(None, "--lifetime", help="Maximum lifetime for the new vllm process (e.g., 10m, 2h, 1d, 30s)"),
+    remote_port: int = typer.Option(None, "--remote-port", help="Port for the new server (default: next free port on the host)", show_default=False),
+    gpus: str = typer.Option("auto", "--gpus", help="Devices for the new server, e.g. 4,5; 'auto' picks free ones, 'all' does not pin"),
+    drain_timeout: float = typer.Option(DEFAULT_DRAIN_TIMEOUT, "--drain-timeout", help="Longest wait for the old server's requests to finish (sec)"),
+    keep_old: bool = typer.Option(False, "--keep-old", help="Leave the old server running after the cutover"),
+    model: str = typer.Argument(help="Model to serve on the new server"),
+):
+    """
+    Replace the server behind a forwarded port without downtime: start the new one
+    beside it, repoint the port once it is ready, drain the old one, then stop it.
+    vllmctl swap --local-port 16100 Qwen/Qwen3-32B --tensor-parallel-size 4 --max-model-len 32768
+    """
+    console = Console()
+    try:
+        l1, l2 = map(int, local_range.split('-'))
+    except Exception:
+        console.print("[red]Error in local_range format. Example: 16100-16199[/red]")
+        raise typer.Exit(1)
+    try:
+        plan = plan_swap(local_port)
+    except (ValueError, OSError) as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    if get_registry().get(local_port).extra.get("idle_proxy"):
+        console.print(f"[red]Port {local_port} is held by scale-to-zero; stop it (tmux session {IDLE_SESSION_PREFIX}{local_port}) before swapping[/red]")
+        raise typer.Exit(1)
+    vllm_extra_args = [a for a in (ctx.args if ctx else [])]
+    if arg_value(vllm_extra_args, ["--port", "-p"]):
+        console.print("[red]Give the new server's port with --remote-port, not --port[/red]")
+        raise typer.Exit(1)
+    if remote_port is None:
+        found = remote_ports_and_sessions(plan.host)
+        if found is None:
+            console.print(f"[red]Could not list ports on {plan.host}[/red]")
+            raise typer.Exit(1)
+        remote_port = pick_remote_port(*found, start=plan.remote_port)
+        if remote_port is None:
+            console.print(f"[red]No free remote port on {plan.host}[/red]")
+            raise typer.Exit(1)
+    devices = None
+    if gpus == "auto":
+        stats = query_host_gpus(plan.host)
+        if stats is not None:
+            tp = int(arg_value(vllm_extra_args, ["--tensor-parallel-size", "-tp", "-t"]) or 1)
+            gpu_util = float(arg_value(vllm_extra_args, ["--gpu-memory-utilization"]) or DEFAULT_GPU_MEMORY_UTILIZATION)
+            placement = score_host(stats, tp, estimate_model_memory(model, vllm_extra_args), gpu_util)
+            if not placement.feasible:
+                console.print(f"[red]Not enough free GPUs on {plan.host} beside the running server ({placement.reason}). "
+                              f"Pass --gpus, or a lower --gpu-memory-utilization.[/red]")
+                raise typer.Exit(1)
+            devices = placement.gpus
+    elif gpus != "all":
+        devices = [int(g) for g in gpus.split(",") if g.strip()]
+
+    console.print(f"[bold]Swapping {plan.model or '?'} on {plan.host}:{plan.remote_port} for {model} on {plan.host}:{remote_port}[/bold]")
+    if not plan.mux:
+        console.print("[yellow]This port has its own ssh tunnel; connections open through it are cut at the cutover (forwards made with --mux keep them).[/yellow]")
+
+    def launch_new(new_port):
+        return launch_vllm_with_args(
+            server=plan.host, model=model, vllm_extra_args=vllm_extra_args + ["--port", str(new_port)],
+            local_range=(l1, l2), conda_env=conda_env, timeout=timeout, lifetime=lifetime,
+            console=console, mux=True, gpus=devices
+        )
+
+    result = swap_model(plan, launch_new, remote_port, drain_timeout=drain_timeout, keep_old=keep_old, console=console)
+    if not result.ok:
+        console.print(f"[red]Swap failed: {result.error}[/red]")
+        raise typer.Exit(1)
+    if result.drain_time is not None:
+        console.print(f"Old server {'drained' if result.drained else 'not drained'} after {result.drain_time:.1f}s")
+    if result.old_stopped:
+        console.print(f"[green]Stopped the old server on {plan.host}:{plan.remote_port}[/green]")
+    if result.error:
+        console.print(f"[yellow]{result.error}[/yellow]")
+
+@app.command()
+def scale_to_zero(
+    local_port: int = typer.Option(..., "--local-port", help="Forwarded local port of a server started with serve"),
+    idle_timeout: str = typer.Option(DEFAULT_IDLE_TIMEOUT, "--idle-timeout", help="Stop the server after this long without requests (e.g. 30s, 15m, 1h)"),
+    interval: float = typer.Option(DEFAULT_CHECK_INTERVAL, "--interval", help="Seconds between /metrics checks"),
+    timeout: int = typer.Option(DEFAULT_WAKE_TIMEOUT, "--timeout", help="Maximum waiting time for the server to restart (sec)"),
+    local_range: str = typer.Option("16100-16199", "--local-range", help="Range for the internal local port of the forward")
+):
+    """
+    Stop a served model after it has been idle and start it again on the next request.
+    Listens on the local port in place of the tunnel until interrupted, then puts the tunnel back.
+    """
+    console = Console()
+    try:
+        l1, l2 = map(int, local_range.split('-'))
+        idle_after = parse_lifetime_to_seconds(idle_timeout)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    try:
+        plan, serve_args = plan_scale_to_zero(local_port)
+        backend_port = takeover_port(plan, (l1, l2))
+    except (ValueError, RuntimeError, OSError) as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+
+    def log(message):
+        console.print(f"{time.strftime('%H:%M:%S')} {local_port}: {message}")
+
+    start_server, stop_server = server_controls(plan, serve_args, backend_port, timeout=timeout, console=console)
+    listener = None
+    for _ in range(50):
+        try:
+            listener = ScaleToZero(
+                local_port, backend_port, plan.model, start_server, stop_server,
+                idle_after=idle_after, interval=interval, on_event=log
+            )
+            break
+        except OSError:
+            time.sleep(0.1)  # the old tunnel may still hold the port for a moment
+    if listener is None:
+        console.print(f"[red]Cannot listen on {local_port}; restoring the forward[/red]")
+        restore_port(plan, serve_args, backend_port)
+        raise typer.Exit(1)
+    record_listener(plan, serve_args, backend_port)
+    listener.start()
+    console.print(f"[bold]{plan.model or '?'} on {plan.host}:{plan.remote_port} stops after {idle_timeout} without requests and restarts on the next one.[/bold] Ctrl-C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if listener.awake:
+            if restore_port(plan, serve_args, backend_port):
+                console.print(f"Port {local_port} forwards to {plan.host}:{plan.remote_port} again")
+            else:
+                console.print(f"[red]Could not restore the forward on {local_port}[/red]")
+        else:
+            get_registry().remove([local_port])
+            get_tunnel_manager().cancel_forward(plan.host, backend_port, plan.remote_port)
+            release_local_port(backend_port)
+            console.print(f"[yellow]The server is stopped; start it again with vllmctl serve --server {plan.host} {serve_args['model']}[/yellow]")
+        console.print(f"{listener.sleeps} stops, {listener.wakeups} restarts, {listener.failed_wakeups} failed restarts")
+
+@app.command(context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
+def autoscale(
+    ctx: typer.Context,
+    min_replicas: int = typer.Option(1, "--min", help="Fewest replicas to keep"),
+    max_replicas: int = typer.Option(4, "--max", help="Most replicas to run"),
+    scale_up_waiting: float = typer.Option(4.0, "--scale-up-waiting", help="Add a replica when the smoothed queue per replica is above this"),
+    scale_down_waiting: float = typer.Option(0.5, "--scale-down-waiting", help="Remove idle replicas when the smoothed queue per replica is below this"),
+    smoothing: float = typer.Option(0.3, "--smoothing", help="EWMA weight of the newest queue sample (0-1]"),
+    idle_after: float = typer.Option(300.0, "--idle-after", help="Seconds without requests before a replica may be removed"),
+    up_cooldown: float = typer.Option(120.0, "--up-cooldown", help="Seconds between scale-ups"),
+    down_cooldown: float = typer.Option(600.0, "--down-cooldown", help="Seconds after any change before a scale-down"),
+    interval: float = typer.Option(DEFAULT_AUTOSCALE_INTERVAL, "--interval", help="Seconds between metric checks"),
+    host_regex: str = typer.Option(None, "--host-regex", help="Only launch replicas on hosts matching this regex"),
+    model_memory: float = typer.Option(None, "--model-memory", help="Model weight size in GiB (default: estimated from the model name)", show_default=False),
+    conda_env: str = typer.Option("vllm_env", "--conda-env", help="Conda environment for running vllm on server"),
+    local_range: str = typer.Option("16100-16199", "--local-range", help="Range of local ports for the replicas' forwards"),
+    timeout: int = typer.Option(600, "--timeout", help="Maximum waiting time for a new replica to start (sec)"),
+    drain_timeout: float = typer.Option(DEFAULT_AUTOSCALE_DRAIN_TIMEOUT, "--drain-timeout", help="Longest wait for a removed replica's requests to finish (sec)"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only show what would be launched or stopped"),
+    model: str = typer.Argument(help="Model to scale"),
+):
+    """
+    Keep between --min and --max replicas of a model, adding them on free hosts when
+    the queue grows and removing idle ones. Extra arguments are passed to vllm serve.
+    vllmctl autoscale --min 1 --max 4 --host-regex 'gpu-.*' Qwen/Qwen3-32B --tensor-parallel-size 2
+    """
+    console = Console()
+    try:
+        l1, l2 = map(int, local_range.split('-'))
+    except Exception:
+        console.print("[red]Error in local_range format. Example: 16100-16199[/red]")
+        raise typer.Exit(1)
+    vllm_extra_args = list(ctx.args) if ctx else []
+    if arg_value(vllm_extra_args, ["--port", "-p"]):
+        console.print("[red]Replicas get free remote ports on their hosts; do not pass --port[/red]")
+        raise typer.Exit(1)
+    policy = AutoscalePolicy(
+        min_replicas=min_replicas, max_replicas=max_replicas, scale_up_waiting=scale_up_waiting,
+        scale_down_waiting=scale_down_waiting, smoothing=smoothing, idle_after=idle_after,
+        up_cooldown=up_cooldown, down_cooldown=down_cooldown
     )
-    if local_port is None:
+    need = int(model_memory * 1024) if model_memory else estimate_model_memory(model, vllm_extra_args)
+
+    def launch_replica():
+        hosts = [h for h in parse_ssh_config() if not host_regex or re.search(host_regex, h)]
+        placement = place_replica(hosts, vllm_extra_args, need)
+        if placement is None:
+            return None
+        remote_port = free_remote_port(placement.host)
+        if remote_port is None:
+            return None
+        return launch_vllm_with_args(
+            server=placement.host, model=model, vllm_extra_args=vllm_extra_args + ["--port", str(remote_port)],
+            local_range=(l1, l2), conda_env=conda_env, timeout=timeout, mux=True, gpus=placement.gpus
+        )
+
+    recent = []
+
+    def on_event(event):
+        d = event.decision
+        target = f" {d.port}" if d.port else ""
+        recent.append(f"{time.strftime('%H:%M:%S')} {d.action}{target}: {d.reason} ({event.result})")
+
+    try:
+        scaler = Autoscaler(
+            model, policy, launch_replica, lambda port: retire_replica(port, drain_timeout),
+            managed=is_managed, dry_run=dry_run, on_event=on_event
+        )
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
         raise typer.Exit(1)
+    last = []
+
+    def make_table():
+        smoothed = "-" if scaler.smoothed_waiting is None else f"{scaler.smoothed_waiting:.1f}"
+        caption = [f"smoothed queue/replica {smoothed} (up > {scale_up_waiting:g}, down < {scale_down_waiting:g}); "
+                   f"{scaler.pending} launching; {last[-1].action}: {last[-1].reason}" if last else "starting..."]
+        table = Table(title=f"Autoscaling {model} ({min_replicas}-{max_replicas} replicas){' [dry run]' if dry_run else ''}",
+                      caption="\n".join(caption + recent[-5:]))
+        table.add_column("Local\nport")
+        table.add_column("Server")
+        table.add_column("Running", justify="right")
+        table.add_column("Waiting", justify="right")
+        table.add_column("Idle")
+        now = time.monotonic()
+        for st in sorted(scaler.replicas.values(), key=lambda s: s.port):
+            idle = "-" if st.idle_since is None else f"{now - st.idle_since:.0f}s"
+            table.add_row(
+                str(st.port) + ("" if st.managed else " (external)"), st.host or "-",
+                f"{st.running:.0f}" if st.healthy else "[red]down[/red]", f"{st.waiting:.0f}" if st.healthy else "-", idle
+            )
+        return table
+
+    with Live(make_table(), console=console, refresh_per_second=2) as live:
+        def on_step(decision):
+            last.append(decision)
+            live.update(make_table())
+        try:
+            scaler.run(interval, on_step=on_step)
+        except KeyboardInterrupt:
+            pass
 
 @app.command()
 def launch(
@@ -230,6 +669,114 @@ def launch(
     app_cmd = get_command(app)
     app_cmd(args, standalone_mode=True)
 
+def format_bytes(n):
+    if n is None:
+        return "?"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TiB"
+
+def prefetch_table(model, statuses, now):
+    table = Table(title=f"Prefetch of {model}")
+    table.add_column("Host")
+    table.add_column("State")
+    table.add_column("From")
+    table.add_column("Staged", justify="right")
+    table.add_column("Progress", justify="right")
+    table.add_column("Elapsed", justify="right")
+    table.add_column("Note")
+    styles = {"done": "green", "up to date": "green", "failed": "red"}
+    for host, st in statuses.items():
+        progress = f"{min(st.bytes_done / st.bytes_total, 1.0):.0%}" if st.bytes_total else "-"
+        style = styles.get(st.state, "cyan")
+        table.add_row(
+            host, f"[{style}]{st.state}[/{style}]", st.source or "Hub",
+            f"{format_bytes(st.bytes_done)} / {format_bytes(st.bytes_total)}", progress,
+            f"{st.elapsed(now):.0f}s", st.error or ""
+        )
+    return table
+
+def run_prefetch(console, hosts, model, source=None, conda_env="vllm_env", verify=False, workers=DEFAULT_PREFETCH_WORKERS):
+    prefetcher = Prefetcher(hosts, model, source=source, conda_env=conda_env, verify=verify, max_workers=workers)
+    with Live(prefetch_table(model, prefetcher.snapshot(), time.monotonic()), console=console, refresh_per_second=4) as live:
+        return prefetcher.run(on_progress=lambda statuses: live.update(prefetch_table(model, statuses, time.monotonic())))
+
+@app.command(name="prefetch")
+def prefetch_cmd(
+    model: str = typer.Argument(help="Hugging Face repo id, e.g. Qwen/Qwen3-32B"),
+    server: List[str] = typer.Option(None, "--server", help="Host to stage the weights on (repeatable)"),
+    host_regex: str = typer.Option(None, help="Stage on every ssh-config host matching this regex"),
+    source: str = typer.Option(None, help="Copy from this host instead of the Hub ('auto': a target that already has the weights)"),
+    conda_env: str = typer.Option("vllm_env", help="Conda environment with huggingface_hub on the hosts"),
+    verify: bool = typer.Option(False, help="Re-hash blobs on the hosts and replace the ones whose checksum does not match"),
+    workers: int = typer.Option(DEFAULT_PREFETCH_WORKERS, help="Number of hosts staged concurrently")
+):
+    """Download model weights into the remote Hugging Face cache of one or many hosts, in parallel."""
+    console = Console()
+    if not is_hub_model(model):
+        console.print(f"[red]{model} is not a Hugging Face repo id (org/name)[/red]")
+        raise typer.Exit(1)
+    hosts = list(server or [])
+    if host_regex:
+        hosts += [h for h in parse_ssh_config() if re.search(host_regex, h) and h not in hosts]
+    if not hosts:
+        console.print("[red]Give --server or --host-regex[/red]")
+        raise typer.Exit(1)
+    statuses = run_prefetch(console, hosts, model, source=source, conda_env=conda_env, verify=verify, workers=workers)
+    if not all(st.ok for st in statuses.values()):
+        raise typer.Exit(1)
+
+HISTORY_COLUMNS = [("env", "Conda"), ("weights_loaded", "Weights"), ("graphs_start", "Profile+KV"), ("graphs_done", "CUDA graphs"), ("ready", "API ready")]
+
+@app.command()
+def launch_history(
+    model: str = typer.Option(None, help="Only launches of this model"),
+    host_regex: str = typer.Option(None, help="Only hosts matching this regex"),
+    last: int = typer.Option(20, help="Show the last N launches"),
+    group: bool = typer.Option(False, help="Average phase times per host and vLLM version instead of listing launches")
+):
+    """Startup phase timings recorded by 'serve', to compare nodes and vLLM versions."""
+    console = Console()
+    records = load_history(model=model, host=host_regex)
+    if not records:
+        console.print("[yellow]No launches recorded yet[/yellow]")
+        return
+    if group:
+        groups = {}
+        for r in records:
+            if r.get("outcome") == "ready":
+                groups.setdefault((r["host"], r.get("vllm_version") or "?", r["model"]), []).append(r)
+        table = Table(title="Mean startup time of successful launches")
+        for name in ("Host", "vLLM", "Model", "Launches"):
+            table.add_column(name)
+        for _, label in HISTORY_COLUMNS:
+            table.add_column(label, justify="right")
+        table.add_column("Total", justify="right")
+        for (host, version, model_name), rows in sorted(groups.items()):
+            means = []
+            for phase, _ in HISTORY_COLUMNS:
+                values = [r["phases"][phase] for r in rows if phase in r.get("phases", {})]
+                means.append(f"{statistics.mean(values):.1f}s" if values else "-")
+            table.add_row(host, version, model_name, str(len(rows)), *means, f"{statistics.mean(r['total'] for r in rows):.1f}s")
+    else:
+        table = Table(title="Recent launches")
+        for name in ("When", "Host", "Model", "vLLM", "Outcome"):
+            table.add_column(name)
+        for _, label in HISTORY_COLUMNS:
+            table.add_column(label, justify="right")
+        table.add_column("Total", justify="right")
+        for r in records[-last:]:
+            phases = r.get("phases", {})
+            table.add_row(
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(r["time"])), r["host"], r["model"],
+                r.get("vllm_version") or "?", r.get("outcome") or "?",
+                *[f"{phases[p]:.1f}s" if p in phases else "-" for p, _ in HISTORY_COLUMNS],
+                f"{r['total']:.1f}s"
+            )
+    console.print(table)
+
 @app.command()
 def tmux_forwards(
     tmux_prefix: str = typer.Option("vllmctl_", help="Prefix for tmux sessions to search for forwards")
@@ -247,16 +794,34 @@ def tmux_forwards(
     table.add_column("Remote port")
     table.add_column("Local port")
     table.add_column("Model on port?")
+    parsed = {session: regexlib.match(r"vllmctl_(.+)_(\d+)_(\d+)", session) for session in sessions}
+    # Shared-master sessions carry several forwards, known only from the registry
+    mux_forwards = {}
+    for host, lport, rport in get_tunnel_manager().forwards():
+        mux_forwards.setdefault(mux_session_name(host), []).append((host, lport, rport))
+    ports = {int(m.group(3)) for s, m in parsed.items() if m and s not in mux_forwards}
+    ports |= {lport for fwds in mux_forwards.values() for _, lport, _ in fwds}
+    probes = scan_vllm_ports(ports)
+    try:
+        get_registry().touch({port: info['data'][0].get('id') for port, info in probes.items() if info.get('data')})
+    except OSError:
+        pass
+    rows = []
     for session in sessions:
+        if session in mux_forwards:
+            rows += [(session, host, str(rport), str(lport)) for host, lport, rport in sorted(mux_forwards[session])]
+            continue
+        if session.startswith(MUX_SESSION_PREFIX):
+            table.add_row(session, session[len(MUX_SESSION_PREFIX):], "-", "-", "no forwards")
+            continue
         # Parse session name: vllmctl_{host}_{remote_port}_{local_port}
-        m = regexlib.match(r"vllmctl_(.+)_(\d+)_(\d+)", session)
-        if m:
-            server = m.group(1)
-            remote_port = m.group(2)
-            local_port = m.group(3)
+        m = parsed[session]
+        rows.append((session,) + m.groups() if m else (session, None, None, None))
+    for session, server, remote_port, local_port in rows:
+        if server is not None:
             model_status = "-"
             try:
-                model_info = ping_vllm(int(local_port))
+                model_info = probes.get(int(local_port))
                 if model_info and 'data' in model_info and model_info['data']:
                     model_status = model_info['data'][0].get('id', 'model exists')
                 elif model_info:
@@ -276,41 +841,33 @@ def clean_tmux_forwards(
     tmux_prefix: str = typer.Option("vllmctl_", help="Prefix for tmux sessions to search for forwards")
 ):
     """Delete all tmux-sessions vllmctl_*, where there is no ssh-forward or model does not ping."""
-    result = subprocess.run(["tmux", "ls"], capture_output=True, text=True)
-    sessions = []
-    for line in result.stdout.splitlines():
-        if line.startswith(tmux_prefix):
-            name = line.split(':')[0]
-            sessions.append(name)
+    forwards = get_tmux_ssh_forwards(prefix=tmux_prefix)
+    alive = scan_vllm_ports({lport for fwds in forwards.values() for lport, _, _ in fwds})
     killed = []
-    for session in sessions:
-        pid_out = subprocess.run(
-            ["tmux", "list-panes", "-t", session, "-F", "#{pane_pid}"],
-            capture_output=True, text=True
-        )
-        found = False
-        for pid_str in pid_out.stdout.splitlines():
-            try:
-                pid = int(pid_str)
-                proc = psutil.Process(pid)
-                for child in proc.children(recursive=True):
-                    if child.name() == "ssh":
-                        cmdline = " ".join(child.cmdline())
-                        m = regexlib.search(r"-L\s*(\d+):localhost:(\d+)", cmdline)
-                        if m:
-                            local_port = int(m.group(1))
-                            model_info = ping_vllm(local_port)
-                            if not model_info:
-                                subprocess.run(["tmux", "kill-session", "-t", session])
-                                killed.append((session, local_port, "no model"))
-                                found = True
-                            else:
-                                found = True
-            except Exception:
-                continue
-        if not found:
-            subprocess.run(["tmux", "kill-session", "-t", session])
+    manager = get_tunnel_manager()
+    for session, fwds in forwards.items():
+        if session.startswith(IDLE_SESSION_PREFIX):
+            # a scale-to-zero listener, not a tunnel
+            continue
+        if session.startswith(MUX_SESSION_PREFIX):
+            # A shared master stays up for its live forwards; only dead ones are cancelled
+            host = session[len(MUX_SESSION_PREFIX):]
+            for lport, rport, _ in fwds:
+                if lport not in alive:
+                    manager.cancel_forward(host, lport, rport)
+                    killed.append((session, lport, "no model (forward cancelled)"))
+            if all(lport not in alive for lport, _, _ in fwds):
+                manager.close(host)
+                killed.append((session, "-", "no live forwards"))
+            continue
+        if not fwds:
+            kill_tmux_session(session)
             killed.append((session, "-", "no ssh-forward"))
+            continue
+        dead = [lport for lport, _, _ in fwds if lport not in alive]
+        if dead:
+            kill_tmux_session(session)
+            killed.append((session, dead[0], "no model"))
     if killed:
         table = Table(title="Deleted tmux-sessions")
         table.add_column("Tmux session")
@@ -331,6 +888,7 @@ def kill_tmux(
     result = subprocess.run(["tmux", "kill-session", "-t", session], capture_output=True, text=True)
     console = Console()
     if result.returncode == 0:
+        forget_tmux_session(session)
         console.print(f"[green]Session {session} killed[/green]")
     else:
         console.print(f"[red]Error killing {session}:[/red] {result.stderr}")
@@ -338,16 +896,17 @@ def kill_tmux(
 @app.command()
 def vllm_queue_top(
     refresh: float = typer.Option(1.0, help="Refresh interval in seconds"),
-    history: int = typer.Option(30, help="Number of points for mini-graph (history)")
+    history: int = typer.Option(30, help="Number of points for mini-graph (history)"),
+    scan: bool = typer.Option(False, help="Probe every listening port, not only endpoints vllmctl has registered")
 ):
     """Show real-time vLLM queue status for all local ports (like nvtop)."""
     console = Console()
-    ports = get_listening_ports()
     vllm_ports = []
     port_models = {}
-    # Scan all ports once with a progress bar
-    for port in track(ports, description="Scanning ports for vLLM models..."):
-        info = ping_vllm(port)
+    # Probe registered endpoints (or all ports) once, concurrently
+    with console.status("Scanning ports for vLLM models..."):
+        probes = collect_known_snapshot(scan=scan).models
+    for port, info in sorted(probes.items()):
         if info and 'data' in info and info['data']:
             vllm_ports.append(port)
             port_models[port] = info['data'][0].get('id', '-')
@@ -360,42 +919,23 @@ def vllm_queue_top(
     # History buffer for each port and metric
     metric_history = {port: {'waiting': [], 'running': [], 'swapped': [], 'prompt_throughput': [], 'generation_throughput': []} for port in vllm_ports}
 
+    http_pool = get_http_pool()
+
+    prefix_counters = {}
+
     def get_metrics(port):
-        try:
-            r = requests.get(f"http://127.0.0.1:{port}/metrics", timeout=0.5)
-            lines = r.text.splitlines()
-            waiting = running = swapped = None
-            prompt_throughput = None
-            generation_throughput = None
-            for line in lines:
-                if 'vllm:num_requests_waiting' in line:
-                    try:
-                        waiting = float(line.strip().split()[-1])
-                    except Exception:
-                        pass
-                if 'vllm:num_requests_running' in line:
-                    try:
-                        running = float(line.strip().split()[-1])
-                    except Exception:
-                        pass
-                if 'vllm:num_requests_swapped' in line:
-                    try:
-                        swapped = float(line.strip().split()[-1])
-                    except Exception:
-                        pass
-                if 'vllm:avg_prompt_throughput_toks_per_s' in line:
-                    try:
-                        prompt_throughput = float(line.strip().split()[-1])
-                    except Exception:
-                        pass
-                if 'vllm:avg_generation_throughput_toks_per_s' in line:
-                    try:
-                        generation_throughput = float(line.strip().split()[-1])
-                    except Exception:
-                        pass
-            return waiting, running, swapped, prompt_throughput, generation_throughput
-        except Exception:
-            return None, None, None, None, None
+        metrics = scrape_metrics(port, pool=http_pool)
+        if metrics is None:
+            return None, None, None, None, None, None
+        prefix_hit = prefix_cache_hit_rate(metrics, prefix_counters.get(port))
+        prefix_counters[port] = prefix_cache_counters(metrics)
+        return tuple(metrics.get(name) for name in (
+            'vllm:num_requests_waiting',
+            'vllm:num_requests_running',
+            'vllm:num_requests_swapped',
+            'vllm:avg_prompt_throughput_toks_per_s',
+            'vllm:avg_generation_throughput_toks_per_s',
+        )) + (prefix_hit,)
 
     def sparkline(data, width=history):
         # Simple ASCII sparkline for small numbers
@@ -415,7 +955,15 @@ def vllm_queue_top(
     def make_table():
         frame = spinner_frames[spinner_idx[0] % len(spinner_frames)]
         spinner_idx[0] += 1
-        table = Table(title=f"{frame} vLLM Queue Status (refreshes every {refresh:.1f}s)")
+        conn_stats = http_pool.stats()
+        caption = f"http: {conn_stats['requests']} requests over {conn_stats['connections']} connections ({conn_stats['reused']} reused)"
+        cache_stats = existing_cache_stats()
+        if cache_stats:
+            caption += "\n" + format_cache_stats(cache_stats)
+        table = Table(
+            title=f"{frame} vLLM Queue Status (refreshes every {refresh:.1f}s)",
+            caption=caption
+        )
         table.add_column("Local Port")
         table.add_column("Model")
         table.add_column("Waiting")
@@ -424,9 +972,10 @@ def vllm_queue_top(
         table.add_column("Run graph")
         table.add_column("Prompt TPT")
         table.add_column("Gen TPT")
+        table.add_column("Prefix hit")
         for port in vllm_ports:
             model = port_models.get(port, '-')
-            waiting, running, swapped, prompt_throughput, generation_throughput = get_metrics(port)
+            waiting, running, swapped, prompt_throughput, generation_throughput, prefix_hit = get_metrics(port)
             # Update history
             for key, val in zip(['waiting', 'running', 'prompt_throughput', 'generation_throughput'], [waiting, running, prompt_throughput, generation_throughput]):
                 if val is not None:
@@ -441,7 +990,8 @@ def vllm_queue_top(
                 sparkline(metric_history[port]['waiting']),
                 sparkline(metric_history[port]['running']),
                 str(f"{prompt_throughput:.1f}" if prompt_throughput is not None else '-'),
-                str(f"{generation_throughput:.1f}" if generation_throughput is not None else '-')
+                str(f"{generation_throughput:.1f}" if generation_throughput is not None else '-'),
+                f"{prefix_hit:.0%}" if prefix_hit is not None else '-'
             )
         return table
 
@@ -474,20 +1024,11 @@ def gpu_idle_top(
     reachable_hosts = []
 
     def get_gpu_stats(host):
-        try:
-            out_util = run_ssh_command(host, "nvidia-smi --query-gpu=utilization.gpu --format=csv,noheader,nounits", timeout=3)
-            utils = [int(x) for x in out_util.strip().splitlines() if x.strip().isdigit()]
-            out_mem = run_ssh_command(host, "nvidia-smi --query-gpu=memory.used,memory.total --format=csv,noheader,nounits", timeout=3)
-            mems = []
-            for line in out_mem.strip().splitlines():
-                parts = [int(x) for x in line.strip().split(',') if x.strip().isdigit()]
-                if len(parts) == 2 and parts[1] > 0:
-                    mems.append(parts[0] / parts[1] * 100)
-            avg_util = float(statistics.fmean(utils)) if utils else None
-            avg_mem = float(statistics.fmean(mems)) if mems else None
-            return avg_util, avg_mem
-        except Exception:
+        # one round-trip per host, shared with serve --server auto
+        stats = query_host_gpus(host, timeout=3)
+        if stats is None:
             return None, None
+        return stats.avg_util, stats.avg_mem
 
     def sparkline(data, width=history):
         if not data:
@@ -503,9 +1044,11 @@ def gpu_idle_top(
             res += chars[idx]
         return res.rjust(width)
 
-    # Initial scan with progress bar
-    for host in track(hosts, description="Scanning GPU utilization on hosts..."):
-        util, mem = get_gpu_stats(host)
+    # Initial scan, all hosts at once
+    with console.status("Scanning GPU utilization on hosts..."):
+        initial = {res.host: res.value if res.ok else (None, None) for res in fan_out(hosts, lambda h, t: get_gpu_stats(h), host_timeout=3)}
+    for host in hosts:
+        util, mem = initial[host]
         if util is not None:
             util_history[host].append(util)
         if mem is not None:
@@ -539,7 +1082,11 @@ def gpu_idle_top(
     def make_table():
         frame = spinner_frames[spinner_idx[0] % len(spinner_frames)]
         spinner_idx[0] += 1
-        table = Table(title=f"{frame} GPU Idle Top (refreshes every {refresh:.1f}s)")
+        pool_stats = get_ssh_pool().stats()
+        table = Table(
+            title=f"{frame} GPU Idle Top (refreshes every {refresh:.1f}s)",
+            caption=f"ssh pool: {pool_stats['hits']} hits / {pool_stats['misses']} misses, {pool_stats['open']} open"
+        )
         table.add_column("Host")
         table.add_column("Util (%)")
         table.add_column("Util Graph")
@@ -573,3 +1120,146 @@ def gpu_idle_top(
                 time_mod.sleep(refresh)
         except KeyboardInterrupt:
             pass
+
+
+@app.command()
+def ssh_pool(
+    host_regex: str = typer.Option(None, help="Regex to filter hosts from ssh config"),
+    close: bool = typer.Option(False, help="Close the matching master connections")
+):
+    """Show (or close) the multiplexed ssh master connections used by vllmctl."""
+    console = Console()
+    pool = get_ssh_pool()
+    hosts = parse_ssh_config()
+    if host_regex:
+        hosts = [h for h in hosts if re.search(host_regex, h)]
+    table = Table(title="SSH master connections")
+    table.add_column("Host")
+    table.add_column("Control socket")
+    table.add_column("Status")
+    for host in hosts:
+        path = pool.control_path(host)
+        if not os.path.exists(path):
+            continue
+        if close:
+            pool.close(host)
+            status = "closed"
+        else:
+            status = "alive" if pool.is_alive(host) else "stale"
+        table.add_row(host, path, status)
+    if not table.rows:
+        console.print("No ssh master connections open.")
+        return
+    console.print(table)
+
+@app.command()
+def supervise(
+    host_regex: str = typer.Option(None, help="Only supervise forwards to hosts matching this regex"),
+    interval: float = typer.Option(DEFAULT_INTERVAL, help="Seconds between health checks"),
+    max_delay: float = typer.Option(DEFAULT_MAX_DELAY, help="Upper bound for the reconnect backoff (sec)")
+):
+    """Keep vllmctl's forwards alive: health-check them and reconnect dropped tunnels with backoff."""
+    console = Console()
+    supervisor = ForwardSupervisor(
+        source=lambda: claim_forwards(registered_forwards(host_regex)), interval=interval, max_delay=max_delay
+    )
+    recent = []
+
+    def fmt_secs(value):
+        return "-" if value is None else f"{value:.1f}s"
+
+    def make_table():
+        idle = None if supervisor.forwards else "No forwards registered by vllmctl yet."
+        table = Table(title="Supervised forwards", caption="\n".join(recent[-5:]) or idle)
+        table.add_column("Local\nport")
+        table.add_column("Server")
+        table.add_column("Remote\nport")
+        table.add_column("Status")
+        table.add_column("Uptime")
+        table.add_column("Reconnects")
+        table.add_column("Last\nrecovery")
+        table.add_column("Mean\nrecovery")
+        for st in supervisor.stats():
+            table.add_row(
+                str(st["local_port"]), st["host"], str(st["remote_port"]),
+                "[green]up[/green]" if st["up"] else "[red]down[/red]",
+                fmt_secs(st["uptime"]), str(st["reconnects"]),
+                fmt_secs(st["last_time_to_recover"]), fmt_secs(st["mean_time_to_recover"])
+            )
+        return table
+
+    with Live(make_table(), console=console, refresh_per_second=2) as live:
+        def on_pass(events):
+            recent.extend(time.strftime("%H:%M:%S ") + e for e in events)
+            live.update(make_table())
+        try:
+            supervisor.run(on_pass=on_pass)
+        except KeyboardInterrupt:
+            pass
+
+def format_cache_stats(stats):
+    saved = stats['bytes_saved'] / (1024 * 1024)
+    return f"response cache: {stats['hit_ratio']:.0%} hits ({stats['hits']}/{stats['hits'] + stats['misses']}), {saved:.1f} MB saved, {stats['entries']} entries"
+
+@app.command()
+def gateway(
+    port: int = typer.Option(DEFAULT_GATEWAY_PORT, help="Local port for the gateway"),
+    bind: str = typer.Option("127.0.0.1", help="Address to listen on"),
+    scan: bool = typer.Option(False, help="Probe every listening port for replicas, not only registered endpoints"),
+    health_interval: float = typer.Option(DEFAULT_HEALTH_INTERVAL, help="Seconds between replica discovery and health checks"),
+    max_failures: int = typer.Option(DEFAULT_MAX_FAILURES, help="Failed requests in a row before a replica is ejected"),
+    sticky: bool = typer.Option(False, help="Keep a conversation (same id or prompt prefix) on one replica for prefix-cache hits"),
+    load_factor: float = typer.Option(DEFAULT_LOAD_FACTOR, help="With --sticky: max load of a replica relative to the average"),
+    cache: bool = typer.Option(False, help="Answer repeated deterministic requests (temperature 0, not streamed) from a local cache"),
+    cache_size: int = typer.Option(256, help="Response cache size limit (MB)"),
+    cache_ttl: float = typer.Option(DEFAULT_CACHE_TTL, help="Seconds a cached response stays valid")
+):
+    """Serve one OpenAI-compatible endpoint that load-balances over all local replicas of each model."""
+    console = Console()
+    pool = ReplicaPool(max_failures=max_failures, sticky=sticky, load_factor=load_factor)
+    try:
+        gw = Gateway(
+            pool, bind=bind, port=port, health_interval=health_interval,
+            discover=lambda: discover_replicas(scan=scan, exclude_ports=[port]),
+            cache=ResponseCache(max_bytes=cache_size * 1024 * 1024, ttl=cache_ttl) if cache else None
+        )
+    except OSError as e:
+        console.print(f"[red]Cannot listen on {bind}:{port}: {e}[/red]")
+        raise typer.Exit(1)
+    with console.status("Discovering replicas..."):
+        gw.start()
+
+    def make_table():
+        mode = "sticky" if sticky else "least-loaded"
+        caption = f"http://{bind}:{gw.port}/v1 ({mode}) — {gw.requests} requests, {gw.retries} retries."
+        if gw.cache is not None:
+            caption += " " + format_cache_stats(gw.cache.stats())
+        caption += " Ctrl-C to stop."
+        table = Table(title="vllmctl gateway", caption=caption)
+        table.add_column("Model")
+        table.add_column("Local\nport")
+        table.add_column("Server")
+        table.add_column("State")
+        table.add_column("In\nflight")
+        table.add_column("Waiting")
+        table.add_column("Served")
+        table.add_column("Errors")
+        table.add_column("Prefix\nhit")
+        for r in pool.snapshot():
+            table.add_row(
+                r.model, str(r.port), r.host or "-",
+                "[green]healthy[/green]" if r.healthy else "[red]ejected[/red]",
+                str(r.outstanding), f"{r.waiting:.0f}", str(r.served), str(r.errors),
+                f"{r.prefix_hit_rate:.0%}" if r.prefix_hit_rate is not None else "-"
+            )
+        return table
+
+    with Live(make_table(), console=console, refresh_per_second=2) as live:
+        try:
+            while True:
+                time.sleep(0.5)
+                live.update(make_table())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            gw.stop()
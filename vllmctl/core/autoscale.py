@@ -0,0 +1,272 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .forward import remove_forward
+from .gateway import Replica, discover_replicas
+from .metrics import scrape_metrics
+from .placement import DEFAULT_GPU_MEMORY_UTILIZATION, Placement, arg_value, rank_hosts
+from .registry import get_registry
+from .swap import REMOTE_PORT_RANGE, drain, pick_remote_port, remote_ports_and_sessions, stop_remote_session
+
+DEFAULT_INTERVAL = 5.0
+DEFAULT_DRAIN_TIMEOUT = 120.0
+
+
+@dataclass
+class AutoscalePolicy:
+    """
+    When to add and remove replicas. The gap between ``scale_up_waiting`` and
+    ``scale_down_waiting`` is the hysteresis band: inside it the fleet is left alone.
+    """
+    min_replicas: int = 1
+    max_replicas: int = 4
+    scale_up_waiting: float = 4.0  # smoothed queued requests per replica that trigger a new replica
+    scale_down_waiting: float = 0.5  # smoothed queue below which idle replicas may be removed
+    smoothing: float = 0.3  # EWMA weight of the newest sample
+    idle_after: float = 300.0  # a replica must be without requests this long to be removed
+    up_cooldown: float = 120.0  # between scale-ups
+    down_cooldown: float = 600.0  # after any change, before a scale-down
+
+    def validate(self) -> None:
+        if not 0 <= self.min_replicas <= self.max_replicas:
+            raise ValueError("need 0 <= min replicas <= max replicas")
+        if self.scale_down_waiting >= self.scale_up_waiting:
+            raise ValueError("the scale-down threshold must be below the scale-up threshold")
+        if not 0 < self.smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+
+
+@dataclass
+class ReplicaState:
+    port: int
+    host: Optional[str] = None
+    running: float = 0.0
+    waiting: float = 0.0
+    healthy: bool = False
+    managed: bool = False  # launched by vllmctl, so it may be stopped
+    idle_since: Optional[float] = None
+
+    @property
+    def load(self) -> float:
+        return self.running + self.waiting
+
+
+@dataclass
+class Decision:
+    action: str  # "up", "down" or "hold"
+    reason: str
+    port: Optional[int] = None  # replica to remove
+
+
+@dataclass
+class ScaleEvent:
+    time: float
+    decision: Decision
+    result: Optional[str] = None
+
+
+class Autoscaler:
+    """
+    Keeps between ``policy.min_replicas`` and ``policy.max_replicas`` replicas of
+    ``model``. Each ``step`` discovers the replicas, scrapes their /metrics, folds the
+    mean queue per healthy replica into an EWMA and acts on it: ``launch()`` starts a
+    replica in the background (returning its local port, or None), ``retire(port)``
+    stops one. Only replicas that have been idle for ``policy.idle_after`` are ever
+    retired. With ``dry_run`` decisions are reported and cooled down as usual, but
+    nothing is launched or stopped.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        policy: AutoscalePolicy,
+        launch: Callable[[], Optional[int]],
+        retire: Callable[[int], bool],
+        discover: Callable[[], List[Replica]] = discover_replicas,
+        scrape=scrape_metrics,
+        managed: Callable[[int], bool] = lambda port: True,
+        clock: Callable[[], float] = time.monotonic,
+        dry_run: bool = False,
+        on_event: Optional[Callable[[ScaleEvent], None]] = None,
+    ):
+        policy.validate()
+        self.model = model
+        self.policy = policy
+        self.launch = launch
+        self.retire = retire
+        self.discover = discover
+        self.scrape = scrape
+        self.managed = managed
+        self.clock = clock
+        self.dry_run = dry_run
+        self.on_event = on_event
+        self.replicas: Dict[int, ReplicaState] = {}
+        self.smoothed_waiting: Optional[float] = None
+        self.last_up = float("-inf")
+        self.last_change = float("-inf")
+        self.events: List[ScaleEvent] = []
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def pending(self) -> int:
+        """Launches that have not finished yet."""
+        with self._lock:
+            return self._pending
+
+    def observe(self, now: float) -> List[ReplicaState]:
+        seen = {}
+        for r in self.discover():
+            if r.model != self.model or r.port in seen:
+                continue
+            state = self.replicas.get(r.port) or ReplicaState(port=r.port, host=r.host, managed=self.managed(r.port), idle_since=now)
+            metrics = self.scrape(r.port)
+            state.healthy = metrics is not None
+            if metrics is not None:
+                state.running = metrics.get("vllm:num_requests_running", 0.0)
+                state.waiting = metrics.get("vllm:num_requests_waiting", 0.0)
+                if state.load > 0:
+                    state.idle_since = None
+                elif state.idle_since is None:
+                    state.idle_since = now
+            seen[r.port] = state
+        self.replicas = seen
+        healthy = [s for s in seen.values() if s.healthy]
+        if healthy:
+            sample = sum(s.waiting for s in healthy) / len(healthy)
+            a = self.policy.smoothing
+            self.smoothed_waiting = sample if self.smoothed_waiting is None else a * sample + (1 - a) * self.smoothed_waiting
+        return sorted(seen.values(), key=lambda s: s.port)
+
+    def decide(self, now: float) -> Decision:
+        p = self.policy
+        pending = self.pending
+        count = len(self.replicas) + pending
+        if count < p.min_replicas:
+            if pending:
+                return Decision("hold", "launch in progress")
+            return Decision("up", f"{count} replicas, minimum is {p.min_replicas}")
+        removable = [s for s in self.replicas.values() if s.managed]
+        if count > p.max_replicas and removable and not pending:
+            victim = min(removable, key=lambda s: (s.load, s.port))
+            return Decision("down", f"{count} replicas, maximum is {p.max_replicas}", port=victim.port)
+        if self.smoothed_waiting is None:
+            return Decision("hold", "no metrics yet")
+        if self.smoothed_waiting > p.scale_up_waiting:
+            if count >= p.max_replicas:
+                return Decision("hold", f"queue {self.smoothed_waiting:.1f} per replica, already at maximum")
+            if pending:
+                return Decision("hold", "launch in progress")
+            if now - self.last_up < p.up_cooldown:
+                return Decision("hold", f"queue {self.smoothed_waiting:.1f} per replica, cooling down after scale-up")
+            return Decision("up", f"queue {self.smoothed_waiting:.1f} per replica > {p.scale_up_waiting:g}")
+        if self.smoothed_waiting < p.scale_down_waiting and count > p.min_replicas and not pending:
+            idle = [s for s in removable if s.idle_since is not None and now - s.idle_since >= p.idle_after]
+            if not idle:
+                return Decision("hold", "no replica idle long enough")
+            if now - self.last_change < p.down_cooldown:
+                return Decision("hold", "cooling down before scale-down")
+            victim = min(idle, key=lambda s: (s.idle_since, s.port))
+            return Decision("down", f"{victim.port} idle for {now - victim.idle_since:.0f}s", port=victim.port)
+        return Decision("hold", f"queue {self.smoothed_waiting:.1f} per replica")
+
+    def _launch(self) -> None:
+        try:
+            port = self.launch()
+        except Exception:
+            port = None
+        with self._lock:
+            self._pending -= 1
+        self._record(ScaleEvent(self.clock(), Decision("up", "launch finished"),
+                                f"replica on port {port}" if port else "launch failed"))
+
+    def _record(self, event: ScaleEvent) -> None:
+        self.events.append(event)
+        if self.on_event:
+            self.on_event(event)
+
+    def act(self, decision: Decision, now: float) -> None:
+        if decision.action == "hold":
+            return
+        self.last_change = now
+        if decision.action == "up":
+            self.last_up = now
+        if self.dry_run:
+            self._record(ScaleEvent(now, decision, "dry run"))
+            return
+        if decision.action == "up":
+            with self._lock:
+                self._pending += 1
+            self._record(ScaleEvent(now, decision, "launching"))
+            t = threading.Thread(target=self._launch, daemon=True)
+            t.start()
+            self._threads.append(t)
+        else:
+            ok = self.retire(decision.port)
+            if ok:
+                self.replicas.pop(decision.port, None)
+            self._record(ScaleEvent(now, decision, "stopped" if ok else "could not stop it"))
+
+    def step(self) -> Decision:
+        now = self.clock()
+        self.observe(now)
+        decision = self.decide(now)
+        self.act(decision, now)
+        return decision
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Wait for the launches started so far."""
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = [t for t in self._threads if t.is_alive()]
+
+    def run(self, interval: float = DEFAULT_INTERVAL, on_step: Optional[Callable[[Decision], None]] = None,
+            sleep: Callable[[float], None] = time.sleep) -> None:
+        while True:
+            decision = self.step()
+            if on_step:
+                on_step(decision)
+            sleep(interval)
+
+
+def is_managed(port: int) -> bool:
+    """Whether vllmctl started the server behind port (and so knows how to stop it)."""
+    ep = get_registry().get(port)
+    return bool(ep and ep.host and ep.extra.get("remote_session"))
+
+
+def place_replica(
+    hosts: Iterable[str],
+    vllm_extra_args: List[str],
+    model_memory: Optional[int] = None,
+    query=None,
+) -> Optional[Placement]:
+    """Best host (and devices) for one more replica, or None if no host has room."""
+    tp = int(arg_value(vllm_extra_args, ["--tensor-parallel-size", "-tp", "-t"]) or 1)
+    gpu_util = float(arg_value(vllm_extra_args, ["--gpu-memory-utilization"]) or DEFAULT_GPU_MEMORY_UTILIZATION)
+    kwargs = {"query": query} if query else {}
+    placements = rank_hosts(hosts, tp, model_memory, gpu_util, **kwargs)
+    return next((p for p in placements if p.feasible), None)
+
+
+def free_remote_port(host: str) -> Optional[int]:
+    found = remote_ports_and_sessions(host)
+    if found is None:
+        return None
+    return pick_remote_port(*found, start=REMOTE_PORT_RANGE[0] - 1)
+
+
+def retire_replica(port: int, drain_timeout: float = DEFAULT_DRAIN_TIMEOUT) -> bool:
+    """Drain the replica behind port, stop its remote server and remove its forward."""
+    ep = get_registry().get(port)
+    if ep is None or not ep.host or not ep.extra.get("remote_session"):
+        return False
+    drained, _ = drain(port, drain_timeout)
+    if not drained:
+        return False
+    stopped = stop_remote_session(ep.host, ep.extra["remote_session"])
+    remove_forward(ep.host, ep.remote_port, port)
+    return stopped
@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+DEFAULT_MAX_WORKERS = 32
+DEFAULT_HOST_TIMEOUT = 5.0
+# Extra time a host gets past its own timeout before the engine gives up on it.
+HOST_GRACE = 1.0
+
+
+@dataclass
+class HostResult:
+    host: str
+    value: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.timed_out
+
+
+def fan_out(
+    hosts: Iterable[str],
+    fn: Callable[[str, float], Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    host_timeout: float = DEFAULT_HOST_TIMEOUT,
+    deadline: Optional[float] = None,
+) -> Iterator[HostResult]:
+    """
+    Run ``fn(host, host_timeout)`` for every host on a bounded thread pool and yield
+    a HostResult per host as soon as it finishes.
+
+    ``fn`` is expected to honour its timeout argument (e.g. pass it to run_ssh_command);
+    a host still running ``host_timeout + HOST_GRACE`` seconds after it started is
+    reported as timed out and its late result is dropped. ``deadline`` bounds the
+    whole fan-out in seconds: hosts that have not finished by then are reported as
+    timed out, including ones that never got a worker.
+    """
+    hosts = list(hosts)
+    if not hosts:
+        return
+    started: Dict[str, float] = {}
+    started_lock = threading.Lock()
+
+    def run(host):
+        begin = time.monotonic()
+        with started_lock:
+            started[host] = begin
+        return fn(host, host_timeout), time.monotonic() - begin
+
+    t0 = time.monotonic()
+    global_end = t0 + deadline if deadline is not None else None
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(hosts))))
+    try:
+        futures = {executor.submit(run, host): host for host in hosts}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            with started_lock:
+                host_ends = [started[futures[f]] + host_timeout + HOST_GRACE for f in pending if futures[f] in started]
+            wake = min(host_ends) if host_ends else None
+            if global_end is not None:
+                wake = global_end if wake is None else min(wake, global_end)
+            done, pending = wait(pending, timeout=None if wake is None else max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                host = futures[future]
+                try:
+                    value, elapsed = future.result()
+                    yield HostResult(host=host, value=value, elapsed=elapsed)
+                except Exception as e:
+                    with started_lock:
+                        elapsed = time.monotonic() - started.get(host, t0)
+                    yield HostResult(host=host, error=str(e), elapsed=elapsed)
+            now = time.monotonic()
+            expired = set()
+            with started_lock:
+                for future in pending:
+                    begin = started.get(futures[future])
+                    if begin is not None and now - begin >= host_timeout + HOST_GRACE:
+                        expired.add(future)
+            if global_end is not None and now >= global_end:
+                expired = set(pending)
+            for future in expired:
+                future.cancel()
+                host = futures[future]
+                with started_lock:
+                    elapsed = now - started[host] if host in started else 0.0
+                yield HostResult(host=host, elapsed=elapsed, timed_out=True)
+            pending -= expired
+    finally:
+        # Never block on stragglers: their subprocess timeouts will reap them.
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -1,15 +1,28 @@
+import os
+import shlex
+import socket
 import subprocess
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from .ssh_utils import list_remote_models, run_ssh_command
-from .vllm_probe import get_ssh_forwardings, get_listening_ports, get_tmux_sessions, ping_vllm
-from rich.progress import track
+from .fanout import fan_out, DEFAULT_MAX_WORKERS, DEFAULT_HOST_TIMEOUT
+from .vllm_probe import get_ssh_forwardings, get_listening_ports, get_tmux_sessions, ping_vllm, get_tmux_ssh_forwards
+from .snapshot import collect_snapshot
+from .registry import get_registry
+from .statefile import state_path
+from .port_alloc import get_port_allocator
+from .tunnels import get_tunnel_manager, mux_session_name, MUX_SESSION_PREFIX
 import psutil
 import re
 from rich.console import Console
 from dataclasses import dataclass
 from typing import Optional
+from .instrument import run_command
 
 TMUX_PREFIX = "vllmctl_"
+# Seconds to wait for a new tunnel's local port before reporting it as not up.
+TUNNEL_TIMEOUT = 10.0
+DEFAULT_TUNNEL_WORKERS = 16
 console = Console()
 
 @dataclass
@@ -23,15 +36,15 @@ class ForwardSession:
     alive: bool = False
     reason: Optional[str] = None
 
-    def check_alive(self):
+    def check_alive(self, snapshot=None):
         # Check if local tmux session exists for the SSH tunnel
         session_name = f"vllmctl_{self.server}_{self.remote_port}_{self.local_port}"
-        tmux_sessions = get_tmux_sessions()  # This should list local tmux sessions
-        tmux_exists = session_name in tmux_sessions
+        tmux_sessions = snapshot.tmux_sessions if snapshot is not None else get_tmux_sessions()
+        tmux_exists = session_name in tmux_sessions or mux_session_name(self.server) in tmux_sessions
         # Check if model API responds
         model_alive = False
         try:
-            info = ping_vllm(self.local_port)
+            info = snapshot.ping(self.local_port) if snapshot is not None else ping_vllm(self.local_port)
             if info and 'data' in info and info['data']:
                 model_alive = True
         except Exception:
@@ -45,160 +58,308 @@ class ForwardSession:
             self.reason = None
         return self.alive
 
-def find_free_local_port(port_range=(16100, 16199)):
+@dataclass
+class TunnelResult:
+    """Outcome of starting a tunnel: 'up', 'failed' (ssh exited), 'timeout', or 'started' (not watched)."""
+    status: str
+    local_port: int
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.status in ("up", "started")
+
+def find_free_local_port(port_range=(16100, 16199), exclude=()):
     """
-    Find a free local port in the given range (tuple).
+    Find a free local port in the given range (tuple) and reserve it for this process,
+    so concurrent vllmctl runs do not pick the same one.
     Args:
         port_range: Tuple (start, end) of port range.
+        exclude: Ports already handed out but possibly not listening yet.
     Returns:
         An available port number, or None if none are available.
     """
-    used = set(get_listening_ports())
+    try:
+        return get_port_allocator().reserve(port_range, busy=get_listening_ports(), exclude=exclude)
+    except OSError as e:
+        console.print(f"[yellow]Warning: port reservations unavailable ({e}), picking without them[/yellow]")
+    used = set(get_listening_ports()) | set(exclude)
     for port in range(port_range[0], port_range[1]+1):
         if port not in used:
             return port
     return None
 
-def create_tmux_ssh_forward(session_name, host, remote_port, local_port):
+def release_local_port(port):
+    """Give back a port from find_free_local_port whose tunnel never came up."""
+    try:
+        get_port_allocator().release(port)
+    except OSError:
+        pass
+
+def port_accepts(port, timeout=0.05):
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def wait_for_tunnel(local_port, pid, timeout=TUNNEL_TIMEOUT, poll=0.05, error_file=None):
+    """
+    Wait until local_port accepts connections (the tunnel is up) or process pid exits
+    (ssh gave up, e.g. ExitOnForwardFailure); returns a TunnelResult either way.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if port_accepts(local_port):
+            return TunnelResult("up", local_port)
+        if not psutil.pid_exists(pid):
+            return TunnelResult("failed", local_port, _read_error(error_file) or "ssh exited")
+        if time.monotonic() >= deadline:
+            return TunnelResult("timeout", local_port, f"port {local_port} not up after {timeout:.0f}s")
+        time.sleep(poll)
+
+def _read_error(path):
+    if not path:
+        return None
+    try:
+        with open(path) as f:
+            lines = [l.strip() for l in f if l.strip()]
+    except OSError:
+        return None
+    return lines[-1] if lines else None
+
+def create_tmux_ssh_forward(session_name, host, remote_port, local_port, timeout=TUNNEL_TIMEOUT):
     """
     Create a local tmux session that runs an SSH tunnel forwarding local_port to remote_port on host.
     The session name is always vllmctl_{host}_{remote_port}_{local_port}.
+    Returns a TunnelResult as soon as the local port accepts connections or ssh exits
+    (with ssh's last stderr line as the error). A tunnel that is not up within timeout
+    is killed, and only a tunnel that is up (or started unwatched) is registered.
     """
     session_name = f"vllmctl_{host}_{remote_port}_{local_port}"
+    error_file = state_path(f"{session_name}.err")
     cmd = [
-        "tmux", "new-session", "-d", "-s", session_name,
-        f"ssh -N -L {local_port}:localhost:{remote_port} {host}"
+        "tmux", "new-session", "-d", "-P", "-F", "#{pane_pid}", "-s", session_name,
+        f"exec ssh -N -o ExitOnForwardFailure=yes -L {local_port}:localhost:{remote_port} {host} 2>{shlex.quote(error_file)}"
     ]
     try:
-        subprocess.run(cmd, check=True)
-        time.sleep(1)
+        proc = run_command(cmd, check=True, capture_output=True, text=True)
+        pane_pid = str(getattr(proc, "stdout", "") or "").strip()
+        if pane_pid.isdigit():
+            result = wait_for_tunnel(local_port, int(pane_pid), timeout=timeout, error_file=error_file)
+        else:
+            result = TunnelResult("started", local_port)
+        if result.status == "timeout":
+            # A late ssh would bind a port the caller gives back as failed: stop it now.
+            # Whatever the registry already says about this port (a supervised forward
+            # being reconnected) is left as it was.
+            run_command(["tmux", "kill-session", "-t", session_name], capture_output=True, text=True)
+        if not result.ok:
+            return result
+        try:
+            get_registry().register(local_port, host=host, remote_port=remote_port, tmux_session=session_name)
+        except OSError as e:
+            console.print(f"[yellow]Warning: could not record forward in the endpoint registry: {e}[/yellow]")
+        return result
     except FileNotFoundError:
         console.print("[red]Error: 'tmux' or 'ssh' not found. Please install them (sudo apt install tmux openssh-client).[/red]")
+        return TunnelResult("failed", local_port, "tmux or ssh not found")
     except subprocess.CalledProcessError as e:
         console.print(f"[red]Failed to create tmux SSH forward: {e}[/red]")
+        return TunnelResult("failed", local_port, str(e))
     except Exception as e:
         console.print(f"[red]Unexpected error in create_tmux_ssh_forward: {e}[/red]")
+        return TunnelResult("failed", local_port, str(e))
+
+def create_forward(host, remote_port, local_port, mux=False):
+    """
+    Forward local_port to remote_port on host: through the host's shared ssh master
+    when mux is set, otherwise with a dedicated ssh process in its own tmux session.
+    """
+    if mux:
+        ok = get_tunnel_manager().add_forward(host, local_port, remote_port)
+        return TunnelResult("up" if ok else "failed", local_port, None if ok else "ssh -O forward failed")
+    return create_tmux_ssh_forward(None, host, remote_port, local_port)
+
+def create_forwards(specs, mux=False, max_workers=DEFAULT_TUNNEL_WORKERS):
+    """Create several (host, remote_port, local_port) forwards concurrently; returns TunnelResults in order."""
+    specs = list(specs)
+    if not specs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(specs))) as pool:
+        return list(pool.map(lambda spec: create_forward(*spec, mux=mux), specs))
+
+def remove_forward(host, remote_port, local_port):
+    """Tear down a forward made by create_forward, whichever way it was made."""
+    try:
+        endpoint = get_registry().get(local_port)
+    except OSError:
+        endpoint = None
+    if endpoint is not None and endpoint.extra.get("mux"):
+        get_tunnel_manager().cancel_forward(host, local_port, remote_port)
+    else:
+        kill_tmux_session(f"vllmctl_{host}_{remote_port}_{local_port}")
 
 def auto_forward_ports(
     hosts,
     remote_port=8000,
     local_range=(16100, 16199),
     no_kill=False,
-    debug=False
+    debug=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    host_timeout=DEFAULT_HOST_TIMEOUT,
+    deadline=None,
+    mux=False
+):
+    return list(iter_auto_forward(
+        hosts,
+        remote_port=remote_port,
+        local_range=local_range,
+        no_kill=no_kill,
+        debug=debug,
+        max_workers=max_workers,
+        host_timeout=host_timeout,
+        deadline=deadline,
+        mux=mux
+    ))
+
+def iter_auto_forward(
+    hosts,
+    remote_port=8000,
+    local_range=(16100, 16199),
+    no_kill=False,
+    debug=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    host_timeout=DEFAULT_HOST_TIMEOUT,
+    deadline=None,
+    mux=False
 ):
-    results = []
+    """
+    Probe all hosts concurrently and yield (host, remote_port, local_port, status, model)
+    as each host answers. remote_port=None forwards every vLLM instance found on a host.
+    Local ports are allocated from the calling thread, so allocation never races, and the
+    tunnels are then opened concurrently; each row is yielded once its tunnel is up or has
+    failed. With mux=True all forwards to a host share one ssh connection.
+    """
     ssh_forwards = get_ssh_forwardings()
     tmux_sessions = get_tmux_sessions()
-    for host in track(hosts, description="Auto-forward..."):
-        models = list_remote_models(host, port=remote_port)
-        has_model = bool(models)
-        model_name = None
-        if has_model:
-            info = list(models.values())[0]
-            model_name = info['data'][0]['id'] if info.get('data') and info['data'] else 'unknown'
-        already = False
-        local_port = None
-        for lport, (h, rport, pid) in ssh_forwards.items():
-            if h == host and rport == remote_port:
-                already = True
-                local_port = lport
-                break
-        session_name = f"vllmctl_{host}_{remote_port}_{local_port if local_port else ''}"
-        if has_model and not already:
-            if any(s.startswith(f"vllmctl_{host}_{remote_port}_") for s in tmux_sessions):
-                local_port_dup = None
-                for lport, (h, rport, pid) in ssh_forwards.items():
-                    if h == host and rport == remote_port:
-                        local_port_dup = lport
-                        break
-                # Try to ping model on local_port_dup
-                model_id = None
-                if local_port_dup:
-                    model_info = ping_vllm(local_port_dup)
-                    if model_info and 'data' in model_info and model_info['data']:
-                        model_id = model_info['data'][0].get('id', None)
-                results.append((host, remote_port, local_port_dup, f"Duplicate session: vllmctl_{host}_{remote_port}_{local_port_dup}", model_id or model_name))
+    claimed = set()
+    pending = set()
+    probe = lambda host, timeout: list_remote_models(host, port=remote_port, timeout=timeout)
+    with ThreadPoolExecutor(max_workers=DEFAULT_TUNNEL_WORKERS) as tunnels:
+        for res in fan_out(hosts, probe, max_workers=max_workers, host_timeout=host_timeout, deadline=deadline):
+            done = {f for f in pending if f.done()}
+            pending -= done
+            for future in done:
+                yield future.result()
+            if not res.ok:
+                if debug:
+                    reason = "Timed out" if res.timed_out else f"Error: {res.error}"
+                    yield (res.host, remote_port if remote_port is not None else "-", None, reason, None)
                 continue
-            local_port = find_free_local_port(local_range)
-            if not local_port:
-                results.append((host, remote_port, None, "No free local ports", model_name))
-                continue
-            create_tmux_ssh_forward(None, host, remote_port, local_port)
-            # After creating, ping the model
+            # Without an explicit remote port every discovered instance is forwarded, and
+            # existing forwards to ports that no longer serve a model are cleaned up.
+            ports = set(res.value)
+            if remote_port is not None:
+                ports.add(remote_port)
+            else:
+                ports |= {rport for h, rport, pid in ssh_forwards.values() if h == res.host}
+            for rport in sorted(ports):
+                result = _forward_host(
+                    res.host, res.value.get(rport), rport, local_range, no_kill,
+                    ssh_forwards, tmux_sessions, mux, claimed, tunnels
+                )
+                if isinstance(result, Future):
+                    pending.add(result)
+                elif result:
+                    yield result
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def _open_forward(host, remote_port, local_port, model_name, mux):
+    tunnel = create_forward(host, remote_port, local_port, mux=mux)
+    if not tunnel.ok:
+        release_local_port(local_port)
+        status = "Tunnel timed out" if tunnel.status == "timeout" else "Tunnel failed"
+        return (host, remote_port, local_port, f"{status}: {tunnel.error}", model_name)
+    # After creating, ping the model
+    model_id = None
+    model_info = ping_vllm(local_port)
+    if model_info and 'data' in model_info and model_info['data']:
+        model_id = model_info['data'][0].get('id', None)
+    return (host, remote_port, local_port, "Forwarded", model_id or model_name)
+
+def _forward_host(host, info, remote_port, local_range, no_kill, ssh_forwards, tmux_sessions, mux=False, claimed=None, tunnels=None):
+    """
+    Decide what to do with one remote port and return the result row. New tunnels are
+    submitted to the ``tunnels`` executor when given; the caller then gets a Future.
+    """
+    has_model = bool(info)
+    model_name = None
+    if has_model:
+        model_name = info['data'][0]['id'] if info.get('data') and info['data'] else 'unknown'
+    already = False
+    local_port = None
+    for lport, (h, rport, pid) in ssh_forwards.items():
+        if h == host and rport == remote_port:
+            already = True
+            local_port = lport
+            break
+    if has_model and not already:
+        if any(s.startswith(f"vllmctl_{host}_{remote_port}_") for s in tmux_sessions):
+            local_port_dup = None
+            for lport, (h, rport, pid) in ssh_forwards.items():
+                if h == host and rport == remote_port:
+                    local_port_dup = lport
+                    break
+            # Try to ping model on local_port_dup
             model_id = None
+            if local_port_dup:
+                model_info = ping_vllm(local_port_dup)
+                if model_info and 'data' in model_info and model_info['data']:
+                    model_id = model_info['data'][0].get('id', None)
+            return (host, remote_port, local_port_dup, f"Duplicate session: vllmctl_{host}_{remote_port}_{local_port_dup}", model_id or model_name)
+        if claimed is None:
+            claimed = set()
+        local_port = find_free_local_port(local_range, exclude=claimed)
+        if not local_port:
+            return (host, remote_port, None, "No free local ports", model_name)
+        claimed.add(local_port)
+        if tunnels is not None:
+            return tunnels.submit(_open_forward, host, remote_port, local_port, model_name, mux)
+        return _open_forward(host, remote_port, local_port, model_name, mux)
+    elif has_model and already:
+        # Always ping model on local_port and show model name if available
+        model_id = None
+        if local_port:
             model_info = ping_vllm(local_port)
             if model_info and 'data' in model_info and model_info['data']:
                 model_id = model_info['data'][0].get('id', None)
-            results.append((host, remote_port, local_port, "Forwarded", model_id or model_name))
-        elif has_model and already:
-            # Always ping model on local_port and show model name if available
-            model_id = None
-            if local_port:
-                model_info = ping_vllm(local_port)
-                if model_info and 'data' in model_info and model_info['data']:
-                    model_id = model_info['data'][0].get('id', None)
-            results.append((host, remote_port, local_port, "Already forwarded", model_id or model_name))
-        elif not has_model and already and not no_kill:
-            kill_tmux_session(session_name)
-            results.append((host, remote_port, local_port, "Forward killed (model not found)", None))
-        elif not has_model and already and no_kill:
-            results.append((host, remote_port, local_port, "Forward kept (model not found, no-kill)", None))
-        else:
-            pass
-    return results
+        return (host, remote_port, local_port, "Already forwarded", model_id or model_name)
+    elif not has_model and already and not no_kill:
+        remove_forward(host, remote_port, local_port)
+        return (host, remote_port, local_port, "Forward killed (model not found)", None)
+    elif not has_model and already and no_kill:
+        return (host, remote_port, local_port, "Forward kept (model not found, no-kill)", None)
+    return None
 
 def get_tmux_ports():
-    try:
-        result = subprocess.run(["tmux", "ls"], capture_output=True, text=True)
-        if result.returncode != 0:
-            raise FileNotFoundError
-        sessions = []
-        for line in result.stdout.splitlines():
-            if line.startswith("vllmctl_"):
-                name = line.split(':')[0]
-                sessions.append(name)
-        tmux_ports = {}
-        for session in sessions:
-            try:
-                pid_out = subprocess.run(
-                    ["tmux", "list-panes", "-t", session, "-F", "#{pane_pid}"],
-                    capture_output=True, text=True
-                )
-                for pid_str in pid_out.stdout.splitlines():
-                    try:
-                        pid = int(pid_str)
-                        proc = psutil.Process(pid)
-                        for child in proc.children(recursive=True):
-                            if child.name() == "ssh":
-                                cmdline = " ".join(child.cmdline())
-                                m = re.search(r"-L\s*(\d+):localhost:(\d+)", cmdline)
-                                if m:
-                                    local_port = int(m.group(1))
-                                    remote_port = int(m.group(2))
-                                    tmux_ports[local_port] = {
-                                        "session": session,
-                                        "remote_port": remote_port,
-                                        "ssh_cmd": cmdline
-                                    }
-                    except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
-                        console.print(f"[yellow]Warning: Could not inspect process {pid_str}: {e}[/yellow]")
-                    except Exception as e:
-                        console.print(f"[yellow]Unexpected error inspecting process {pid_str}: {e}[/yellow]")
-            except FileNotFoundError:
-                console.print("[red]Error: 'tmux' not found. Please install tmux.[/red]")
-            except Exception as e:
-                console.print(f"[red]Error running 'tmux list-panes': {e}[/red]")
-        return tmux_ports
-    except FileNotFoundError:
-        console.print("[red]Error: 'tmux' not found. Please install tmux.[/red]")
-        return {}
-    except Exception as e:
-        console.print(f"[red]Error running 'tmux ls': {e}[/red]")
-        return {}
+    tmux_ports = {}
+    for session, forwards in get_tmux_ssh_forwards().items():
+        for local_port, remote_port, cmdline in forwards:
+            tmux_ports[local_port] = {
+                "session": session,
+                "remote_port": remote_port,
+                "ssh_cmd": cmdline
+            }
+    return tmux_ports
 
 def kill_tmux_session(session_name):
     try:
-        subprocess.run(["tmux", "kill-session", "-t", session_name], check=True)
+        run_command(["tmux", "kill-session", "-t", session_name], check=True)
+        forget_tmux_session(session_name)
     except FileNotFoundError:
         console.print("[red]Error: 'tmux' not found. Please install tmux.[/red]")
     except subprocess.CalledProcessError as e:
@@ -206,29 +367,48 @@ def kill_tmux_session(session_name):
     except Exception as e:
         console.print(f"[red]Unexpected error killing tmux session {session_name}: {e}[/red]")
 
-def list_forward_sessions():
+def forget_tmux_session(session_name):
+    """
+    Drop the registry entries of a forward session: the one port of a
+    vllmctl_{host}_{remote_port}_{local_port} session, or every forward of a shared master.
+    """
+    try:
+        os.remove(state_path(f"{session_name}.err"))
+    except OSError:
+        pass
+    try:
+        registry = get_registry()
+        if session_name.startswith(MUX_SESSION_PREFIX):
+            registry.remove([p for p, ep in registry.all().items() if ep.tmux_session == session_name])
+            return
+        m = re.match(r"vllmctl_(.+)_(\d+)_(\d+)$", session_name)
+        if m:
+            registry.remove([int(m.group(3))])
+    except OSError:
+        pass
+
+def list_forward_sessions(snapshot=None):
     """
     Returns a list of ForwardSession objects for all current forwards.
     Checks for local tmux sessions for SSH tunnels using the correct session name pattern.
+    State is collected once (or taken from ``snapshot``) and shared by every session.
     """
-    ssh_forwards = get_ssh_forwardings()
-    tmux_sessions = get_tmux_sessions()
+    if snapshot is None:
+        snapshot = collect_snapshot(forwards_only=True)
+    tmux_sessions = snapshot.tmux_sessions
     sessions = []
-    for local_port, (server, remote_port, pid) in ssh_forwards.items():
+    for local_port, (server, remote_port, pid) in snapshot.ssh_forwards.items():
         session_name = f"vllmctl_{server}_{remote_port}_{local_port}"
+        if session_name not in tmux_sessions and mux_session_name(server) in tmux_sessions:
+            session_name = mux_session_name(server)
         tmux_exists = session_name in tmux_sessions
-        # Try to get model name
-        model_name = None
-        info = ping_vllm(local_port)
-        if info and 'data' in info and info['data']:
-            model_name = info['data'][0].get('id', None)
         session = ForwardSession(
             local_port=local_port,
             remote_port=remote_port,
             server=server,
             tmux_session=session_name if tmux_exists else None,
-            model_name=model_name
+            model_name=snapshot.model_id(local_port)
         )
-        session.check_alive()
+        session.check_alive(snapshot)
         sessions.append(session)
     return sessions 
\ No newline at end of file
@@ -0,0 +1,387 @@
+import json
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+
+from .http_pool import HTTPSessionPool
+from .metrics import scrape_metrics, prefix_cache_hit_rate, prefix_cache_counters
+from .response_cache import ResponseCache, cache_key, is_cacheable
+from .routing import RingCache, routing_key, DEFAULT_LOAD_FACTOR
+from .snapshot import collect_known_snapshot
+
+PROXY_PATHS = ("/v1/completions", "/v1/chat/completions")
+DEFAULT_GATEWAY_PORT = 18000
+DEFAULT_HEALTH_INTERVAL = 5.0
+# Consecutive failed requests after which a replica is ejected until a health check passes.
+DEFAULT_MAX_FAILURES = 3
+CONNECT_TIMEOUT = 2.0
+# Generation can take minutes; this bounds the wait between two chunks, not the whole reply.
+READ_TIMEOUT = 600.0
+FORWARDED_HEADERS = ("Authorization", "Accept", "User-Agent")
+
+
+@dataclass
+class Replica:
+    port: int
+    model: str
+    host: Optional[str] = None
+    card: dict = field(default_factory=dict)  # /v1/models entry of the model
+    outstanding: int = 0
+    waiting: float = 0.0
+    healthy: bool = True
+    failures: int = 0
+    served: int = 0
+    errors: int = 0
+    prefix_hit_rate: Optional[float] = None
+
+    @property
+    def load(self) -> float:
+        return self.outstanding + self.waiting
+
+
+class ReplicaPool:
+    """
+    Replicas of each model (forwarded vLLM ports) with their routing state.
+
+    ``pick`` chooses the healthy replica with the fewest outstanding gateway requests
+    plus vLLM's own queue (``vllm:num_requests_waiting``, from the last health check),
+    breaking ties at random. With ``sticky`` and a routing key (conversation id or
+    prompt prefix) it uses bounded-load consistent hashing instead, so related requests
+    hit the same replica's prefix cache unless that replica is over its share of load.
+    Replicas failing ``max_failures`` requests in a row, or a health check, are ejected
+    until a health check passes again.
+    """
+
+    def __init__(self, max_failures: int = DEFAULT_MAX_FAILURES, rng: Optional[random.Random] = None,
+                 sticky: bool = False, load_factor: float = DEFAULT_LOAD_FACTOR):
+        self.max_failures = max_failures
+        self.rng = rng or random.Random()
+        self.sticky = sticky
+        self.rings = RingCache(load_factor=load_factor)
+        self._replicas: Dict[tuple, Replica] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(replica: Replica) -> tuple:
+        return (replica.port, replica.model)
+
+    def update(self, replicas: Iterable[Replica]) -> None:
+        """Replace the replica set, keeping counters of replicas that are still there."""
+        with self._lock:
+            fresh = {}
+            for r in replicas:
+                old = self._replicas.get(self._key(r))
+                fresh[self._key(r)] = old if old is not None else r
+            self._replicas = fresh
+
+    def models(self) -> List[str]:
+        with self._lock:
+            return sorted({r.model for r in self._replicas.values()})
+
+    def cards(self) -> List[dict]:
+        with self._lock:
+            seen = {}
+            for r in self._replicas.values():
+                seen.setdefault(r.model, r.card or {"id": r.model, "object": "model"})
+            return [seen[m] for m in sorted(seen)]
+
+    def resolve(self, model: Optional[str]) -> Optional[str]:
+        """Model id to route to: the requested one, or the only one served when none is given."""
+        models = self.models()
+        if model in models:
+            return model
+        if model is None and len(models) == 1:
+            return models[0]
+        return None
+
+    def pick(self, model: str, exclude: Iterable[int] = (), key: Optional[str] = None) -> Optional[Replica]:
+        excluded = set(exclude)
+        with self._lock:
+            candidates = [
+                r for r in self._replicas.values()
+                if r.model == model and r.healthy and r.port not in excluded
+            ]
+            if not candidates:
+                return None
+            if self.sticky and key is not None:
+                by_port = {r.port: r for r in candidates}
+                ring = self.rings.get(by_port)
+                replica = by_port[ring.pick(key, load=lambda port: by_port[port].load)]
+            else:
+                best = min(r.load for r in candidates)
+                replica = self.rng.choice([r for r in candidates if r.load == best])
+            replica.outstanding += 1
+            return replica
+
+    def release(self, replica: Replica, ok: bool) -> None:
+        with self._lock:
+            replica.outstanding -= 1
+            if ok:
+                replica.served += 1
+                replica.failures = 0
+            else:
+                replica.errors += 1
+                replica.failures += 1
+                if replica.failures >= self.max_failures:
+                    replica.healthy = False
+
+    def set_health(self, port: int, healthy: bool, waiting: Optional[float] = None,
+                   prefix_hit_rate: Optional[float] = None) -> None:
+        with self._lock:
+            for r in self._replicas.values():
+                if r.port == port:
+                    r.healthy = healthy
+                    if healthy:
+                        r.failures = 0
+                    if waiting is not None:
+                        r.waiting = waiting
+                    if prefix_hit_rate is not None:
+                        r.prefix_hit_rate = prefix_hit_rate
+
+    def ports(self) -> List[int]:
+        with self._lock:
+            return sorted({r.port for r in self._replicas.values()})
+
+    def snapshot(self) -> List[Replica]:
+        with self._lock:
+            return [replace(r) for _, r in sorted(self._replicas.items())]
+
+
+def discover_replicas(scan: bool = False, exclude_ports: Iterable[int] = ()) -> List[Replica]:
+    """Replicas from the local vLLM endpoints (registered ones, or every port with scan)."""
+    snapshot = collect_known_snapshot(scan=scan)
+    excluded = set(exclude_ports)
+    replicas = []
+    for port, info in sorted(snapshot.models.items()):
+        if port in excluded or not info or not info.get('data'):
+            continue
+        host = snapshot.ssh_forwards.get(port, (None,))[0]
+        for card in info['data']:
+            if card.get('id'):
+                replicas.append(Replica(port=port, model=card['id'], host=host, card=card))
+    return replicas
+
+
+class Gateway:
+    """
+    OpenAI-compatible proxy in front of a ReplicaPool.
+
+    Serves GET /v1/models (the union of the replicas' models) and proxies POSTs to
+    /v1/completions and /v1/chat/completions to a replica of the requested model,
+    relaying streamed responses chunk by chunk. A replica that cannot be reached is
+    skipped and the request retried on the next one, as long as nothing has been
+    sent to the client yet. A background thread re-discovers replicas and health-checks
+    them (GET /v1/models plus a /metrics scrape) every ``health_interval`` seconds.
+    With a ResponseCache, deterministic requests (temperature 0, not streamed) are
+    answered from the cache when an identical request has been seen before.
+    """
+
+    def __init__(
+        self,
+        pool: ReplicaPool,
+        bind: str = "127.0.0.1",
+        port: int = DEFAULT_GATEWAY_PORT,
+        discover: Optional[Callable[[], List[Replica]]] = None,
+        health_interval: float = DEFAULT_HEALTH_INTERVAL,
+        http: Optional[HTTPSessionPool] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.pool = pool
+        self.cache = cache
+        self.discover = discover
+        self.health_interval = health_interval
+        self.http = http or HTTPSessionPool(pool_maxsize=64)
+        self.requests = 0
+        self.retries = 0
+        self._counts_lock = threading.Lock()  # handlers run on their own threads
+        self._prefix_counters: Dict[int, Optional[tuple]] = {}
+        self._stop = threading.Event()
+        handler = type("GatewayHandler", (_GatewayHandler,), {"gateway": self})
+        self.server = ThreadingHTTPServer((bind, port), handler)
+        self.server.daemon_threads = True
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> None:
+        if self.discover is not None:
+            self.pool.update(self.discover())
+        self.check_health()
+        for target in (self.server.serve_forever, self._health_loop):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self.http.close()
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(self.health_interval):
+            try:
+                if self.discover is not None:
+                    self.pool.update(self.discover())
+                self.check_health()
+            except Exception:
+                pass
+
+    def check_health(self) -> None:
+        ports = self.pool.ports()
+        if not ports:
+            return
+
+        def check(port):
+            try:
+                healthy = self.http.get(port, "/v1/models", timeout=1.0).status_code == 200
+            except Exception:
+                healthy = False
+            metrics = scrape_metrics(port, pool=self.http) if healthy else None
+            waiting = metrics.get('vllm:num_requests_waiting') if metrics else None
+            hit_rate = prefix_cache_hit_rate(metrics, self._prefix_counters.get(port))
+            if metrics:
+                self._prefix_counters[port] = prefix_cache_counters(metrics)
+            self.pool.set_health(port, healthy, waiting, hit_rate)
+
+        with ThreadPoolExecutor(max_workers=min(16, len(ports))) as executor:
+            list(executor.map(check, ports))
+
+    def _store(self, key: str, content_type: str, content: bytes) -> None:
+        try:
+            self.cache.put(key, 200, content_type, content)
+        except sqlite3.Error:
+            pass
+
+    def _count(self, retry: bool = False) -> None:
+        with self._counts_lock:
+            if retry:
+                self.retries += 1
+            else:
+                self.requests += 1
+
+    def proxy(self, handler: BaseHTTPRequestHandler, path: str) -> None:
+        self._count()
+        body = handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return _send_error(handler, 400, "Request body is not valid JSON")
+        model = self.pool.resolve(payload.get("model"))
+        if model is None:
+            return _send_error(handler, 404, f"Model {payload.get('model')!r} is not served by any replica")
+        key = None
+        if self.cache is not None and is_cacheable(payload):
+            key = cache_key(path, model, payload)
+            try:
+                cached = self.cache.get(key)
+            except sqlite3.Error:
+                cached = key = None  # a broken cache must not take the gateway down
+            if cached is not None:
+                status, content_type, content = cached
+                handler.send_response(status)
+                handler.send_header("Content-Type", content_type)
+                handler.send_header("Content-Length", str(len(content)))
+                handler.send_header("X-Vllmctl-Cache", "hit")
+                handler.end_headers()
+                handler.wfile.write(content)
+                return
+        headers = {"Content-Type": "application/json"}
+        for name in FORWARDED_HEADERS:
+            if handler.headers.get(name):
+                headers[name] = handler.headers[name]
+        route = routing_key(payload, handler.headers) if self.pool.sticky else None
+        tried = set()
+        while True:
+            replica = self.pool.pick(model, exclude=tried, key=route)
+            if replica is None:
+                return _send_error(handler, 503, f"No healthy replica for model {model!r}")
+            tried.add(replica.port)
+            try:
+                resp = self.http.request(
+                    "POST", replica.port, path, data=body, headers=headers,
+                    stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+                )
+            except requests.RequestException:
+                self.pool.release(replica, ok=False)
+                self._count(retry=True)
+                continue
+            ok = resp.status_code < 500
+            try:
+                content = _relay(handler, resp)
+                if key is not None and content is not None and resp.status_code == 200:
+                    self._store(key, resp.headers.get("Content-Type", "application/json"), content)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client went away; the replica did nothing wrong
+            except requests.RequestException:
+                ok = False
+            finally:
+                resp.close()
+                self.pool.release(replica, ok)
+            return
+
+
+def _send_json(handler: BaseHTTPRequestHandler, status: int, data) -> None:
+    body = json.dumps(data).encode()
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def _send_error(handler: BaseHTTPRequestHandler, status: int, message: str) -> None:
+    _send_json(handler, status, {"error": {"message": message, "type": "invalid_request_error", "code": status}})
+
+
+def _relay(handler: BaseHTTPRequestHandler, resp: requests.Response) -> Optional[bytes]:
+    """Send resp to the client; returns the body when it was read whole (not streamed)."""
+    handler.send_response(resp.status_code)
+    handler.send_header("Content-Type", resp.headers.get("Content-Type", "application/json"))
+    if "Content-Length" in resp.headers:
+        content = resp.content
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+        return content
+    # Streamed (SSE) or unknown length: pass chunks on as they arrive.
+    handler.send_header("Transfer-Encoding", "chunked")
+    handler.end_headers()
+    for chunk in resp.iter_content(chunk_size=None):
+        if chunk:
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            handler.wfile.flush()
+    handler.wfile.write(b"0\r\n\r\n")
+    return None
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    gateway: Gateway = None
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/v1/models":
+            return _send_json(self, 200, {"object": "list", "data": self.gateway.pool.cards()})
+        if path == "/health":
+            healthy = any(r.healthy for r in self.gateway.pool.snapshot())
+            return _send_json(self, 200 if healthy else 503, {"healthy": healthy})
+        _send_error(self, 404, f"Unknown path {path}")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        if path in PROXY_PATHS:
+            return self.gateway.proxy(self, path)
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        _send_error(self, 404, f"Unknown path {path}")
+
+    def log_message(self, *args):
+        pass
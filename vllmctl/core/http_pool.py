@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .instrument import count_call
+
+LOCAL_HOST = "127.0.0.1"
+# Keep-alive connections kept per port; the dashboard needs one, a gateway a few.
+DEFAULT_POOL_MAXSIZE = 4
+# Sessions for ports not used recently are closed once this many ports are pooled.
+DEFAULT_MAX_PORTS = 256
+
+
+class HTTPSessionPool:
+    """
+    Keep-alive HTTP sessions for local ports (vllm servers and ssh tunnels).
+
+    Each port gets its own requests.Session with a bounded urllib3 connection pool, so
+    repeated probes and /metrics scrapes reuse an open TCP connection instead of
+    connecting (through the tunnel) on every call. Reuse statistics come from the
+    urllib3 pools' own request/connection counters.
+    """
+
+    def __init__(self, pool_maxsize: int = DEFAULT_POOL_MAXSIZE, max_ports: int = DEFAULT_MAX_PORTS, host: str = LOCAL_HOST):
+        self.pool_maxsize = pool_maxsize
+        self.max_ports = max_ports
+        self.host = host
+        self._sessions: "OrderedDict[int, requests.Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    def url(self, port: int, path: str) -> str:
+        return f"http://{self.host}:{port}{path}"
+
+    def session(self, port: int) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(port)
+            if session is not None:
+                self._sessions.move_to_end(port)
+                return session
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+            session.mount("http://", adapter)
+            self._sessions[port] = session
+            while len(self._sessions) > self.max_ports:
+                _, old = self._sessions.popitem(last=False)
+                old.close()
+            return session
+
+    def get(self, port: int, path: str = "/v1/models", timeout=1.0, **kwargs) -> requests.Response:
+        count_call("http")
+        try:
+            return self.session(port).get(self.url(port, path), timeout=timeout, **kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+
+    def request(self, method: str, port: int, path: str, timeout=None, **kwargs) -> requests.Response:
+        count_call("http")
+        try:
+            return self.session(port).request(method, self.url(port, path), timeout=timeout, **kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+
+    def close(self, port: Optional[int] = None) -> None:
+        with self._lock:
+            ports = list(self._sessions) if port is None else [port]
+            for p in ports:
+                session = self._sessions.pop(p, None)
+                if session is not None:
+                    session.close()
+
+    def port_stats(self, port: int) -> Dict[str, int]:
+        with self._lock:
+            session = self._sessions.get(port)
+        if session is None:
+            return {"requests": 0, "connections": 0, "reused": 0}
+        # One session per port, so every urllib3 pool under its adapter belongs to this port.
+        pools = session.get_adapter(self.url(port, "/")).poolmanager.pools
+        reqs = conns = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                reqs += pool.num_requests
+                conns += pool.num_connections
+        return {"requests": reqs, "connections": conns, "reused": max(0, reqs - conns)}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            ports = list(self._sessions)
+        total = {"ports": len(ports), "requests": 0, "connections": 0, "reused": 0, "errors": self.errors}
+        for port in ports:
+            for key, value in self.port_stats(port).items():
+                total[key] += value
+        return total
+
+
+_default_pool: Optional[HTTPSessionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HTTPSessionPool:
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HTTPSessionPool()
+        return _default_pool
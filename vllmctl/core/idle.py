@@ -0,0 +1,369 @@
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import psutil
+
+from .forward import create_forward, find_free_local_port, kill_tmux_session, port_accepts, release_local_port
+from .launcher import start_vllm_session, vllm_serve_command, wait_for_vllm_api
+from .metrics import scrape_metrics
+from .registry import get_registry
+from .remote_log import RemoteLogTail
+from .swap import IN_FLIGHT_METRICS, PORT_RELEASE_TIMEOUT, SwapPlan, plan_swap, stop_remote_session
+from .tunnels import get_tunnel_manager
+from .vllm_probe import ping_vllm
+
+DEFAULT_IDLE_TIMEOUT = "15m"
+DEFAULT_CHECK_INTERVAL = 15.0
+DEFAULT_WAKE_TIMEOUT = 600
+IDLE_SESSION_PREFIX = "vllmctl_idle_"
+# Counters that move with every served request (newer prometheus_client adds _total).
+ACTIVITY_COUNTERS = (
+    "vllm:request_success_total", "vllm:request_success",
+    "vllm:prompt_tokens_total", "vllm:prompt_tokens",
+    "vllm:generation_tokens_total", "vllm:generation_tokens",
+)
+# Requests that only look at the endpoint; answered locally while the server is stopped.
+PROBE_PATHS = ("/v1/models", "/metrics", "/health", "/ping")
+# How long a new connection may take to send its request line.
+PEEK_TIMEOUT = 30.0
+RELAY_CHUNK = 65536
+
+
+class IdleTracker:
+    """
+    Decides from successive /metrics scrapes when a server has gone idle. It is busy
+    while requests are running or queued, or when a request counter moved since the
+    previous scrape; a failed scrape tells nothing and leaves the timer alone.
+    """
+
+    def __init__(self, idle_after: float, now: float):
+        self.idle_after = idle_after
+        self.last_active = now
+        self._counters: Optional[Tuple[float, ...]] = None
+
+    def observe(self, metrics: Optional[Dict[str, float]], now: float) -> bool:
+        """Feed one scrape; True if it showed activity."""
+        if metrics is None:
+            return False
+        counters = tuple(metrics.get(name, 0.0) for name in ACTIVITY_COUNTERS)
+        busy = any(metrics.get(name, 0.0) > 0 for name in IN_FLIGHT_METRICS)
+        busy = busy or (self._counters is not None and counters != self._counters)
+        self._counters = counters
+        if busy:
+            self.last_active = now
+        return busy
+
+    def reset(self, now: float) -> None:
+        """Start over, e.g. after a restart zeroed the server's counters."""
+        self.last_active = now
+        self._counters = None
+
+    def idle_for(self, now: float) -> float:
+        return now - self.last_active
+
+    def is_idle(self, now: float) -> bool:
+        return self.idle_for(now) >= self.idle_after
+
+
+def request_target(head: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """(method, path) from the start of an HTTP request, or (None, None)."""
+    line = head.split(b"\r\n", 1)[0].decode("latin-1", "replace").split()
+    if len(line) < 2:
+        return None, None
+    return line[0].upper(), line[1].split("?", 1)[0]
+
+
+def _send_response(conn: socket.socket, status: str, content_type: str, body: bytes) -> None:
+    head = (
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    )
+    conn.sendall(head.encode("latin-1") + body)
+
+
+def _pump(src: socket.socket, dst: socket.socket) -> None:
+    try:
+        while True:
+            data = src.recv(RELAY_CHUNK)
+            if not data:
+                break
+            dst.sendall(data)
+    except OSError:
+        pass
+    try:
+        dst.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+class ScaleToZero:
+    """
+    Holds a forwarded endpoint's local port in place of its tunnel and relays every
+    connection to the server through an internal forward on ``backend_port``.
+
+    Every ``interval`` seconds the server's /metrics is read through the internal
+    forward; once nothing has run for ``idle_after`` seconds ``stop_server`` is
+    called. The next request for the model calls ``start_server`` and is held until
+    it returns, so the client only sees a slow first response. While the server is
+    stopped, probes of /v1/models, /metrics and /health are answered locally, so the
+    gateway and list-local keep seeing the endpoint without waking it up.
+    """
+
+    def __init__(
+        self,
+        port: int,
+        backend_port: int,
+        model: Optional[str],
+        start_server: Callable[[], bool],
+        stop_server: Callable[[], bool],
+        idle_after: float,
+        interval: float = DEFAULT_CHECK_INTERVAL,
+        bind: str = "127.0.0.1",
+        scrape=scrape_metrics,
+        ping=ping_vllm,
+        clock: Callable[[], float] = time.monotonic,
+        on_event: Optional[Callable[[str], None]] = None,
+    ):
+        self.backend_port = backend_port
+        self.start_server = start_server
+        self.stop_server = stop_server
+        self.interval = interval
+        self.scrape = scrape
+        self.ping = ping
+        self.clock = clock
+        self.on_event = on_event
+        self.awake = True
+        self.sleeps = 0
+        self.wakeups = 0
+        self.failed_wakeups = 0
+        self.last_wake_time: Optional[float] = None
+        self.tracker = IdleTracker(idle_after, clock())
+        self.models = {"object": "list", "data": [{"id": model, "object": "model", "owned_by": "vllm"}] if model else []}
+        self.sock = socket.create_server((bind, port))
+        self._lock = threading.Lock()  # one start or stop of the server at a time
+        self._relays: Set[socket.socket] = set()
+        self._relays_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    @property
+    def port(self) -> int:
+        return self.sock.getsockname()[1]
+
+    def _event(self, message: str) -> None:
+        if self.on_event:
+            self.on_event(message)
+
+    def start(self) -> None:
+        for target in (self._accept_loop, self._check_loop):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def close(self) -> None:
+        """Stop listening and cut the relayed connections; the server is left as it is."""
+        self._stopped.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # wakes the blocked accept()
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self._close_relays()
+
+    def _accept_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _check_loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def check(self) -> bool:
+        """One idle check; True if it stopped the server."""
+        if not self.awake:
+            return False
+        self.tracker.observe(self.scrape(self.backend_port), self.clock())
+        if not self.tracker.is_idle(self.clock()):
+            return False
+        with self._lock:
+            # a request may have come in while the lock was free
+            if not self.awake or self.tracker.observe(self.scrape(self.backend_port), self.clock()):
+                return False
+            models = self.ping(self.backend_port)
+            if models and models.get("data"):
+                self.models = models
+            self._event(f"no requests for {self.tracker.idle_for(self.clock()):.0f}s, stopping the server")
+            if not self.stop_server():
+                self._event("could not stop the server; will try again after the next idle period")
+                self.tracker.reset(self.clock())
+                return False
+            self.awake = False
+            self.sleeps += 1
+            self._close_relays()
+        return True
+
+    def ensure_awake(self) -> bool:
+        """Start the server if it is stopped; concurrent callers wait for the same start."""
+        with self._lock:
+            if self.awake:
+                return True
+            self._event("request arrived, starting the server")
+            start = self.clock()
+            if not self.start_server():
+                self.failed_wakeups += 1
+                self._event("the server did not start")
+                return False
+            self.awake = True
+            self.wakeups += 1
+            self.last_wake_time = self.clock() - start
+            self.tracker.reset(self.clock())
+            self._event(f"server ready after {self.last_wake_time:.1f}s")
+            return True
+
+    def _answer_probe(self, conn: socket.socket, path: str) -> None:
+        conn.recv(RELAY_CHUNK)  # consume the request so closing does not reset the connection
+        if path == "/v1/models":
+            _send_response(conn, "200 OK", "application/json", json.dumps(self.models).encode())
+        else:
+            _send_response(conn, "200 OK", "text/plain", b"")
+
+    def _handle(self, conn: socket.socket) -> None:
+        backend = None
+        try:
+            conn.settimeout(PEEK_TIMEOUT)
+            head = conn.recv(RELAY_CHUNK, socket.MSG_PEEK)
+            if not head:
+                conn.close()
+                return
+            method, path = request_target(head)
+            if not self.awake and method == "GET" and path in PROBE_PATHS:
+                self._answer_probe(conn, path)
+                conn.close()
+                return
+            if not self.ensure_awake():
+                conn.recv(RELAY_CHUNK)
+                body = json.dumps({"error": {"message": "the model server could not be started", "type": "server_error"}})
+                _send_response(conn, "503 Service Unavailable", "application/json", body.encode())
+                conn.close()
+                return
+            backend = socket.create_connection(("127.0.0.1", self.backend_port), timeout=10)
+            conn.settimeout(None)
+            backend.settimeout(None)
+        except OSError:
+            conn.close()
+            if backend is not None:
+                backend.close()
+            return
+        with self._relays_lock:
+            self._relays.update((conn, backend))
+        try:
+            back = threading.Thread(target=_pump, args=(backend, conn), daemon=True)
+            back.start()
+            _pump(conn, backend)
+            back.join()
+        finally:
+            with self._relays_lock:
+                self._relays.difference_update((conn, backend))
+            conn.close()
+            backend.close()
+
+    def _close_relays(self) -> None:
+        with self._relays_lock:
+            relays = list(self._relays)
+        for s in relays:
+            try:
+                s.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def plan_scale_to_zero(local_port: int, registry=None) -> Tuple[SwapPlan, dict]:
+    """The forward behind local_port and the serve arguments it was launched with."""
+    registry = registry or get_registry()
+    plan = plan_swap(local_port, registry)
+    extra = registry.get(local_port).extra
+    if extra.get("idle_proxy") and psutil.pid_exists(extra["idle_proxy"]):
+        raise ValueError(f"Local port {local_port} is already held by scale-to-zero (pid {extra['idle_proxy']})")
+    serve = extra.get("serve")
+    if not serve:
+        raise ValueError(f"Local port {local_port} was not started by 'vllmctl serve', so it cannot be restarted on demand")
+    return plan, serve
+
+
+def takeover_port(plan: SwapPlan, local_range: Tuple[int, int], tunnels=None) -> int:
+    """
+    Move plan's forward to an internal local port on the host's shared ssh master and
+    free plan.local_port for the listener; returns the internal port.
+    """
+    tunnels = tunnels or get_tunnel_manager()
+    backend_port = find_free_local_port(local_range, exclude=[plan.local_port])
+    if not backend_port:
+        raise RuntimeError("no free local port for the internal forward")
+    if not tunnels.add_forward(plan.host, backend_port, plan.remote_port):
+        release_local_port(backend_port)
+        raise RuntimeError(f"could not forward {backend_port} to {plan.host}:{plan.remote_port}")
+    if plan.mux:
+        tunnels.cancel_forward(plan.host, plan.local_port, plan.remote_port)
+    elif plan.tunnel_session:
+        kill_tmux_session(plan.tunnel_session)
+    deadline = time.monotonic() + PORT_RELEASE_TIMEOUT
+    while port_accepts(plan.local_port) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # the internal port belongs to the listener; keep it out of discovery
+    get_registry().remove([backend_port])
+    return backend_port
+
+
+def record_listener(plan: SwapPlan, serve: dict, backend_port: int) -> None:
+    get_registry().register(
+        plan.local_port, host=plan.host, remote_port=plan.remote_port, model=plan.model,
+        idle_proxy=os.getpid(), backend_port=backend_port, serve=serve, remote_session=plan.remote_session,
+    )
+
+
+def restore_port(plan: SwapPlan, serve: dict, backend_port: int, tunnels=None) -> bool:
+    """Put the ordinary forward back on plan.local_port after the listener closed."""
+    tunnels = tunnels or get_tunnel_manager()
+    tunnels.cancel_forward(plan.host, backend_port, plan.remote_port)
+    release_local_port(backend_port)
+    if not create_forward(plan.host, plan.remote_port, plan.local_port, mux=plan.mux).ok:
+        return False
+    get_registry().update(plan.local_port, model=plan.model, extra={"remote_session": plan.remote_session, "serve": serve})
+    return True
+
+
+def server_controls(plan: SwapPlan, serve: dict, backend_port: int, timeout: int = DEFAULT_WAKE_TIMEOUT,
+                    console=None) -> Tuple[Callable[[], bool], Callable[[], bool]]:
+    """start_server and stop_server for ScaleToZero, relaunching with the recorded serve arguments."""
+    session = plan.remote_session or f"vllmctl_server_{plan.remote_port}"
+
+    def start() -> bool:
+        cmd = vllm_serve_command(
+            serve["model"], serve.get("vllm_extra_args") or [], serve.get("conda_env") or "vllm_env",
+            plan.remote_port, gpus=serve.get("gpus"), lifetime=serve.get("lifetime"),
+        )
+        try:
+            started = start_vllm_session(plan.host, plan.remote_port, cmd)
+        except subprocess.CalledProcessError:
+            return False
+        if wait_for_vllm_api(backend_port, timeout, console, log=RemoteLogTail(plan.host, started)):
+            return True
+        stop_remote_session(plan.host, started)
+        return False
+
+    def stop() -> bool:
+        return stop_remote_session(plan.host, session)
+
+    return start, stop
@@ -0,0 +1,30 @@
+import subprocess
+import threading
+from collections import Counter
+from typing import Dict
+
+# Process-wide counters of external calls ("subprocess", "http"), so tests and
+# debugging can check how many calls a command really makes.
+_counts: Counter = Counter()
+_lock = threading.Lock()
+
+
+def count_call(kind: str, n: int = 1) -> None:
+    with _lock:
+        _counts[kind] += n
+
+
+def call_counts() -> Dict[str, int]:
+    with _lock:
+        return dict(_counts)
+
+
+def reset_call_counts() -> None:
+    with _lock:
+        _counts.clear()
+
+
+def run_command(cmd, **kwargs):
+    """subprocess.run that is counted as one "subprocess" call."""
+    count_call("subprocess")
+    return subprocess.run(cmd, **kwargs)
@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .remote_log import BOUND_PATTERNS
+from .statefile import state_path
+
+HISTORY_FILE = "launch_history.jsonl"
+# Echoed by the remote shell between `conda activate` and `vllm serve`.
+ENV_READY_MARKER = "vllmctl: environment ready"
+
+# (event, label of the phase that ends with it), in launch order. A phase runs from
+# the previous event that was seen to its own event.
+PHASES: List[Tuple[str, str]] = [
+    ("tunnel", "SSH tunnel"),
+    ("session", "Remote tmux session (ssh)"),
+    ("env", "Shell + conda activate"),
+    ("vllm_start", "vLLM process start"),
+    ("load_start", "Engine setup"),
+    ("weights_loaded", "Weight download + load"),
+    ("graphs_start", "Profiling + KV cache"),
+    ("graphs_done", "CUDA graph capture"),
+    ("engine_ready", "Warmup"),
+    ("bound", "API server startup"),
+    ("ready", "First /v1/models answer"),
+]
+
+# Remote log lines that mark an event (the first match wins).
+LOG_EVENTS: List[Tuple[str, "re.Pattern"]] = [
+    ("env", re.compile(re.escape(ENV_READY_MARKER))),
+    ("vllm_start", re.compile(r"vLLM API server version|non-default args")),
+    ("load_start", re.compile(r"Starting to load model")),
+    ("weights_loaded", re.compile(r"Loading weights took|Model loading took")),
+    ("graphs_start", re.compile(r"Capturing cudagraphs|Capturing CUDA graph")),
+    ("graphs_done", re.compile(r"Graph capturing finished")),
+    ("engine_ready", re.compile(r"init engine \(profile, create kv cache, warmup model\) took")),
+] + [("bound", p) for p in BOUND_PATTERNS]
+
+# Durations vLLM reports itself; more precise than the time a line was seen.
+REPORTED: List[Tuple[str, "re.Pattern"]] = [
+    ("download", re.compile(r"Time spent downloading weights for .*?: ([\d.]+) seconds")),
+    ("weights", re.compile(r"Loading weights took ([\d.]+) seconds")),
+    ("model_load", re.compile(r"Model loading took [\d.]+ ?GiB and ([\d.]+) seconds")),
+    ("graphs", re.compile(r"Graph capturing finished in ([\d.]+) secs")),
+    ("engine_init", re.compile(r"init engine .*? took ([\d.]+) seconds")),
+]
+VERSION_RE = re.compile(r"vLLM API server version ([\w.+-]+)")
+
+# Reported durations shown next to the phase they belong to.
+PHASE_REPORTS = {
+    "weights_loaded": ("download", "weights", "model_load"),
+    "graphs_done": ("graphs",),
+    "engine_ready": ("engine_init",),
+}
+
+
+class LaunchTimeline:
+    """
+    Timestamps of one launch: local events (tunnel up, session started, API ready)
+    are marked directly, remote ones come from server log lines as they are read.
+    Log-derived times are when the line was seen, so they carry the log poll delay.
+    """
+
+    def __init__(self, host: str, model: str, clock: Callable[[], float] = time.monotonic):
+        self.host = host
+        self.model = model
+        self.clock = clock
+        self.started = clock()
+        self.started_at = time.time()
+        self.events: Dict[str, float] = {}
+        self.reported: Dict[str, float] = {}
+        self.vllm_version: Optional[str] = None
+        self.outcome: Optional[str] = None
+
+    def mark(self, event: str) -> None:
+        """Record the first occurrence of ``event``, in seconds since the launch began."""
+        self.events.setdefault(event, self.clock() - self.started)
+
+    def observe_line(self, line: str) -> None:
+        for event, pattern in LOG_EVENTS:
+            if event not in self.events and pattern.search(line):
+                self.mark(event)
+                break
+        for name, pattern in REPORTED:
+            m = pattern.search(line)
+            if m and name not in self.reported:
+                self.reported[name] = float(m.group(1))
+        if self.vllm_version is None:
+            m = VERSION_RE.search(line)
+            if m:
+                self.vllm_version = m.group(1)
+
+    def finish(self, outcome: str) -> None:
+        """"ready", "failed" or "timeout"."""
+        if outcome == "ready":
+            self.mark("ready")
+        self.outcome = outcome
+        self.mark("end")
+
+    def phases(self) -> List[dict]:
+        """Seen phases in order, each with start, duration and any vLLM-reported times."""
+        result, previous = [], 0.0
+        for event, label in PHASES:
+            at = self.events.get(event)
+            if at is None or at < previous:
+                continue
+            reported = {name: self.reported[name] for name in PHASE_REPORTS.get(event, ()) if name in self.reported}
+            result.append({"phase": event, "label": label, "start": previous, "duration": at - previous, "reported": reported})
+            previous = at
+        return result
+
+    @property
+    def total(self) -> float:
+        return self.events.get("end", self.clock() - self.started)
+
+    def record(self) -> dict:
+        return {
+            "time": self.started_at,
+            "host": self.host,
+            "model": self.model,
+            "vllm_version": self.vllm_version,
+            "outcome": self.outcome,
+            "total": round(self.total, 3),
+            "phases": {p["phase"]: round(p["duration"], 3) for p in self.phases()},
+            "reported": self.reported,
+        }
+
+
+def history_path() -> str:
+    return state_path(HISTORY_FILE)
+
+
+def append_history(record: dict, path: Optional[str] = None) -> None:
+    """Append one launch record as a JSON line (one short O_APPEND write)."""
+    line = json.dumps(record, sort_keys=True) + "\n"
+    fd = os.open(path or history_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, line.encode())
+    finally:
+        os.close(fd)
+
+
+def load_history(path: Optional[str] = None, model: Optional[str] = None, host: Optional[str] = None) -> List[dict]:
+    records = []
+    try:
+        with open(path or history_path()) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if model and record.get("model") != model:
+                    continue
+                if host and not re.search(host, record.get("host", "")):
+                    continue
+                records.append(record)
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def waterfall_table(timeline: LaunchTimeline, width: int = 40):
+    from rich.table import Table
+    total = max(timeline.total, 1e-9)
+    title = f"Launch timing: {timeline.model} on {timeline.host}"
+    if timeline.vllm_version:
+        title += f" (vLLM {timeline.vllm_version})"
+    table = Table(title=title, caption=f"total {timeline.total:.1f}s, {timeline.outcome or 'running'}")
+    table.add_column("Phase")
+    table.add_column("Start", justify="right")
+    table.add_column("Duration", justify="right")
+    table.add_column("vLLM reported")
+    table.add_column("")
+    for p in timeline.phases():
+        offset = int(round(p["start"] / total * width))
+        length = max(1, int(round(p["duration"] / total * width)))
+        bar = " " * offset + "█" * min(length, width - offset)
+        reported = ", ".join(f"{name} {value:.1f}s" for name, value in p["reported"].items())
+        table.add_row(p["label"], f"{p['start']:.1f}s", f"{p['duration']:.1f}s", reported, f"[cyan]{bar}[/cyan]")
+    return table
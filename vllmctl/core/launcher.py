@@ -1,15 +1,28 @@
 import subprocess
 import time
 import requests
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from .vllm_probe import get_listening_ports
 import re
-from .forward import create_tmux_ssh_forward, find_free_local_port
+from .forward import create_tmux_ssh_forward, create_forward, find_free_local_port, release_local_port
+from .tunnels import mux_session_name
+from .ssh_utils import ssh_argv
+from .http_pool import get_http_pool
+from .registry import get_registry
+from .instrument import run_command
+from .remote_log import RemoteLogTail, classify_log_line, start_logged_session_command, remote_log_path
+from .launch_timing import LaunchTimeline, ENV_READY_MARKER, append_history, waterfall_table
+from rich.markup import escape
+
+FAST_POLL_INTERVAL = 0.25
+# Pause after a failure line before the last read, to catch the rest of a traceback.
+LOG_GRACE = 0.5
 
 
 def create_tmux_session(session_name: str, command: str) -> None:
     """Create a new tmux session with the given name and command."""
-    subprocess.run([
+    run_command([
         "tmux", "new-session",
         "-d",  # detached
         "-s", session_name,  # session name
@@ -17,27 +30,98 @@ def create_tmux_session(session_name: str, command: str) -> None:
     ], check=True)
 
 
-def wait_for_vllm_api(local_port: int, timeout: int = 60, console=None) -> bool:
-    """Wait for VLLM API to become available."""
+def _api_ready(local_port: int) -> bool:
+    try:
+        r = get_http_pool().get(local_port, "/v1/models", timeout=1)
+        return r.status_code == 200 and r.text.strip().startswith('{')
+    except Exception:
+        return False
+
+
+def _print_log_tail(console, log: RemoteLogTail, lines: int = 15) -> None:
+    tail = list(log.tail)[-lines:]
+    if console and tail:
+        console.print(f"[bold]Last lines of {log.host}:~/{log.path}:[/bold]")
+        for line in tail:
+            console.print(f"  [dim]{escape(line)}[/dim]")
+
+
+def wait_for_vllm_api(
+    local_port: int,
+    timeout: int = 60,
+    console=None,
+    log: Optional[RemoteLogTail] = None,
+    interval: float = 2.0,
+    fast_interval: float = FAST_POLL_INTERVAL,
+    timeline: Optional[LaunchTimeline] = None,
+) -> bool:
+    """
+    Wait for VLLM API to become available.
+    With a remote log the server output is read as it is written: a traceback or an
+    exited session ends the wait at once, and once the server logs that it is binding
+    its port the API is polled every ``fast_interval`` seconds.
+    """
     url = f"http://localhost:{local_port}/v1/models"
-    start = time.time()
-    
+    deadline = time.monotonic() + timeout
+    bound = False
+    next_log_poll = 0.0
+
     while True:
-        try:
-            r = requests.get(url, timeout=1)
-            if r.status_code == 200 and r.text.strip().startswith('{'):
+        if _api_ready(local_port):
+            if timeline is not None:
+                timeline.finish("ready")
+            if console:
+                console.print(f"[green]VLLM API is ready![/green] [bold]{url}[/bold]")
+            return True
+
+        now = time.monotonic()
+        if log is not None and now >= next_log_poll:
+            chunk = log.poll()
+            failure = None
+            for line in chunk.lines:
+                if timeline is not None:
+                    timeline.observe_line(line)
+                kind = classify_log_line(line)
+                if kind == "failed" and failure is None:
+                    failure = line
+                elif kind == "bound" and not bound:
+                    bound = True
+                    if console:
+                        console.print("[cyan]Server is binding its port, polling the API faster[/cyan]")
+            if failure is not None or chunk.alive is False:
+                if failure is not None:
+                    # the rest of the traceback is usually written right after its first line
+                    time.sleep(LOG_GRACE)
+                    log.poll()
+                log.flush()
+                if timeline is not None:
+                    timeline.finish("failed")
                 if console:
-                    console.print(f"[green]VLLM API is ready![/green] [bold]{url}[/bold]")
-                return True
-        except Exception:
-            pass
-            
-        if time.time() - start > timeout:
+                    reason = f"error in server output: {failure.strip()}" if failure else "the server session exited"
+                    console.print(f"[red]VLLM failed to start on {log.host}: {escape(reason)}[/red]")
+                    _print_log_tail(console, log)
+                return False
+            # once bound only the API needs fast polling; the log is read at the normal pace
+            next_log_poll = now + interval if bound else now
+
+        if time.monotonic() > deadline:
+            if timeline is not None:
+                timeline.finish("timeout")
             if console:
                 console.print(f"[red]VLLM API did not start in {timeout} seconds[/red]")
             return False
-            
-        time.sleep(2)
+
+        time.sleep(fast_interval if bound else interval)
+
+
+def report_launch_timing(timeline: LaunchTimeline, console=None) -> None:
+    """Print the phase waterfall and append the launch to the local history."""
+    if console:
+        console.print(waterfall_table(timeline))
+    try:
+        append_history(timeline.record())
+    except OSError:
+        pass
 
 
 def parse_lifetime_to_seconds(lifetime: str) -> int:
@@ -60,6 +144,57 @@ def parse_lifetime_to_seconds(lifetime: str) -> int:
         raise ValueError("Invalid time unit in lifetime. Use s, m, h, or d.")
 
 
+def remote_port_from_args(vllm_extra_args: List[str], default: int = 8000) -> int:
+    """Port given to vllm with --port/-p, or the default."""
+    port_args = ['--port', '-p']
+    for i, arg in enumerate(vllm_extra_args):
+        if arg in port_args and i + 1 < len(vllm_extra_args):
+            try:
+                return int(vllm_extra_args[i + 1])
+            except ValueError:
+                pass
+    return default
+
+
+def vllm_serve_command(
+    model: str,
+    vllm_extra_args: List[str],
+    conda_env: str,
+    remote_port: int,
+    gpus: Optional[List[int]] = None,
+    lifetime: Optional[str] = None,
+) -> str:
+    """Shell command that activates the conda env and runs ``vllm serve`` on the remote host."""
+    # Build vllm command with extra arguments
+    vllm_cmd_parts = [
+        "source ~/.bashrc",
+        f"conda activate {conda_env}",
+        f"echo {ENV_READY_MARKER}",
+        f"vllm serve {model}"
+    ]
+    if gpus:
+        # gpus are nvidia-smi indices, which follow PCI bus order; CUDA's default order is fastest first
+        vllm_cmd_parts[-1] = f"CUDA_DEVICE_ORDER=PCI_BUS_ID CUDA_VISIBLE_DEVICES={','.join(map(str, gpus))} " + vllm_cmd_parts[-1]
+    # Add extra arguments
+    if vllm_extra_args:
+        vllm_cmd_parts[-1] += " " + " ".join(vllm_extra_args)
+    # If no port specified in extra args, add default port
+    if not any(arg in ['--port', '-p'] for arg in vllm_extra_args):
+        vllm_cmd_parts[-1] += f" --port {remote_port}"
+    vllm_cmd = " && ".join(vllm_cmd_parts)
+    if lifetime:
+        seconds = parse_lifetime_to_seconds(lifetime)
+        vllm_cmd = f"timeout {seconds} bash -c '{vllm_cmd}'"
+    return vllm_cmd
+
+
+def start_vllm_session(server: str, remote_port: int, vllm_cmd: str) -> str:
+    """Run vllm_cmd in a logged tmux session on server and return the session name."""
+    server_tmux_name = f"vllmctl_server_{remote_port}"
+    run_command(ssh_argv(server, start_logged_session_command(server_tmux_name, vllm_cmd)), check=True)
+    return server_tmux_name
+
+
 def launch_vllm_with_args(
     server: str,
     model: str,
@@ -69,13 +204,18 @@ def launch_vllm_with_args(
     timeout: int = 60,
     lifetime: str = None,
     console=None,
+    mux: bool = False,
+    gpus: Optional[List[int]] = None,
 ) -> Optional[int]:
     """
     Launch VLLM on a remote server with arbitrary arguments and forward the port locally.
     Uses tmux for SSH tunnel and remote session, and prints detailed info (livetime, timeout, log commands).
+    With mux=True the tunnel is added to the server's shared ssh master instead.
+    ``gpus`` restricts the server to those device indices (CUDA_VISIBLE_DEVICES).
     """
     if vllm_extra_args is None:
         vllm_extra_args = []
+    timeline = LaunchTimeline(server, model)
     # Find a free local port
     local_port = find_free_local_port(local_range)
     if not local_port:
@@ -83,51 +223,51 @@ def launch_vllm_with_args(
             console.print("[red]No free local ports available[/red]")
         return None
     try:
-        # Extract port from vllm arguments or use default
-        remote_port = 8000
-        port_args = ['--port', '-p']
-        for i, arg in enumerate(vllm_extra_args):
-            if arg in port_args and i + 1 < len(vllm_extra_args):
-                try:
-                    remote_port = int(vllm_extra_args[i + 1])
-                    break
-                except ValueError:
-                    pass
+        remote_port = remote_port_from_args(vllm_extra_args)
         # Создаём SSH туннель через tmux (как в launch_vllm)
-        create_tmux_ssh_forward(None, server, remote_port, local_port)
-        # Build vllm command with extra arguments
-        vllm_cmd_parts = [
-            "source ~/.bashrc",
-            f"conda activate {conda_env}",
-            f"vllm serve {model}"
-        ]
-        # Add extra arguments
-        if vllm_extra_args:
-            vllm_cmd_parts[-1] += " " + " ".join(vllm_extra_args)
-        # If no port specified in extra args, add default port
-        if not any(arg in ['--port', '-p'] for arg in vllm_extra_args):
-            vllm_cmd_parts[-1] += f" --port {remote_port}"
-        vllm_cmd = " && ".join(vllm_cmd_parts)
-        if lifetime:
-            seconds = parse_lifetime_to_seconds(lifetime)
-            vllm_cmd = f"timeout {seconds} bash -c '{vllm_cmd}'"
-        server_tmux_name = f"vllmctl_server_{remote_port}"
-        remote_tmux_cmd = f'tmux new-session -d -s {server_tmux_name} "{vllm_cmd}"'
-        subprocess.run(["ssh", server, remote_tmux_cmd], check=True)
+        if mux:
+            tunnel = create_forward(server, remote_port, local_port, mux=True)
+        else:
+            tunnel = create_tmux_ssh_forward(None, server, remote_port, local_port)
+        if getattr(tunnel, "status", None) == "failed":
+            release_local_port(local_port)
+            if console:
+                console.print(f"[red]SSH tunnel to {server} failed: {tunnel.error}[/red]")
+            return None
+        timeline.mark("tunnel")
+        vllm_cmd = vllm_serve_command(model, vllm_extra_args, conda_env, remote_port, gpus=gpus, lifetime=lifetime)
+        server_tmux_name = start_vllm_session(server, remote_port, vllm_cmd)
+        timeline.mark("session")
         if console:
             console.print(f"\n[bold]Created sessions:[/bold]")
-            console.print(f"  • SSH tunnel: [cyan]ssh -N -L {local_port}:localhost:{remote_port} {server}[/cyan] (running in background)")
+            if mux:
+                console.print(f"  • SSH tunnel: [cyan]{local_port} -> {server}:{remote_port}[/cyan] (shared connection, tmux session {mux_session_name(server)})")
+            else:
+                console.print(f"  • SSH tunnel: [cyan]ssh -N -L {local_port}:localhost:{remote_port} {server}[/cyan] (running in background)")
             console.print(f"  • VLLM server: [cyan]tmux session on remote: {server_tmux_name}[/cyan]")
             console.print(f"  • VLLM livetime: [cyan]{lifetime}[/cyan]")
             console.print(f"  • VLLM timeout: [cyan]{timeout} sec[/cyan]")
             console.print(f"\n[bold]VLLM command:[/bold] {vllm_cmd}")
             console.print(f"\n[bold]Waiting for VLLM API to become available...[/bold]")
             console.print(f"\n[bold yellow]To view logs, run:[/bold yellow] ssh {server} tmux attach -t {server_tmux_name}")
-        # Wait for the API to become available
-        if not wait_for_vllm_api(local_port, timeout, console):
+            console.print(f"  (or: ssh {server} tail -f {remote_log_path(server_tmux_name)})")
+        # Wait for the API to become available, watching the server output meanwhile
+        log = RemoteLogTail(server, server_tmux_name)
+        ready = wait_for_vllm_api(local_port, timeout, console, log=log, timeline=timeline)
+        report_launch_timing(timeline, console)
+        if not ready:
             if console:
                 console.print(f"[yellow]Check server logs with: ssh {server} tmux attach -t {server_tmux_name}[/yellow]")
             return None
+        try:
+            get_registry().update(local_port, model=model, extra={
+                "remote_session": server_tmux_name,
+                # what scale-to-zero needs to start the same server again
+                "serve": {"model": model, "vllm_extra_args": list(vllm_extra_args), "conda_env": conda_env,
+                          "gpus": gpus, "lifetime": lifetime},
+            })
+        except OSError:
+            pass
         if console:
             console.print(f"\n[bold green]✓ VLLM is ready![/bold green]")
             console.print(f"[bold]API endpoint:[/bold] http://localhost:{local_port}/v1/completions")
@@ -135,4 +275,15 @@ def launch_vllm_with_args(
     except subprocess.CalledProcessError as e:
         if console:
             console.print(f"[red]Failed to create tmux session: {e}[/red]")
-        return None 
\ No newline at end of file
+        return None
+
+
+def launch_many(launches: List[dict], max_workers: Optional[int] = None) -> List[Optional[int]]:
+    """
+    Run several ``launch_vllm_with_args`` calls at once, one keyword dict per launch.
+    Returns the local port of each launch (None where it failed), in input order.
+    """
+    if not launches:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(launches)) as pool:
+        return list(pool.map(lambda kwargs: launch_vllm_with_args(**kwargs), launches))
@@ -0,0 +1,81 @@
+from typing import Dict, Optional
+
+from .http_pool import get_http_pool
+
+
+def parse_prometheus(text: str) -> Dict[str, float]:
+    """
+    Parse Prometheus text exposition into {metric name: value}. Samples of the same
+    metric with different labels (several models, engines) are summed.
+    """
+    values: Dict[str, float] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "{" in line:
+            # label values may contain spaces; the sample value follows the closing brace
+            name, _, rest = line.partition("{")
+            rest = rest.rsplit("}", 1)[-1]
+        else:
+            name, _, rest = line.partition(" ")
+        fields = rest.split()
+        if not fields:
+            continue
+        try:
+            value = float(fields[0])
+        except ValueError:
+            continue
+        values[name] = values.get(name, 0.0) + value
+    return values
+
+
+def scrape_metrics(port: int, timeout: float = 0.5, pool=None) -> Optional[Dict[str, float]]:
+    """GET /metrics on a local port and parse it; None if the port does not answer."""
+    pool = pool or get_http_pool()
+    try:
+        r = pool.get(port, "/metrics", timeout=timeout)
+        if r.status_code != 200:
+            return None
+        return parse_prometheus(r.text)
+    except Exception:
+        return None
+
+
+# vLLM V1 engine counters (prometheus_client may add a _total suffix) and the V0 gauge.
+PREFIX_CACHE_QUERIES = ("vllm:prefix_cache_queries_total", "vllm:prefix_cache_queries")
+PREFIX_CACHE_HITS = ("vllm:prefix_cache_hits_total", "vllm:prefix_cache_hits")
+PREFIX_CACHE_HIT_RATE_V0 = "vllm:gpu_prefix_cache_hit_rate"
+
+
+def _first(metrics: Dict[str, float], names) -> Optional[float]:
+    for name in names:
+        if name in metrics:
+            return metrics[name]
+    return None
+
+
+def prefix_cache_counters(metrics: Dict[str, float]) -> Optional[tuple]:
+    """(queries, hits) token counters of a V1 engine, or None."""
+    queries = _first(metrics, PREFIX_CACHE_QUERIES)
+    hits = _first(metrics, PREFIX_CACHE_HITS)
+    if queries is None or hits is None:
+        return None
+    return queries, hits
+
+
+def prefix_cache_hit_rate(metrics: Optional[Dict[str, float]], previous: Optional[tuple] = None) -> Optional[float]:
+    """
+    Prefix-cache hit rate (0..1) from a /metrics scrape. With V1 counters and the
+    (queries, hits) of an earlier scrape the rate covers just the interval between
+    them; otherwise it is the lifetime rate (or V0's own gauge).
+    """
+    if not metrics:
+        return None
+    counters = prefix_cache_counters(metrics)
+    if counters is None:
+        return metrics.get(PREFIX_CACHE_HIT_RATE_V0)
+    queries, hits = counters
+    if previous is not None and queries > previous[0]:
+        return (hits - previous[1]) / (queries - previous[0])
+    return hits / queries if queries else None
@@ -0,0 +1,168 @@
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence
+
+from .fanout import fan_out, DEFAULT_MAX_WORKERS, DEFAULT_HOST_TIMEOUT
+from .ssh_utils import run_ssh_command
+
+# One round-trip per host: per-GPU utilization and memory, then the number of vLLM
+# API servers running there ([b]/[v] keep pgrep from matching this very command).
+GPU_QUERY = (
+    "nvidia-smi --query-gpu=index,utilization.gpu,memory.used,memory.total --format=csv,noheader,nounits; "
+    "echo __vllm__; pgrep -fc '[b]in/vllm serve|-m [v]llm.entrypoints' || true"
+)
+DEFAULT_GPU_MEMORY_UTILIZATION = 0.9
+# Weights must leave at least this share of vLLM's memory budget for the KV cache.
+KV_CACHE_SHARE = 0.1
+BYTES_PER_PARAM = [
+    (re.compile(r"awq|gptq|int4|4bit|w4a16|nf4|bnb", re.I), 0.55),
+    (re.compile(r"fp8|int8|8bit|w8a8", re.I), 1.05),
+]
+DEFAULT_BYTES_PER_PARAM = 2.0  # bf16/fp16
+# Penalty per vLLM instance already on a host, in units of a whole free GPU share.
+INSTANCE_PENALTY = 0.1
+
+
+@dataclass
+class GpuInfo:
+    index: int
+    util: float
+    mem_used: int  # MiB
+    mem_total: int  # MiB
+
+    @property
+    def mem_free(self) -> int:
+        return self.mem_total - self.mem_used
+
+
+@dataclass
+class HostGpus:
+    host: str
+    gpus: List[GpuInfo] = field(default_factory=list)
+    vllm_instances: int = 0
+
+    @property
+    def avg_util(self) -> Optional[float]:
+        return sum(g.util for g in self.gpus) / len(self.gpus) if self.gpus else None
+
+    @property
+    def avg_mem(self) -> Optional[float]:
+        """Mean used memory in percent."""
+        if not self.gpus:
+            return None
+        return sum(g.mem_used / g.mem_total * 100 for g in self.gpus if g.mem_total) / len(self.gpus)
+
+
+@dataclass
+class Placement:
+    host: str
+    score: float = float("-inf")
+    gpus: List[int] = field(default_factory=list)
+    reason: Optional[str] = None  # why the host cannot take the model
+    stats: Optional[HostGpus] = None
+
+    @property
+    def feasible(self) -> bool:
+        return self.reason is None
+
+
+def parse_gpu_query(host: str, out: str) -> Optional[HostGpus]:
+    gpu_part, _, vllm_part = out.partition("__vllm__")
+    gpus = []
+    for line in gpu_part.strip().splitlines():
+        parts = [p.strip() for p in line.split(",")]
+        if len(parts) != 4:
+            continue
+        try:
+            gpus.append(GpuInfo(int(parts[0]), float(parts[1]), int(parts[2]), int(parts[3])))
+        except ValueError:
+            continue
+    if not gpus:
+        return None
+    count = vllm_part.strip().splitlines()
+    instances = int(count[0]) if count and count[0].strip().isdigit() else 0
+    return HostGpus(host=host, gpus=gpus, vllm_instances=instances)
+
+
+def query_host_gpus(host: str, timeout: float = DEFAULT_HOST_TIMEOUT) -> Optional[HostGpus]:
+    """GPU state of host in one ssh call; None if nvidia-smi gave nothing usable."""
+    return parse_gpu_query(host, run_ssh_command(host, GPU_QUERY, timeout=timeout))
+
+
+def arg_value(args: Sequence[str], names: Iterable[str]) -> Optional[str]:
+    """Value of the first of ``names`` in a vllm argument list (``--x v`` or ``--x=v``)."""
+    names = tuple(names)
+    for i, arg in enumerate(args):
+        if arg in names and i + 1 < len(args):
+            return args[i + 1]
+        for name in names:
+            if arg.startswith(name + "="):
+                return arg[len(name) + 1:]
+    return None
+
+
+def estimate_model_memory(model: str, vllm_args: Sequence[str] = ()) -> Optional[int]:
+    """
+    Rough weight footprint in MiB from the parameter count in the model name
+    (``Qwen3-32B``, ``Mixtral-8x7B``) and its quantization; None if the name has no size.
+    """
+    m = re.search(r"(?:(\d+)x)?(\d+(?:\.\d+)?)\s*[bB](?![a-zA-Z])", model.split("/")[-1])
+    if not m:
+        return None
+    params = float(m.group(2)) * 1e9 * (int(m.group(1)) if m.group(1) else 1)
+    hint = " ".join([model, arg_value(vllm_args, ["--quantization", "-q"]) or "", arg_value(vllm_args, ["--dtype"]) or ""])
+    per_param = next((b for pattern, b in BYTES_PER_PARAM if pattern.search(hint)), DEFAULT_BYTES_PER_PARAM)
+    return int(params * per_param / 2 ** 20)
+
+
+def score_host(
+    stats: HostGpus,
+    tensor_parallel_size: int = 1,
+    model_memory: Optional[int] = None,
+    gpu_memory_utilization: float = DEFAULT_GPU_MEMORY_UTILIZATION,
+) -> Placement:
+    """
+    vLLM claims ``gpu_memory_utilization`` of each device's total memory at startup, so
+    a device qualifies only if that much is free and its share of the weights leaves
+    room for KV cache. Among hosts with enough qualifying devices, the score prefers
+    free memory, then idle compute, and penalizes vLLM instances already running.
+    """
+    placement = Placement(host=stats.host, stats=stats)
+    usable = []
+    for gpu in stats.gpus:
+        budget = gpu_memory_utilization * gpu.mem_total
+        if gpu.mem_free < budget:
+            continue
+        if model_memory is not None and model_memory / tensor_parallel_size > budget * (1 - KV_CACHE_SHARE):
+            continue
+        usable.append(gpu)
+    if len(usable) < tensor_parallel_size:
+        placement.reason = f"{len(usable)}/{len(stats.gpus)} GPUs have room, {tensor_parallel_size} needed"
+        return placement
+    chosen = sorted(usable, key=lambda g: (-g.mem_free / g.mem_total, g.util, g.index))[:tensor_parallel_size]
+    free_share = sum(g.mem_free / g.mem_total for g in chosen) / len(chosen)
+    idle_share = 1 - sum(g.util for g in chosen) / len(chosen) / 100
+    placement.score = free_share + 0.5 * idle_share - INSTANCE_PENALTY * stats.vllm_instances
+    placement.gpus = sorted(g.index for g in chosen)
+    return placement
+
+
+def rank_hosts(
+    hosts: Iterable[str],
+    tensor_parallel_size: int = 1,
+    model_memory: Optional[int] = None,
+    gpu_memory_utilization: float = DEFAULT_GPU_MEMORY_UTILIZATION,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    host_timeout: float = DEFAULT_HOST_TIMEOUT,
+    query=query_host_gpus,
+) -> List[Placement]:
+    """Query every host concurrently and return placements, best feasible first."""
+    placements = []
+    for res in fan_out(hosts, query, max_workers=max_workers, host_timeout=host_timeout):
+        if not res.ok:
+            placements.append(Placement(host=res.host, reason="timed out" if res.timed_out else f"error: {res.error}"))
+        elif res.value is None:
+            placements.append(Placement(host=res.host, reason="no GPUs reported by nvidia-smi"))
+        else:
+            placements.append(score_host(res.value, tensor_parallel_size, model_memory, gpu_memory_utilization))
+    return sorted(placements, key=lambda p: (not p.feasible, -p.score, p.host))
@@ -0,0 +1,85 @@
+import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import psutil
+
+from .statefile import atomic_write_json, locked, read_json, state_path
+
+RESERVATIONS_FILE = "ports.json"
+# A reservation covers the gap between picking a port and the tunnel listening on it.
+DEFAULT_TTL = 120.0
+
+
+def occupancy_bitmap(used: Iterable[int], start: int, end: int) -> int:
+    """Int bitmap of the range [start, end]; bit i is set when port start+i is taken."""
+    bits = 0
+    for port in used:
+        if start <= port <= end:
+            bits |= 1 << (port - start)
+    return bits
+
+
+def lowest_free(bits: int, size: int) -> Optional[int]:
+    """Index of the lowest clear bit below ``size``, or None when all are set."""
+    # ~bits & (bits + 1) isolates the lowest zero bit in one step.
+    index = (~bits & (bits + 1)).bit_length() - 1
+    return index if index < size else None
+
+
+class PortAllocator:
+    """
+    Cross-process local port allocator.
+
+    Reservations live in a JSON table under the state directory and every allocation is
+    a read-modify-write under an flock, so parallel ``serve`` and ``auto-forward`` runs
+    never hand out the same port. A reservation ends when it is released, when its TTL
+    runs out (by then the tunnel is listening and the port shows up as busy), or when
+    its owner process is gone.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL):
+        self.path = path or state_path(RESERVATIONS_FILE)
+        self.ttl = ttl
+
+    def _live(self, now: float) -> Dict[str, dict]:
+        table = read_json(self.path, {})
+        return {
+            port: r for port, r in table.items()
+            if isinstance(r, dict) and r.get("expires", 0) > now and psutil.pid_exists(r.get("pid", 0))
+        }
+
+    def reserve(self, port_range: Tuple[int, int], busy: Iterable[int] = (), exclude: Iterable[int] = ()) -> Optional[int]:
+        """
+        Reserve the lowest port in ``port_range`` that is not busy, excluded or reserved.
+        Each call is O(range + used ports): the busy set is a fresh listening-port scan
+        and the table is re-read under the lock, so the bitmap is rebuilt every time and
+        only the lowest-free lookup on it is constant time.
+        """
+        start, end = port_range
+        with locked(self.path):
+            now = time.time()
+            live = self._live(now)
+            used = set(busy) | set(exclude) | {int(p) for p in live}
+            index = lowest_free(occupancy_bitmap(used, start, end), end - start + 1)
+            if index is None:
+                atomic_write_json(self.path, live)
+                return None
+            port = start + index
+            live[str(port)] = {"pid": os.getpid(), "expires": now + self.ttl}
+            atomic_write_json(self.path, live)
+            return port
+
+    def release(self, port: int) -> None:
+        with locked(self.path):
+            live = self._live(time.time())
+            if live.pop(str(port), None) is not None:
+                atomic_write_json(self.path, live)
+
+    def reserved(self) -> Dict[int, dict]:
+        with locked(self.path, shared=True):
+            return {int(p): r for p, r in self._live(time.time()).items()}
+
+
+def get_port_allocator() -> PortAllocator:
+    return PortAllocator()
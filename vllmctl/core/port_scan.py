@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+from typing import Dict, Iterable, Optional
+
+from .instrument import count_call
+
+DEFAULT_CONCURRENCY = 128
+# Loopback connects either succeed or get refused almost instantly; a slow accept means
+# something other than an idle HTTP server is on the port.
+DEFAULT_CONNECT_TIMEOUT = 0.1
+DEFAULT_READ_TIMEOUT = 1.0
+MAX_RESPONSE_BYTES = 4 * 1024 * 1024
+
+
+def _decode_chunked(body: bytes) -> bytes:
+    out = b""
+    while body:
+        size_line, _, rest = body.partition(b"\r\n")
+        size = int(size_line.split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            break
+        out += rest[:size]
+        body = rest[size + 2:]
+    return out
+
+
+def parse_http_json(raw: bytes) -> Optional[dict]:
+    """Parse a raw HTTP/1.x response; return the JSON body of a 200 response, else None."""
+    head, sep, body = raw.partition(b"\r\n\r\n")
+    if not sep:
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    status = lines[0].split()
+    if len(status) < 2 or not status[0].startswith("HTTP/") or status[1] != "200":
+        return None
+    headers = {k.strip().lower(): v.strip().lower() for k, _, v in (l.partition(":") for l in lines[1:])}
+    if headers.get("transfer-encoding") == "chunked":
+        body = _decode_chunked(body)
+    try:
+        return json.loads(body.decode("utf-8"))
+    except ValueError:
+        return None
+
+
+async def probe_port(
+    port: int,
+    path: str = "/v1/models",
+    host: str = "127.0.0.1",
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    read_timeout: float = DEFAULT_READ_TIMEOUT,
+) -> Optional[dict]:
+    count_call("http")
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), connect_timeout)
+    except Exception:
+        return None
+    try:
+        request = f"GET {path} HTTP/1.0\r\nHost: {host}:{port}\r\nAccept: application/json\r\n\r\n"
+        writer.write(request.encode())
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(MAX_RESPONSE_BYTES), read_timeout)
+        # read(n) may return before EOF; keep reading until the server closes (HTTP/1.0).
+        while raw and len(raw) < MAX_RESPONSE_BYTES:
+            more = await asyncio.wait_for(reader.read(MAX_RESPONSE_BYTES - len(raw)), read_timeout)
+            if not more:
+                break
+            raw += more
+        return parse_http_json(raw)
+    except Exception:
+        return None
+    finally:
+        writer.close()
+
+
+async def scan_ports_async(
+    ports: Iterable[int],
+    path: str = "/v1/models",
+    concurrency: int = DEFAULT_CONCURRENCY,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    read_timeout: float = DEFAULT_READ_TIMEOUT,
+) -> Dict[int, dict]:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def bounded(port):
+        async with sem:
+            return port, await probe_port(port, path, connect_timeout=connect_timeout, read_timeout=read_timeout)
+
+    results = await asyncio.gather(*(bounded(p) for p in ports))
+    return {port: info for port, info in results if info is not None}
+
+
+def scan_vllm_ports(
+    ports: Iterable[int],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    read_timeout: float = DEFAULT_READ_TIMEOUT,
+) -> Dict[int, dict]:
+    """
+    Probe /v1/models on every port concurrently and return {port: payload} for the ports
+    that answered 200 with JSON (the same answers ping_vllm accepts).
+    """
+    ports = sorted(set(ports))
+    if not ports:
+        return {}
+    coro_args = dict(concurrency=concurrency, connect_timeout=connect_timeout, read_timeout=read_timeout)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(scan_ports_async(ports, **coro_args))
+    # Called from inside an event loop: run the scan on a private loop in a helper thread.
+    result: Dict[int, dict] = {}
+    worker = threading.Thread(target=lambda: result.update(asyncio.run(scan_ports_async(ports, **coro_args))))
+    worker.start()
+    worker.join()
+    return result
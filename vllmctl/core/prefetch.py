@@ -0,0 +1,363 @@
+import fnmatch
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+
+from .fanout import fan_out, DEFAULT_HOST_TIMEOUT
+from .instrument import count_call, run_command
+from .ssh_utils import ssh_argv, run_ssh_command
+
+# Remote Hugging Face hub cache, resolved by the remote shell the way huggingface_hub does.
+REMOTE_HF_CACHE = '"${HF_HUB_CACHE:-${HF_HOME:-$HOME/.cache/huggingface}/hub}"'
+HF_API = "https://huggingface.co/api/models/{model}"
+# LFS blobs are named by the sha256 of their content, so the name is the checksum.
+SHA256_NAME = re.compile(r"^[0-9a-f]{64}$")
+DEFAULT_PREFETCH_WORKERS = 16
+PROGRESS_INTERVAL = 2.0
+
+
+def is_hub_model(model: str) -> bool:
+    """True for ``org/name`` repo ids, False for local paths on the server."""
+    return not model.startswith(("/", "~", ".")) and model.count("/") == 1
+
+
+def repo_dir(model: str) -> str:
+    return "models--" + model.replace("/", "--")
+
+
+@dataclass
+class CacheInventory:
+    """What one host has of a model in its hub cache: blob name -> size."""
+    revision: Optional[str] = None
+    blobs: Dict[str, int] = field(default_factory=dict)
+    incomplete: int = 0  # bytes in *.incomplete downloads
+    broken_links: int = 0  # snapshot files whose blob is missing
+
+    @property
+    def bytes(self) -> int:
+        return sum(self.blobs.values()) + self.incomplete
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.revision) and bool(self.blobs) and not self.incomplete and not self.broken_links
+
+
+def inventory_command(model: str) -> str:
+    c = f'{REMOTE_HF_CACHE}/{repo_dir(model)}'
+    return (
+        f'c={c}; if [ -d "$c" ]; then '
+        f'echo "rev $(cat "$c/refs/main" 2>/dev/null)"; '
+        f'echo "broken $(find "$c/snapshots" -xtype l 2>/dev/null | wc -l)"; '
+        f'find "$c/blobs" -type f -printf "blob %f %s\\n" 2>/dev/null; '
+        f'else echo missing; fi'
+    )
+
+
+def parse_inventory(out: str) -> Optional[CacheInventory]:
+    """None if the host could not be asked; an empty inventory if it has nothing."""
+    lines = out.strip().splitlines()
+    if not lines or lines[0].startswith("[ssh error"):
+        return None
+    inv = CacheInventory()
+    for line in lines:
+        parts = line.split()
+        if parts[:1] == ["rev"]:
+            inv.revision = parts[1] if len(parts) > 1 else None
+        elif parts[:1] == ["broken"] and len(parts) > 1 and parts[1].isdigit():
+            inv.broken_links = int(parts[1])
+        elif parts[:1] == ["blob"] and len(parts) == 3 and parts[2].isdigit():
+            name, size = parts[1], int(parts[2])
+            if name.endswith(".incomplete"):
+                inv.incomplete += size
+            else:
+                inv.blobs[name] = size
+    return inv
+
+
+def remote_inventory(host: str, model: str, timeout: float = DEFAULT_HOST_TIMEOUT) -> Optional[CacheInventory]:
+    return parse_inventory(run_ssh_command(host, inventory_command(model), timeout=timeout))
+
+
+def hub_files(model: str, timeout: float = 10) -> Optional[Dict[str, int]]:
+    """{file name: size} of the repo's main revision from the Hub API, or None."""
+    headers = {}
+    token = os.environ.get("HF_TOKEN") or os.environ.get("HUGGING_FACE_HUB_TOKEN")
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    try:
+        r = requests.get(HF_API.format(model=model), params={"blobs": "true"}, headers=headers, timeout=timeout)
+        if r.status_code != 200:
+            return None
+        return {s["rfilename"]: int(s.get("size") or 0) for s in r.json().get("siblings", [])}
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        return None
+
+
+def ignore_patterns(files: Optional[Iterable[str]]) -> List[str]:
+    """Files vLLM will not load: pickled checkpoints when safetensors exist, original/ dumps."""
+    patterns = ["original/*", "*.pth"]
+    if files is not None and any(f.endswith(".safetensors") for f in files):
+        patterns += ["*.bin", "*.pt"]
+    return patterns
+
+
+def expected_bytes(files: Optional[Dict[str, int]], ignore: List[str]) -> Optional[int]:
+    if not files:
+        return None
+    return sum(size for name, size in files.items() if not any(fnmatch.fnmatch(name, p) for p in ignore))
+
+
+def download_command(model: str, conda_env: str, ignore: List[str]) -> str:
+    """Remote command that fills the hub cache; huggingface_hub skips files it already has."""
+    script = (
+        "import sys; from huggingface_hub import snapshot_download; "
+        "snapshot_download(sys.argv[1], ignore_patterns=sys.argv[2:] or None)"
+    )
+    inner = " ".join([
+        f"source ~/.bashrc && conda activate {shlex.quote(conda_env)} &&",
+        "python -c", shlex.quote(script), shlex.quote(model), *map(shlex.quote, ignore),
+    ])
+    return f"bash -c {shlex.quote(inner)}"
+
+
+def blobs_to_copy(source: CacheInventory, target: Optional[CacheInventory]) -> List[str]:
+    """Source blobs the target lacks or holds with a different size."""
+    have = target.blobs if target else {}
+    return sorted(name for name, size in source.blobs.items() if have.get(name) != size)
+
+
+def verify_command(model: str, names: Iterable[str]) -> str:
+    """Remote command printing the sha256-named blobs whose content does not match."""
+    names = [n for n in names if SHA256_NAME.match(n)]
+    return (
+        f'cd {REMOTE_HF_CACHE}/{repo_dir(model)}/blobs 2>/dev/null && '
+        f'for f in {" ".join(names)}; do [ -f "$f" ] || continue; '
+        f'[ "$(sha256sum "$f" | cut -d" " -f1)" = "$f" ] || echo "$f"; done; true'
+    )
+
+
+def corrupt_blobs(host: str, model: str, names: Iterable[str], timeout: Optional[float] = None) -> Optional[List[str]]:
+    names = [n for n in names if SHA256_NAME.match(n)]
+    if not names:
+        return []
+    out = run_ssh_command(host, verify_command(model, names), timeout=timeout)
+    if out.startswith("[ssh error"):
+        return None
+    return [line.strip() for line in out.splitlines() if SHA256_NAME.match(line.strip())]
+
+
+def copy_blobs(source: str, target: str, model: str, names: List[str]) -> Optional[str]:
+    """
+    Stream blobs plus the snapshot links and refs from source to target with tar,
+    relayed through this machine over the ssh config. Returns an error or None.
+    """
+    d = repo_dir(model)
+    paths = [f"{d}/refs", f"{d}/snapshots"] + [f"{d}/blobs/{n}" for n in names]
+    send = f"cd {REMOTE_HF_CACHE} && tar -cf - {' '.join(shlex.quote(p) for p in paths)}"
+    receive = f"mkdir -p {REMOTE_HF_CACHE} && cd {REMOTE_HF_CACHE} && tar -xf -"
+    count_call("subprocess", 2)
+    sender = subprocess.Popen(ssh_argv(source, send), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    receiver = subprocess.Popen(ssh_argv(target, receive), stdin=sender.stdout, stderr=subprocess.PIPE)
+    sender.stdout.close()  # the receiver owns the pipe now
+    _, receive_err = receiver.communicate()
+    send_err = sender.stderr.read()
+    sender.wait()
+    if sender.returncode != 0:
+        return f"tar on {source} failed: {send_err.decode(errors='replace').strip()}"
+    if receiver.returncode != 0:
+        return f"tar on {target} failed: {receive_err.decode(errors='replace').strip()}"
+    return None
+
+
+@dataclass
+class PrefetchStatus:
+    host: str
+    state: str = "pending"  # pending, checking, downloading, copying, verifying, done, up to date, failed
+    source: Optional[str] = None  # peer host, or None for the Hub
+    bytes_done: int = 0
+    bytes_total: Optional[int] = None
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in ("downloading", "copying")
+
+    @property
+    def ok(self) -> bool:
+        return self.state in ("done", "up to date")
+
+    def elapsed(self, now: float) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or now) - self.started
+
+
+class Prefetcher:
+    """
+    Stage a model's weights into the hub cache of several hosts at once.
+
+    Each host either downloads from the Hub (huggingface_hub skips files it already
+    has) or, with a ``source`` peer, receives only the blobs it lacks. Blob names are
+    content checksums, so a blob with the right name and size is skipped; with
+    ``verify`` existing and copied blobs are also re-hashed on the host. ``source="auto"``
+    uses a target host that already has a complete copy. Progress is sampled by
+    listing each active host's cache.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str],
+        model: str,
+        source: Optional[str] = None,
+        conda_env: str = "vllm_env",
+        verify: bool = False,
+        max_workers: int = DEFAULT_PREFETCH_WORKERS,
+        host_timeout: float = DEFAULT_HOST_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.hosts = list(dict.fromkeys(hosts))
+        self.model = model
+        self.source = source
+        self.conda_env = conda_env
+        self.verify = verify
+        self.max_workers = max_workers
+        self.host_timeout = host_timeout
+        self.clock = clock
+        self.statuses: Dict[str, PrefetchStatus] = {h: PrefetchStatus(host=h) for h in self.hosts}
+        self.inventories: Dict[str, Optional[CacheInventory]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures = []
+
+    def _set(self, host: str, **changes) -> None:
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self.statuses[host], name, value)
+
+    def plan(self) -> None:
+        """Inventory every host (and the source) in parallel and pick the source."""
+        hosts = self.hosts + ([self.source] if self.source not in (None, "auto") and self.source not in self.hosts else [])
+        for host in self.hosts:
+            self._set(host, state="checking")
+        for res in fan_out(hosts, lambda h, t: remote_inventory(h, self.model, timeout=t), host_timeout=self.host_timeout):
+            self.inventories[res.host] = res.value if res.ok else None
+        if self.source == "auto":
+            complete = [h for h in self.hosts if self.inventories.get(h) and self.inventories[h].complete]
+            self.source = max(complete, key=lambda h: self.inventories[h].bytes) if complete else None
+        if self.source is not None:
+            src = self.inventories.get(self.source)
+            if src is None or not src.complete:
+                self.source = None  # nothing usable there; fall back to the Hub
+        if self.source in self.statuses:
+            self._set(self.source, state="up to date", bytes_done=self.inventories[self.source].bytes,
+                      bytes_total=self.inventories[self.source].bytes)
+
+    def start(self) -> None:
+        self.plan()
+        ignore, total = [], None
+        if self.source is None:
+            files = hub_files(self.model)
+            ignore = ignore_patterns(files)
+            total = expected_bytes(files, ignore)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(self.hosts))))
+        for host in self.hosts:
+            if host == self.source:
+                continue
+            if self.inventories.get(host) is None:
+                self._set(host, state="failed", error="host did not answer")
+                continue
+            self._futures.append(self._executor.submit(self._stage, host, ignore, total))
+
+    def _stage(self, host: str, ignore: List[str], total: Optional[int]) -> None:
+        inv = self.inventories[host]
+        self._set(host, started=self.clock(), bytes_done=inv.bytes, source=self.source)
+        try:
+            if self.source is not None:
+                self._copy(host, inv)
+            else:
+                self._set(host, state="downloading", bytes_total=total)
+                result = run_command(ssh_argv(host, download_command(self.model, self.conda_env, ignore)), capture_output=True, text=True)
+                if result.returncode != 0:
+                    lines = (result.stderr or result.stdout or "").strip().splitlines()
+                    raise RuntimeError(lines[-1] if lines else f"download exited with {result.returncode}")
+                after = remote_inventory(host, self.model, timeout=self.host_timeout)
+                unchanged = inv.complete and after is not None and after.blobs == inv.blobs
+                self._set(host, state="up to date" if unchanged else "done")
+            self.refresh(host)
+        except Exception as e:
+            self._set(host, state="failed", error=str(e))
+        finally:
+            self._set(host, finished=self.clock())
+
+    def _copy(self, host: str, inv: CacheInventory) -> None:
+        src = self.inventories[self.source]
+        names = blobs_to_copy(src, inv)
+        if self.verify:
+            self._set(host, state="verifying")
+            bad = corrupt_blobs(host, self.model, [n for n in src.blobs if n not in names])
+            if bad is None:
+                raise RuntimeError("could not verify existing blobs")
+            names = sorted(set(names) | set(bad))
+        have = sum(size for name, size in inv.blobs.items() if name in src.blobs and name not in names)
+        self._set(host, bytes_total=src.bytes, bytes_done=have)
+        if not names and inv.revision == src.revision and not inv.broken_links:
+            self._set(host, state="up to date")
+            return
+        self._set(host, state="copying")
+        error = copy_blobs(self.source, host, self.model, names)
+        if error:
+            raise RuntimeError(error)
+        if self.verify:
+            self._set(host, state="verifying")
+            bad = corrupt_blobs(host, self.model, names)
+            if bad:
+                raise RuntimeError(f"{len(bad)} copied blobs failed the checksum check")
+        self._set(host, state="done")
+
+    def refresh(self, host: str) -> None:
+        inv = remote_inventory(host, self.model, timeout=self.host_timeout)
+        if inv is not None:
+            self._set(host, bytes_done=inv.bytes)
+
+    def poll_progress(self) -> None:
+        """Update bytes_done of every host that is still transferring (one ssh call each)."""
+        active = [h for h, s in self.snapshot().items() if s.active]
+        for res in fan_out(active, lambda h, t: remote_inventory(h, self.model, timeout=t), host_timeout=self.host_timeout):
+            if res.ok and res.value is not None and self.statuses[res.host].active:
+                self._set(res.host, bytes_done=res.value.bytes)
+
+    def snapshot(self) -> Dict[str, PrefetchStatus]:
+        with self._lock:
+            return {h: PrefetchStatus(**vars(s)) for h, s in self.statuses.items()}
+
+    def done(self) -> bool:
+        return all(f.done() for f in self._futures)
+
+    def wait(self) -> Dict[str, PrefetchStatus]:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        return self.snapshot()
+
+    def run(self, interval: float = PROGRESS_INTERVAL, on_progress: Optional[Callable[[Dict[str, PrefetchStatus]], None]] = None) -> Dict[str, PrefetchStatus]:
+        self.start()
+        while True:
+            if on_progress:
+                on_progress(self.snapshot())
+            wait_futures(self._futures, timeout=interval)
+            if self.done():
+                break
+            self.poll_progress()
+        result = self.wait()
+        if on_progress:
+            on_progress(result)
+        return result
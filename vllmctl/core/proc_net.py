@@ -0,0 +1,113 @@
+import os
+import socket
+import struct
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+PROC_NET_TCP = "/proc/net/tcp"
+PROC_NET_TCP6 = "/proc/net/tcp6"
+TCP_LISTEN = "0A"
+
+
+@dataclass(frozen=True)
+class ListeningSocket:
+    family: int  # socket.AF_INET or socket.AF_INET6
+    address: str
+    port: int
+    inode: int
+    pid: Optional[int] = None
+
+    @property
+    def is_local(self) -> bool:
+        """True if the socket accepts connections on a loopback address (what ping_vllm uses)."""
+        addr = self.address
+        if addr.startswith("::ffff:"):
+            addr = addr[7:]
+        return addr.startswith("127.") or addr in ("0.0.0.0", "::", "::1")
+
+
+def _decode_address(hex_addr: str, family: int) -> str:
+    # The kernel prints addresses as native-endian 32-bit words.
+    if family == socket.AF_INET:
+        return socket.inet_ntop(socket.AF_INET, struct.pack("=I", int(hex_addr, 16)))
+    words = [int(hex_addr[i:i + 8], 16) for i in range(0, 32, 8)]
+    return socket.inet_ntop(socket.AF_INET6, struct.pack("=4I", *words))
+
+
+def _parse_table(path: str, family: int) -> List[ListeningSocket]:
+    sockets = []
+    try:
+        with open(path) as f:
+            next(f, None)
+            for line in f:
+                parts = line.split()
+                if len(parts) < 10 or parts[3] != TCP_LISTEN:
+                    continue
+                hex_addr, hex_port = parts[1].rsplit(":", 1)
+                sockets.append(ListeningSocket(
+                    family=family,
+                    address=_decode_address(hex_addr, family),
+                    port=int(hex_port, 16),
+                    inode=int(parts[9]),
+                ))
+    except (FileNotFoundError, PermissionError):
+        pass
+    return sockets
+
+
+def socket_inode_owners(inodes: Set[int], proc_root: str = "/proc") -> Dict[int, int]:
+    """Map socket inodes to owning pids by scanning /proc/<pid>/fd (only our own processes unless root)."""
+    owners: Dict[int, int] = {}
+    if not inodes:
+        return owners
+    for entry in os.listdir(proc_root):
+        if not entry.isdigit():
+            continue
+        fd_dir = os.path.join(proc_root, entry, "fd")
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                link = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            if link.startswith("socket:["):
+                inode = int(link[8:-1])
+                if inode in inodes:
+                    owners[inode] = int(entry)
+    return owners
+
+
+def read_listening_sockets(
+    with_pids: bool = False,
+    tcp_path: str = PROC_NET_TCP,
+    tcp6_path: str = PROC_NET_TCP6,
+) -> List[ListeningSocket]:
+    """Return TCP LISTEN sockets from the kernel socket tables, optionally with owner pids."""
+    sockets = _parse_table(tcp_path, socket.AF_INET) + _parse_table(tcp6_path, socket.AF_INET6)
+    if with_pids:
+        owners = socket_inode_owners({s.inode for s in sockets if s.inode})
+        sockets = [
+            ListeningSocket(s.family, s.address, s.port, s.inode, owners.get(s.inode))
+            for s in sockets
+        ]
+    return sockets
+
+
+def proc_net_available(tcp_path: str = PROC_NET_TCP) -> bool:
+    return os.path.exists(tcp_path)
+
+
+def listening_ports_in(text: str) -> Set[int]:
+    """LISTEN ports in the text of /proc/net/tcp and/or tcp6 (e.g. fetched from another host)."""
+    ports = set()
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 4 and parts[3] == TCP_LISTEN and ":" in parts[1]:
+            try:
+                ports.add(int(parts[1].rsplit(":", 1)[1], 16))
+            except ValueError:
+                continue
+    return ports
@@ -0,0 +1,188 @@
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .fanout import fan_out, DEFAULT_MAX_WORKERS, DEFAULT_HOST_TIMEOUT
+from .forward import create_forwards, find_free_local_port, release_local_port, remove_forward
+from .port_scan import scan_vllm_ports
+from .ssh_utils import list_remote_models
+from .vllm_probe import get_ssh_forwardings
+
+# A host is re-probed at the latest this many seconds after its last probe.
+DEFAULT_STALE_AFTER = 300.0
+
+
+@dataclass
+class HostState:
+    """Desired state of one host: {remote_port: model id} as of its last probe."""
+    models: Dict[int, str] = field(default_factory=dict)
+    probed_at: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class CycleReport:
+    cycle: int
+    latency: float = 0.0
+    hosts: int = 0
+    probed: int = 0
+    probe_errors: int = 0
+    local_checks: int = 0
+    creates: int = 0
+    kills: int = 0
+    failed: int = 0
+    kept: int = 0
+    rows: List[tuple] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (
+            f"cycle {self.cycle}: {self.latency:.2f}s, probed {self.probed}/{self.hosts} hosts"
+            f" ({self.probe_errors} errors), {self.local_checks} local checks,"
+            f" +{self.creates} -{self.kills} ={self.kept}" + (f" !{self.failed}" if self.failed else "")
+        )
+
+
+def model_id(info) -> str:
+    return info['data'][0].get('id', 'unknown') if info and info.get('data') else 'unknown'
+
+
+def diff_forwards(
+    desired: Dict[str, HostState],
+    actual: Dict[int, Tuple[str, int, int]],
+    remote_port: Optional[int] = None,
+) -> Tuple[List[Tuple[str, int, str]], List[Tuple[str, int, int]], List[Tuple[str, int, int]]]:
+    """
+    Compare desired remote ports with existing forwards ({local_port: (host, remote_port, pid)}).
+    Returns (creates [(host, rport, model)], kills [(host, rport, lport)], kept [(host, rport, lport)]).
+    Only hosts present in ``desired`` are considered, so forwards to other hosts are left alone.
+    """
+    forwarded = {}
+    for lport, (host, rport, pid) in actual.items():
+        if host in desired and (remote_port is None or rport == remote_port):
+            forwarded.setdefault((host, rport), lport)
+    creates, kills, kept = [], [], []
+    for host, state in sorted(desired.items()):
+        for rport, model in sorted(state.models.items()):
+            if (host, rport) in forwarded:
+                kept.append((host, rport, forwarded[(host, rport)]))
+            else:
+                creates.append((host, rport, model))
+    for (host, rport), lport in sorted(forwarded.items()):
+        if rport not in desired[host].models:
+            kills.append((host, rport, lport))
+    return creates, kills, kept
+
+
+class ForwardReconciler:
+    """
+    Keeps local forwards in line with the vLLM instances running on a set of hosts.
+
+    The desired state ({host: {remote_port: model}}) is cached between cycles. A cycle
+    re-probes only hosts whose state is older than ``stale_after`` or whose forwards
+    stopped answering locally, diffs the desired state against the ssh forwards that
+    exist, and applies just the creates and kills of that diff: healthy tunnels are
+    never touched.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str],
+        remote_port: Optional[int] = None,
+        local_range: Tuple[int, int] = (16100, 16199),
+        no_kill: bool = False,
+        stale_after: float = DEFAULT_STALE_AFTER,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        host_timeout: float = DEFAULT_HOST_TIMEOUT,
+        mux: bool = False,
+        probe: Optional[Callable[[str, float], Dict[int, dict]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.hosts = list(hosts)
+        self.remote_port = remote_port
+        self.local_range = local_range
+        self.no_kill = no_kill
+        self.stale_after = stale_after
+        self.max_workers = max_workers
+        self.host_timeout = host_timeout
+        self.mux = mux
+        self.probe = probe or (lambda host, timeout: list_remote_models(host, port=remote_port, timeout=timeout))
+        self.clock = clock
+        self.desired: Dict[str, HostState] = {}
+        self.cycles = 0
+
+    def hosts_to_probe(self, actual: Dict[int, Tuple[str, int, int]], alive_ports) -> List[str]:
+        now = self.clock()
+        broken = {host for lport, (host, rport, pid) in actual.items() if lport not in alive_ports}
+        return [
+            h for h in self.hosts
+            if h not in self.desired or now - self.desired[h].probed_at >= self.stale_after or h in broken
+        ]
+
+    def cycle(self) -> CycleReport:
+        self.cycles += 1
+        report = CycleReport(cycle=self.cycles, hosts=len(self.hosts))
+        started = self.clock()
+        actual = {lp: f for lp, f in get_ssh_forwardings().items() if f[0] in self.hosts}
+        alive = scan_vllm_ports(actual)
+        report.local_checks = len(actual)
+        stale = self.hosts_to_probe(actual, alive)
+        for res in fan_out(stale, self.probe, max_workers=self.max_workers, host_timeout=self.host_timeout):
+            report.probed += 1
+            if not res.ok:
+                # Keep the last known state; a flaky probe must not tear down tunnels.
+                report.probe_errors += 1
+                if res.host in self.desired:
+                    self.desired[res.host].error = "timed out" if res.timed_out else res.error
+                continue
+            models = {rport: model_id(info) for rport, info in res.value.items() if info}
+            if self.remote_port is not None:
+                models = {p: m for p, m in models.items() if p == self.remote_port}
+            self.desired[res.host] = HostState(models=models, probed_at=self.clock())
+        creates, kills, kept = diff_forwards(self.desired, actual, self.remote_port)
+        report.kept = len(kept)
+        report.rows += [(h, rp, lp, "Already forwarded", self.desired[h].models.get(rp)) for h, rp, lp in kept]
+        self._apply_kills(kills, report)
+        self._apply_creates(creates, report)
+        report.latency = self.clock() - started
+        return report
+
+    def _apply_kills(self, kills, report: CycleReport) -> None:
+        for host, rport, lport in kills:
+            if self.no_kill:
+                report.rows.append((host, rport, lport, "Forward kept (model not found, no-kill)", None))
+                continue
+            remove_forward(host, rport, lport)
+            report.kills += 1
+            report.rows.append((host, rport, lport, "Forward killed (model not found)", None))
+
+    def _apply_creates(self, creates, report: CycleReport) -> None:
+        planned = []
+        claimed = set()
+        for host, rport, model in creates:
+            lport = find_free_local_port(self.local_range, exclude=claimed)
+            if not lport:
+                report.failed += 1
+                report.rows.append((host, rport, None, "No free local ports", model))
+                continue
+            claimed.add(lport)
+            planned.append((host, rport, lport, model))
+        results = create_forwards([(h, rp, lp) for h, rp, lp, _ in planned], mux=self.mux)
+        for (host, rport, lport, model), tunnel in zip(planned, results):
+            if tunnel.ok:
+                report.creates += 1
+                report.rows.append((host, rport, lport, "Forwarded", model))
+            else:
+                release_local_port(lport)
+                report.failed += 1
+                report.rows.append((host, rport, lport, f"Tunnel failed: {tunnel.error}", model))
+
+    def run(self, interval: float, iterations: Optional[int] = None,
+            on_cycle: Optional[Callable[[CycleReport], None]] = None, sleep: Callable[[float], None] = time.sleep) -> None:
+        done = 0
+        while iterations is None or done < iterations:
+            report = self.cycle()
+            if on_cycle:
+                on_cycle(report)
+            done += 1
+            if iterations is None or done < iterations:
+                sleep(max(0.0, interval - report.latency))
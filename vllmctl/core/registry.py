@@ -0,0 +1,141 @@
+import time
+from dataclasses import asdict, dataclass, field, fields
+from typing import Dict, Iterable, Optional
+
+import psutil
+
+from .statefile import atomic_write_json, locked, read_json, state_path
+
+REGISTRY_FILE = "endpoints.json"
+# extra key: pid of the supervisor reconnecting this forward; prune() leaves it alone while that runs
+SUPERVISOR_KEY = "supervisor_pid"
+
+
+@dataclass
+class Endpoint:
+    local_port: int
+    host: Optional[str] = None
+    remote_port: Optional[int] = None
+    model: Optional[str] = None
+    tmux_session: Optional[str] = None
+    created: float = 0.0
+    last_seen: Optional[float] = None
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Endpoint":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class EndpointRegistry:
+    """
+    On-disk record of the endpoints vllmctl created (tunnels and launched servers),
+    keyed by local port. Every change is read-modify-write under an flock and lands
+    with an atomic rename, so concurrent vllmctl processes never see a torn file.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or state_path(REGISTRY_FILE)
+
+    def _load(self) -> Dict[int, Endpoint]:
+        raw = read_json(self.path, {})
+        endpoints = {}
+        for key, value in raw.items():
+            try:
+                endpoints[int(key)] = Endpoint.from_dict(value)
+            except (TypeError, ValueError):
+                continue
+        return endpoints
+
+    def _save(self, endpoints: Dict[int, Endpoint]) -> None:
+        atomic_write_json(self.path, {str(port): asdict(ep) for port, ep in endpoints.items()})
+
+    def all(self) -> Dict[int, Endpoint]:
+        with locked(self.path, shared=True):
+            return self._load()
+
+    def get(self, local_port: int) -> Optional[Endpoint]:
+        return self.all().get(local_port)
+
+    def register(self, local_port: int, host: Optional[str] = None, remote_port: Optional[int] = None,
+                 model: Optional[str] = None, tmux_session: Optional[str] = None, **extra) -> Endpoint:
+        with locked(self.path):
+            endpoints = self._load()
+            now = time.time()
+            previous = endpoints.get(local_port)
+            same_target = previous is not None and previous.host == host and previous.remote_port == remote_port
+            if same_target and previous.tmux_session == tmux_session:
+                # the same tunnel made again (a reconnect): keep what was recorded about it
+                extra = {**previous.extra, **extra}
+            ep = Endpoint(
+                local_port=local_port,
+                host=host,
+                remote_port=remote_port,
+                model=model or (previous.model if same_target else None),
+                tmux_session=tmux_session,
+                created=now,
+                last_seen=None,
+                extra=extra,
+            )
+            endpoints[local_port] = ep
+            self._save(endpoints)
+            return ep
+
+    def update(self, local_port: int, **changes) -> Optional[Endpoint]:
+        with locked(self.path):
+            endpoints = self._load()
+            ep = endpoints.get(local_port)
+            if ep is None:
+                return None
+            extra = changes.pop("extra", None)
+            for key, value in changes.items():
+                setattr(ep, key, value)
+            if extra:
+                ep.extra.update(extra)
+            self._save(endpoints)
+            return ep
+
+    def touch(self, seen: Dict[int, Optional[str]]) -> None:
+        """Record that these registered ports answered just now (with their model ids)."""
+        if not seen:
+            return
+        with locked(self.path):
+            endpoints = self._load()
+            now = time.time()
+            changed = False
+            for port, model in seen.items():
+                ep = endpoints.get(port)
+                if ep is None:
+                    continue
+                ep.last_seen = now
+                if model:
+                    ep.model = model
+                changed = True
+            if changed:
+                self._save(endpoints)
+
+    def remove(self, local_ports: Iterable[int]) -> None:
+        local_ports = set(local_ports)
+        if not local_ports:
+            return
+        with locked(self.path):
+            endpoints = self._load()
+            if local_ports & set(endpoints):
+                for port in local_ports:
+                    endpoints.pop(port, None)
+                self._save(endpoints)
+
+    def prune(self, listening_ports: Iterable[int]) -> None:
+        """Drop endpoints whose local port is no longer listening, unless a live supervisor owns them."""
+        listening_ports = set(listening_ports)
+        self.remove(p for p, ep in self.all().items() if p not in listening_ports and not _supervised(ep))
+
+
+def _supervised(ep: Endpoint) -> bool:
+    pid = ep.extra.get(SUPERVISOR_KEY)
+    return isinstance(pid, int) and psutil.pid_exists(pid)
+
+
+def get_registry() -> EndpointRegistry:
+    return EndpointRegistry()
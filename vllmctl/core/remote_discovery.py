@@ -0,0 +1,157 @@
+import inspect
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from . import proc_net
+from .ssh_utils import run_ssh_command
+
+# Runs on the remote host with the system python3 (stdlib only, py3.6+). It lists
+# LISTEN sockets from /proc/net/tcp{,6}, probes every candidate /v1/models endpoint
+# in parallel, resolves the owning process of each vLLM socket and the tmux session
+# it runs in, and prints a single JSON document. The socket table parsing is
+# proc_net's own code (see _remote_prelude), so both sides decode addresses alike.
+_REMOTE_MAIN = r'''
+import json, subprocess, sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+
+MIN_PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+PROBE_TIMEOUT = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+def listening():
+    socks = {}
+    for path, family in ((PROC_NET_TCP, socket.AF_INET), (PROC_NET_TCP6, socket.AF_INET6)):
+        for s in _parse_table(path, family):
+            if s.port >= MIN_PORT:
+                socks.setdefault(s.port, []).append(s)
+    return socks
+
+def probe_url(port, addrs):
+    hosts = [s.address for s in addrs]
+    if any(h.startswith("127.") or h in ("0.0.0.0", "::") for h in hosts):
+        return "http://127.0.0.1:%d/v1/models" % port
+    if "::1" in hosts:
+        return "http://[::1]:%d/v1/models" % port
+    first = addrs[0]
+    return "http://%s:%d/v1/models" % (first.address if first.family == socket.AF_INET else "[%s]" % first.address, port)
+
+def probe(item):
+    port, addrs = item
+    try:
+        body = urlopen(probe_url(port, addrs), timeout=PROBE_TIMEOUT).read()
+        info = json.loads(body.decode("utf-8", "replace"))
+        if isinstance(info, dict) and isinstance(info.get("data"), list):
+            return port, info
+    except Exception:
+        pass
+    return port, None
+
+def parent(pid):
+    try:
+        with open("/proc/%d/stat" % pid) as f:
+            return int(f.read().rsplit(")", 1)[1].split()[1])
+    except Exception:
+        return 0
+
+def tmux_panes():
+    try:
+        out = subprocess.check_output(["tmux", "list-panes", "-a", "-F", "#{pane_pid} #{session_name}"], stderr=open(os.devnull, "w"))
+    except Exception:
+        return {}
+    panes = {}
+    for line in out.decode().splitlines():
+        pid, _, name = line.partition(" ")
+        if pid.isdigit():
+            panes[int(pid)] = name
+    return panes
+
+socks = listening()
+with ThreadPoolExecutor(max_workers=32) as pool:
+    found = [(p, info) for p, info in pool.map(probe, sorted(socks.items())) if info]
+inode_of = {}
+for port, _ in found:
+    for s in socks[port]:
+        if s.inode:
+            inode_of[port] = s.inode
+owners = socket_inode_owners(set(inode_of.values()))
+panes = tmux_panes()
+instances = []
+for port, info in found:
+    pid = owners.get(inode_of.get(port))
+    session, cur = None, pid
+    while cur and cur > 1 and session is None:
+        session = panes.get(cur)
+        cur = parent(cur)
+    models = [{"id": m.get("id"), "max_model_len": m.get("max_model_len")} for m in info["data"] if isinstance(m, dict)]
+    instances.append({"port": port, "pid": pid, "tmux": session, "models": models, "info": info})
+print(json.dumps({"instances": instances}))
+'''
+
+
+def _remote_prelude() -> str:
+    """
+    proc_net's table parsing and socket owner scan, as source for the remote script.
+    ListeningSocket is replaced by a plain class because dataclasses needs py3.7.
+    """
+    return "\n".join([
+        "import os, socket, struct",
+        "from typing import Dict, List, Optional, Set",
+        f"PROC_NET_TCP = {proc_net.PROC_NET_TCP!r}",
+        f"PROC_NET_TCP6 = {proc_net.PROC_NET_TCP6!r}",
+        f"TCP_LISTEN = {proc_net.TCP_LISTEN!r}",
+        "class ListeningSocket(object):",
+        "    def __init__(self, family, address, port, inode, pid=None):",
+        "        self.family, self.address, self.port, self.inode, self.pid = family, address, port, inode, pid",
+        inspect.getsource(proc_net._decode_address),
+        inspect.getsource(proc_net._parse_table),
+        inspect.getsource(proc_net.socket_inode_owners),
+    ])
+
+
+REMOTE_DISCOVERY_SCRIPT = _remote_prelude() + _REMOTE_MAIN
+
+
+@dataclass
+class RemoteInstance:
+    port: int
+    models: List[dict] = field(default_factory=list)
+    tmux_session: Optional[str] = None
+    pid: Optional[int] = None
+    info: dict = field(default_factory=dict)
+
+    @property
+    def model_name(self) -> str:
+        return (self.models[0].get('id') or 'unknown') if self.models else 'unknown'
+
+    @property
+    def max_model_len(self) -> Optional[int]:
+        return self.models[0].get('max_model_len') if self.models else None
+
+
+def discover_remote_instances(host: str, timeout=5, min_port: int = 1024, probe_timeout: float = 0.5) -> Optional[List[RemoteInstance]]:
+    """
+    Find every vLLM instance on host in a single ssh round-trip.
+    Returns None when discovery could not run there (e.g. no python3 on the host).
+    """
+    out = run_ssh_command(host, f"python3 - {min_port} {probe_timeout}", timeout=timeout, input=REMOTE_DISCOVERY_SCRIPT)
+    out = out.strip() if out else ""
+    if not out.startswith('{'):
+        return None
+    try:
+        doc = json.loads(out.splitlines()[-1])
+    except Exception:
+        return None
+    instances = []
+    for item in doc.get("instances", []):
+        try:
+            instances.append(RemoteInstance(
+                port=int(item["port"]),
+                models=item.get("models") or [],
+                tmux_session=item.get("tmux"),
+                pid=item.get("pid"),
+                info=item.get("info") or {},
+            ))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return sorted(instances, key=lambda i: i.port)
@@ -0,0 +1,122 @@
+import re
+import subprocess
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .instrument import run_command
+from .ssh_utils import ssh_argv
+
+# Remote directory (relative to the remote $HOME) where server panes are piped.
+REMOTE_LOG_DIR = ".vllmctl/logs"
+# At most this much new output is fetched per poll.
+MAX_CHUNK = 1024 * 1024
+TAIL_LINES = 30
+_STATUS_MARKER = b"\n__vllmctl_status__ "
+_STATUS_PRINTF = r"\n__vllmctl_status__ %s\n"
+
+# Lines that mean the server will not come up (checked before the bound patterns).
+FAILURE_PATTERNS = [re.compile(p) for p in (
+    r"Traceback \(most recent call last\)",
+    r"CUDA out of memory",
+    r"OutOfMemoryError",
+    r"Engine core initialization failed",
+    r"^vllm: error:",
+    r"EnvironmentNameNotFound|Could not find conda environment",
+    r"vllm: command not found",
+)]
+# Lines printed when the API server is about to accept connections.
+BOUND_PATTERNS = [re.compile(p) for p in (
+    r"Uvicorn running on",
+    r"Starting vLLM API server",
+    r"Application startup complete",
+)]
+
+
+def remote_log_path(session: str) -> str:
+    return f"{REMOTE_LOG_DIR}/{session}.log"
+
+
+def start_logged_session_command(session: str, command: str) -> str:
+    """
+    Remote shell command that starts ``command`` in a detached tmux session and pipes
+    the pane into a fresh log file. Both tmux commands run in one tmux call, before
+    the shell in the pane has printed anything.
+    """
+    log = remote_log_path(session)
+    return (
+        f"mkdir -p {REMOTE_LOG_DIR} && : > {log} && "
+        f'tmux new-session -d -s {session} "{command}" \\; pipe-pane -t {session} -o \'cat >> {log}\''
+    )
+
+
+def classify_log_line(line: str) -> Optional[str]:
+    """"failed", "bound" or None for one line of server output."""
+    if any(p.search(line) for p in FAILURE_PATTERNS):
+        return "failed"
+    if any(p.search(line) for p in BOUND_PATTERNS):
+        return "bound"
+    return None
+
+
+@dataclass
+class LogChunk:
+    lines: List[str] = field(default_factory=list)
+    alive: Optional[bool] = None  # None if the host could not be asked
+
+
+class RemoteLogTail:
+    """
+    Incremental reader of a server's remote log. Each poll is one ssh call over the
+    pooled master: it reports whether the tmux session still exists and returns only
+    the bytes written since the previous poll.
+    """
+
+    def __init__(self, host: str, session: str, timeout: float = 10):
+        self.host = host
+        self.session = session
+        self.path = remote_log_path(session)
+        self.timeout = timeout
+        self.offset = 0
+        self.tail = deque(maxlen=TAIL_LINES)
+        self._partial = b""
+
+    def command(self) -> str:
+        # session state first: if it is gone, everything it wrote is already in the file
+        return (
+            f"tmux has-session -t {self.session} 2>/dev/null && s=alive || s=dead; "
+            f"tail -c +{self.offset + 1} {self.path} 2>/dev/null | head -c {MAX_CHUNK}; "
+            f"printf '{_STATUS_PRINTF}' \"$s\""
+        )
+
+    def feed(self, output: bytes) -> LogChunk:
+        """Parse the output of ``command()`` and advance the offset."""
+        idx = output.rfind(_STATUS_MARKER)
+        if idx < 0:
+            return LogChunk()
+        data = output[:idx]
+        status = output[idx + len(_STATUS_MARKER):].strip()
+        self.offset += len(data)
+        data = self._partial + data
+        *complete, self._partial = data.split(b"\n")
+        lines = [line.decode(errors="replace").rstrip("\r") for line in complete]
+        self.tail.extend(lines)
+        return LogChunk(lines=lines, alive=status == b"alive")
+
+    def poll(self) -> LogChunk:
+        try:
+            result = run_command(
+                ssh_argv(self.host, self.command(), timeout=self.timeout),
+                capture_output=True, timeout=self.timeout
+            )
+        except (OSError, subprocess.SubprocessError):
+            return LogChunk()
+        return self.feed(result.stdout or b"")
+
+    def flush(self) -> List[str]:
+        """The unterminated last line, if any (used once the server is gone)."""
+        if not self._partial:
+            return []
+        line, self._partial = self._partial.decode(errors="replace"), b""
+        self.tail.append(line)
+        return [line]
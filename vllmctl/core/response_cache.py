@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+from .statefile import state_path
+
+CACHE_FILE = "responses.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 24 * 3600.0
+MMAP_SIZE = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    content_type TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def is_cacheable(payload: dict) -> bool:
+    """Only deterministic, non-streamed requests: temperature 0 and a single choice."""
+    if payload.get("stream"):
+        return False
+    if payload.get("n", 1) != 1 or payload.get("best_of", 1) not in (None, 1):
+        return False
+    try:
+        return float(payload["temperature"]) == 0.0
+    except (KeyError, TypeError, ValueError):
+        # absent or not a number: leave it to the server to accept or reject
+        return False
+
+
+def cache_key(path: str, model: str, payload: dict) -> str:
+    """
+    Hash of the endpoint and the canonical JSON of the body, with "model" set to the
+    model that serves it (a request may leave it out when only one model is served).
+    """
+    canonical = json.dumps({**payload, "model": model}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{path}\n{canonical}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent response cache in a SQLite file, shared by every vllmctl process.
+
+    Entries expire ``ttl`` seconds after they were stored; when the stored bodies exceed
+    ``max_bytes`` the least recently used entries are evicted. Hit/miss counters and
+    bytes saved live in the same database so other commands (vllm-queue-top) can
+    report them.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.path = path or state_path(CACHE_FILE)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            # reads of hot entries come straight from the page cache via mmap
+            db.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _bump(db, **counters) -> None:
+        for name, value in counters.items():
+            db.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value),
+            )
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[int, str, bytes]]:
+        """(status, content_type, body) of a live entry, or None (counted as a miss)."""
+        now = time.time() if now is None else now
+        with self._lock, self._connect() as db:
+            row = db.execute(
+                "SELECT status, content_type, body, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[3] > self.ttl:
+                if row is not None:
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._bump(db, misses=1)
+                return None
+            db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._bump(db, hits=1, bytes_saved=len(row[2]))
+            return row[0], row[1], bytes(row[2])
+
+    def put(self, key: str, status: int, content_type: str, body: bytes, now: Optional[float] = None) -> None:
+        if len(body) > self.max_bytes:
+            return
+        now = time.time() if now is None else now
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, status, content_type, body, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, content_type, sqlite3.Binary(body), len(body), now, now),
+            )
+            db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                evicted = 0
+                for old_key, size in db.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= size
+                    evicted += 1
+                self._bump(db, evictions=evicted)
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM responses")
+            db.execute("DELETE FROM counters")
+
+    def stats(self) -> Dict[str, float]:
+        with self._connect() as db:
+            return _read_stats(db)
+
+
+def _read_stats(db: sqlite3.Connection) -> Dict[str, float]:
+    entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "entries": entries,
+        "bytes": size,
+        "hits": hits,
+        "misses": misses,
+        "evictions": counters.get("evictions", 0),
+        "bytes_saved": counters.get("bytes_saved", 0),
+        "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def existing_cache_stats(path: Optional[str] = None) -> Optional[Dict[str, float]]:
+    """
+    Stats of the default cache if a gateway has ever created it. The file is opened
+    read-only, so a refreshing dashboard never creates it or takes its write lock.
+    """
+    path = path or state_path(CACHE_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        db = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True, timeout=10)
+        try:
+            return _read_stats(db)
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return None
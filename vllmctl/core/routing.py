@@ -0,0 +1,119 @@
+import bisect
+import hashlib
+import json
+import math
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+# Leading characters of a plain completion prompt used for affinity, a stand-in for
+# the first ~100 tokens.
+DEFAULT_PREFIX_CHARS = 400
+DEFAULT_VNODES = 64
+# A replica may take at most this factor times its fair share of in-flight load.
+DEFAULT_LOAD_FACTOR = 1.25
+CONVERSATION_HEADERS = ("X-Conversation-Id", "X-Session-Id")
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def conversation_head(messages) -> Optional[list]:
+    """
+    The messages up to and including the first user turn: the part of a chat that
+    every later turn repeats unchanged, and so what vLLM's prefix cache can reuse.
+    """
+    if not isinstance(messages, list) or not messages:
+        return None
+    for i, message in enumerate(messages):
+        if isinstance(message, dict) and message.get("role") == "user":
+            return messages[:i + 1]
+    return messages
+
+
+def routing_key(payload: dict, headers=None, prefix_chars: int = DEFAULT_PREFIX_CHARS) -> Optional[str]:
+    """
+    Affinity key of a request: an explicit conversation id (header, or
+    ``metadata.conversation_id`` in the body), else a hash of the chat's opening
+    (system prompt and first user message), which stays the same across turns; for
+    plain completions, the leading ``prefix_chars`` of the prompt.
+    """
+    for name in CONVERSATION_HEADERS:
+        if headers is not None and headers.get(name):
+            return "conv:" + headers[name]
+    metadata = payload.get("metadata")
+    if isinstance(metadata, dict) and metadata.get("conversation_id"):
+        return "conv:" + str(metadata["conversation_id"])
+    if "messages" in payload:
+        head = conversation_head(payload["messages"])
+        if head is None:
+            return None
+        digest = hashlib.blake2b(json.dumps(head, sort_keys=True, ensure_ascii=False).encode(), digest_size=16)
+        return "chat:" + digest.hexdigest()
+    prompt = payload.get("prompt")
+    if isinstance(prompt, list):
+        prompt = prompt[0] if prompt else None
+    if not isinstance(prompt, str) or not prompt:
+        return None
+    return "prefix:" + prompt[:prefix_chars]
+
+
+class BoundedLoadRing:
+    """
+    Consistent hashing with bounded loads (Mirrokni et al.): a key goes to the first
+    node clockwise from its hash whose load stays within ``load_factor`` times the
+    average, so one hot key spills over to the next node instead of overloading its
+    own. Nodes are placed ``vnodes`` times on the ring to even out the arcs.
+    """
+
+    def __init__(self, nodes: Iterable[Hashable], vnodes: int = DEFAULT_VNODES, load_factor: float = DEFAULT_LOAD_FACTOR):
+        self.nodes = list(nodes)
+        self.load_factor = load_factor
+        points = sorted((_hash(f"{node}#{i}"), n) for n, node in enumerate(self.nodes) for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [n for _, n in points]
+
+    def preference(self, key: str) -> List[Hashable]:
+        """All nodes in ring order starting from the key's position."""
+        if not self.nodes:
+            return []
+        start = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        order, seen = [], set()
+        for i in range(len(self._owners)):
+            n = self._owners[(start + i) % len(self._owners)]
+            if n not in seen:
+                seen.add(n)
+                order.append(self.nodes[n])
+                if len(order) == len(self.nodes):
+                    break
+        return order
+
+    def capacity(self, total_load: float) -> float:
+        return math.ceil(self.load_factor * (total_load + 1) / len(self.nodes))
+
+    def pick(self, key: str, load: Callable[[Hashable], float]) -> Optional[Hashable]:
+        order = self.preference(key)
+        if not order:
+            return None
+        cap = self.capacity(sum(load(n) for n in self.nodes))
+        for node in order:
+            if load(node) + 1 <= cap:
+                return node
+        return order[0]
+
+
+class RingCache:
+    """Rings keyed by node set, so a ring is rebuilt only when replicas come or go."""
+
+    def __init__(self, vnodes: int = DEFAULT_VNODES, load_factor: float = DEFAULT_LOAD_FACTOR):
+        self.vnodes = vnodes
+        self.load_factor = load_factor
+        self._rings: Dict[tuple, BoundedLoadRing] = {}
+
+    def get(self, nodes: Iterable[Hashable]) -> BoundedLoadRing:
+        key = tuple(sorted(nodes))
+        ring = self._rings.get(key)
+        if ring is None:
+            if len(self._rings) > 64:
+                self._rings.clear()
+            ring = self._rings[key] = BoundedLoadRing(key, self.vnodes, self.load_factor)
+        return ring
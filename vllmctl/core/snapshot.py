@@ -0,0 +1,79 @@
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import FrozenSet, Iterable, Mapping, Optional, Tuple
+
+from .vllm_probe import get_listening_ports, get_ssh_forwardings, get_tmux_panes, scan_local_vllm
+from .registry import get_registry
+
+
+@dataclass(frozen=True)
+class SystemSnapshot:
+    """
+    Read-only view of local state collected once per command: listening ports,
+    ssh forwards, tmux sessions with their pane pids, and /v1/models answers.
+    Consumers take it instead of calling get_listening_ports/get_tmux_sessions/
+    ping_vllm again.
+    """
+    ports: Tuple[int, ...]
+    ssh_forwards: Mapping[int, Tuple[str, int, int]]
+    tmux_panes: Mapping[str, Tuple[int, ...]]
+    models: Mapping[int, dict]
+    taken_at: float
+
+    @property
+    def tmux_sessions(self) -> FrozenSet[str]:
+        return frozenset(self.tmux_panes)
+
+    def ping(self, port: int) -> Optional[dict]:
+        """Stand-in for ping_vllm(port) answered from the snapshot."""
+        return self.models.get(port)
+
+    def model_id(self, port: int) -> Optional[str]:
+        info = self.models.get(port)
+        if info and info.get('data'):
+            return info['data'][0].get('id')
+        return None
+
+
+def collect_snapshot(probe_ports: Optional[Iterable[int]] = None, forwards_only: bool = False) -> SystemSnapshot:
+    """
+    Gather local state with one call per source. Models are probed on ``probe_ports``,
+    on the forwarded ports only (``forwards_only``), or on every listening port.
+    """
+    ports = tuple(get_listening_ports())
+    ssh_forwards = get_ssh_forwardings()
+    tmux_panes = get_tmux_panes()
+    if probe_ports is None:
+        probe_ports = ssh_forwards.keys() if forwards_only else ports
+    models = scan_local_vllm(list(probe_ports))
+    return SystemSnapshot(
+        ports=ports,
+        ssh_forwards=MappingProxyType(dict(ssh_forwards)),
+        tmux_panes=MappingProxyType({name: tuple(pids) for name, pids in tmux_panes.items()}),
+        models=MappingProxyType(dict(models)),
+        taken_at=time.time(),
+    )
+
+
+def collect_known_snapshot(scan: bool = False) -> SystemSnapshot:
+    """
+    Snapshot that probes only the endpoints in the registry, falling back to every
+    listening port when ``scan`` is set or nothing is registered yet. Registered ports
+    that answered get their last-seen time and model id refreshed, and those no longer
+    listening (their forward died) are dropped from the registry.
+    """
+    registry = get_registry()
+    known = registry.all()
+    if scan or not known:
+        snapshot = collect_snapshot()
+    else:
+        snapshot = collect_snapshot(probe_ports=known)
+    try:
+        registry.touch({port: snapshot.model_id(port) for port in known if port in snapshot.models})
+        # an empty port list means the scan failed, not that every forward is gone
+        if snapshot.ports:
+            registry.prune(snapshot.ports)
+    except OSError:
+        pass
+    return snapshot
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+from .instrument import run_command
+
+SSH_CONTROL_DIR = os.path.expanduser("~/.ssh/vllmctl-cm")
+# Seconds a master connection stays up after its last client has gone (ControlPersist).
+DEFAULT_IDLE_TIMEOUT = 300
+# After a failed attempt to open a master, plain ssh is used for this many seconds.
+DEFAULT_RETRY_AFTER = 30
+
+
+class SSHControlPool:
+    """
+    Pool of multiplexed ssh master connections (ControlMaster/ControlPath sockets).
+
+    Every host gets one background master started with ``ssh -M -N -f``; later ssh
+    invocations for that host attach to its control socket and skip the TCP and key
+    handshake. Masters exit on their own after ``idle_timeout`` seconds without
+    clients (ControlPersist), sockets whose master has died are detected with
+    ``ssh -O check`` and removed, and hit/miss counters are kept for reporting.
+    """
+
+    def __init__(
+        self,
+        control_dir: str = SSH_CONTROL_DIR,
+        idle_timeout: int = DEFAULT_IDLE_TIMEOUT,
+        connect_timeout: int = 10,
+        check_interval: float = 30.0,
+        retry_after: float = DEFAULT_RETRY_AFTER,
+        enabled: bool = True,
+    ):
+        self.control_dir = control_dir
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.failures = 0
+        self._last_used: Dict[str, float] = {}
+        self._last_checked: Dict[str, float] = {}
+        self._failed_until: Dict[str, float] = {}
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def control_path(self, host: str) -> str:
+        # Hash the host so the socket path stays short (unix sockets are limited to ~100 bytes).
+        digest = hashlib.sha1(host.encode()).hexdigest()[:16]
+        return os.path.join(self.control_dir, f"cm-{digest}")
+
+    def client_args(self, host: str) -> List[str]:
+        """ssh options that attach to host's control socket without ever becoming a master."""
+        return ["-o", "ControlMaster=no", "-o", f"ControlPath={self.control_path(host)}"]
+
+    def ssh_args(self, host: str, timeout: Optional[float] = None) -> List[str]:
+        """
+        Return ssh options routing a command through host's master, opening it if needed.
+        Returns an empty list (plain ssh) when multiplexing is disabled or unavailable.
+        Opening a master takes at most ``timeout`` seconds, the caller's own budget.
+        """
+        if not self.enabled:
+            return []
+        with self._host_lock(host):
+            now = time.monotonic()
+            path = self.control_path(host)
+            if os.path.exists(path):
+                recently_checked = now - self._last_checked.get(host, float("-inf")) < self.check_interval
+                if recently_checked or self._check(host):
+                    self._last_checked[host] = now
+                    self._last_used[host] = now
+                    self.hits += 1
+                    return self.client_args(host)
+                self.stale += 1
+                self._remove_socket(path)
+            self.misses += 1
+            if now < self._failed_until.get(host, 0):
+                return []
+            if self._open_master(host, timeout):
+                self._last_checked[host] = time.monotonic()
+                self._last_used[host] = time.monotonic()
+                self._failed_until.pop(host, None)
+                return self.client_args(host)
+            self.failures += 1
+            self._failed_until[host] = time.monotonic() + self.retry_after
+            return []
+
+    def is_alive(self, host: str) -> bool:
+        return os.path.exists(self.control_path(host)) and self._check(host)
+
+    def close(self, host: str) -> bool:
+        """Ask host's master to exit and remove its socket."""
+        path = self.control_path(host)
+        if not os.path.exists(path):
+            return False
+        with self._host_lock(host):
+            try:
+                run_command(
+                    ["ssh", "-o", f"ControlPath={path}", "-O", "exit", host],
+                    capture_output=True, text=True, timeout=5
+                )
+            except Exception:
+                pass
+            self._remove_socket(path)
+            self._last_used.pop(host, None)
+            self._last_checked.pop(host, None)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "failures": self.failures,
+            "open": sum(1 for h in self._last_used if os.path.exists(self.control_path(h))),
+        }
+
+    def _host_lock(self, host: str) -> threading.Lock:
+        with self._lock:
+            lock = self._host_locks.get(host)
+            if lock is None:
+                lock = self._host_locks[host] = threading.Lock()
+            return lock
+
+    def _check(self, host: str) -> bool:
+        try:
+            result = run_command(
+                ["ssh", "-o", f"ControlPath={self.control_path(host)}", "-O", "check", host],
+                capture_output=True, text=True, timeout=5
+            )
+            return result.returncode == 0
+        except Exception:
+            return False
+
+    def _open_master(self, host: str, timeout: Optional[float]) -> bool:
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+        connect_timeout = self.connect_timeout if timeout is None else max(1, min(self.connect_timeout, int(timeout)))
+        # ssh -f returns once authenticated; without a caller budget allow a little past ConnectTimeout
+        run_timeout = connect_timeout + 5 if timeout is None else timeout
+        path = self.control_path(host)
+        cmd = [
+            "ssh", "-M", "-N", "-f",
+            "-o", f"ControlPath={path}",
+            "-o", f"ControlPersist={self.idle_timeout}",
+            "-o", f"ConnectTimeout={connect_timeout}",
+            "-o", "BatchMode=yes",
+            # notice a dead connection, so forwards on it are reported down and reopened
+            "-o", "ServerAliveInterval=30",
+            "-o", "ServerAliveCountMax=3",
+            host,
+        ]
+        try:
+            # The master daemonizes after authentication; its stdio must not be our pipes.
+            run_command(
+                cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, timeout=run_timeout
+            )
+        except Exception:
+            return False
+        return os.path.exists(path)
+
+    @staticmethod
+    def _remove_socket(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+_default_pool: Optional[SSHControlPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_ssh_pool() -> SSHControlPool:
+    """Process-wide pool; set VLLMCTL_SSH_MUX=0 to fall back to one ssh connection per call."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            enabled = os.environ.get("VLLMCTL_SSH_MUX", "1") not in ("0", "false", "no")
+            _default_pool = SSHControlPool(enabled=enabled)
+        return _default_pool
@@ -1,7 +1,10 @@
 import os
 import subprocess
 import re
+import time
 from typing import List, Dict, Optional
+from .ssh_pool import get_ssh_pool
+from .instrument import run_command
 
 SSH_CONFIG_PATH = os.path.expanduser("~/.ssh/config")
 
@@ -26,18 +29,27 @@ def parse_ssh_config(conf_path=SSH_CONFIG_PATH):
                 hosts.extend(inc_hosts)
     return hosts
 
-def run_ssh_command(host: str, command: str, timeout=5) -> str:
+def ssh_argv(host: str, command: Optional[str] = None, timeout=None) -> List[str]:
+    """Build an ssh command line that reuses the pooled master connection for host."""
+    argv = ["ssh", *get_ssh_pool().ssh_args(host, timeout=timeout), host]
+    if command is not None:
+        argv.append(command)
+    return argv
+
+def run_ssh_command(host: str, command: str, timeout=5, input: Optional[str] = None) -> str:
     try:
-        result = subprocess.run([
-            "ssh", host, command
-        ], capture_output=True, text=True, timeout=timeout)
+        start = time.monotonic()
+        argv = ssh_argv(host, command, timeout=timeout)
+        # opening the pooled master counts against the same timeout
+        remaining = max(1.0, timeout - (time.monotonic() - start)) if timeout is not None else None
+        result = run_command(argv, capture_output=True, text=True, timeout=remaining, input=input)
         return result.stdout
     except Exception as e:
         return f"[ssh error: {e}]"
 
-def ping_remote_vllm(host: str, port: int) -> Optional[dict]:
+def ping_remote_vllm(host: str, port: int, timeout=5) -> Optional[dict]:
     cmd = f"curl -s --max-time 0.2 http://127.0.0.1:{port}/v1/models"
-    out = run_ssh_command(host, cmd)
+    out = run_ssh_command(host, cmd, timeout=timeout)
     if out and out.strip().startswith('{'):
         try:
             import json
@@ -46,8 +58,18 @@ def ping_remote_vllm(host: str, port: int) -> Optional[dict]:
             return None
     return None
 
-def list_remote_models(host: str, port: int = 8000) -> Dict[int, dict]:
-    info = ping_remote_vllm(host, port)
+def list_remote_models(host: str, port: Optional[int] = 8000, timeout=5) -> Dict[int, dict]:
+    """
+    Returns {remote_port: /v1/models payload}. With port=None every vLLM instance on the
+    host is discovered in one round-trip (falls back to port 8000 without python3 there).
+    """
+    if port is None:
+        from .remote_discovery import discover_remote_instances
+        instances = discover_remote_instances(host, timeout=timeout)
+        if instances is not None:
+            return {inst.port: inst.info for inst in instances}
+        port = 8000
+    info = ping_remote_vllm(host, port, timeout=timeout)
     if info:
         return {port: info}
     return {} 
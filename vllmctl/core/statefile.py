@@ -0,0 +1,60 @@
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def state_dir() -> str:
+    """Directory for vllmctl's local state (VLLMCTL_STATE_DIR, else $XDG_STATE_HOME/vllmctl)."""
+    path = os.environ.get("VLLMCTL_STATE_DIR")
+    if not path:
+        base = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+        path = os.path.join(base, "vllmctl")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def state_path(name: str) -> str:
+    return os.path.join(state_dir(), name)
+
+
+@contextmanager
+def locked(path: str, shared: bool = False):
+    """Hold an flock on ``path + '.lock'`` (exclusive unless ``shared``) for the block."""
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def read_json(path: str, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except ValueError:
+        # A torn or hand-edited file must not break every command.
+        return default
+
+
+def atomic_write_json(path: str, data) -> None:
+    """Write JSON to a temp file in the same directory, fsync it, then rename over ``path``."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,229 @@
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .forward import create_forward
+from .instrument import run_command
+from .registry import SUPERVISOR_KEY, get_registry
+from .tunnels import get_tunnel_manager
+from .vllm_probe import ping_vllm
+
+DEFAULT_INTERVAL = 5.0
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+
+@dataclass
+class SupervisedForward:
+    host: str
+    remote_port: int
+    local_port: int
+    mux: bool = False
+
+
+@dataclass
+class ForwardStats:
+    forward: SupervisedForward
+    up: bool = False
+    up_since: Optional[float] = None
+    down_since: Optional[float] = None
+    uptime: float = 0.0  # completed up periods; see total_uptime()
+    reconnects: int = 0  # reconnect attempts
+    recoveries: int = 0
+    attempts: int = 0  # attempts in the current outage
+    next_attempt: float = 0.0
+    recover_times: List[float] = field(default_factory=list)
+
+    def total_uptime(self, now: float) -> float:
+        return self.uptime + (now - self.up_since if self.up and self.up_since is not None else 0.0)
+
+    @property
+    def last_time_to_recover(self) -> Optional[float]:
+        return self.recover_times[-1] if self.recover_times else None
+
+    @property
+    def mean_time_to_recover(self) -> Optional[float]:
+        return sum(self.recover_times) / len(self.recover_times) if self.recover_times else None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: random.Random) -> float:
+    """Exponential backoff with equal jitter: half the step is fixed, half is random."""
+    step = min(cap, base * (2 ** max(0, attempt - 1)))
+    return step / 2 + rng.uniform(0, step / 2)
+
+
+def forward_is_healthy(forward: SupervisedForward) -> bool:
+    info = ping_vllm(forward.local_port)
+    return bool(info and info.get('data'))
+
+
+def reconnect_forward(forward: SupervisedForward) -> bool:
+    """Recreate a tunnel on its original local port, the same way it was first made."""
+    if forward.mux:
+        # keep the registry entry: re-adding the forward merges into it
+        get_tunnel_manager().cancel_forward(forward.host, forward.local_port, forward.remote_port, forget=False)
+    else:
+        # The session is usually gone already (ssh exited); clear whatever is left quietly.
+        session = f"vllmctl_{forward.host}_{forward.remote_port}_{forward.local_port}"
+        run_command(["tmux", "kill-session", "-t", session], capture_output=True, text=True)
+    return create_forward(forward.host, forward.remote_port, forward.local_port, mux=forward.mux).ok
+
+
+def registered_forwards(host_regex: Optional[str] = None) -> List[SupervisedForward]:
+    """Forwards vllmctl created, from the endpoint registry."""
+    forwards = []
+    for port, ep in sorted(get_registry().all().items()):
+        if not ep.host or not ep.remote_port:
+            continue
+        if host_regex and not re.search(host_regex, ep.host):
+            continue
+        if ep.extra.get("idle_proxy"):
+            # held by a scale-to-zero listener, not by a tunnel
+            continue
+        forwards.append(SupervisedForward(ep.host, ep.remote_port, port, mux=bool(ep.extra.get("mux"))))
+    return forwards
+
+
+def claim_forwards(forwards: Iterable[SupervisedForward], pid: Optional[int] = None) -> List[SupervisedForward]:
+    """Mark the forwards' registry entries as supervised by pid, so pruning keeps them while they are down."""
+    forwards = list(forwards)
+    pid = pid or os.getpid()
+    registry = get_registry()
+    endpoints = registry.all()
+    for forward in forwards:
+        ep = endpoints.get(forward.local_port)
+        if ep is not None and ep.extra.get(SUPERVISOR_KEY) != pid:
+            registry.update(forward.local_port, extra={SUPERVISOR_KEY: pid})
+    return forwards
+
+
+class ForwardSupervisor:
+    """
+    Watches forwards and reconnects the ones that stop answering.
+
+    With ``source`` the forwards are re-read from it before every pass, so forwards
+    made after the supervisor started are picked up and removed ones are dropped.
+    Every ``interval`` seconds each forward is health-checked through the tunnel. A
+    forward that fails is reconnected right away and then, while it stays down, after a
+    jittered exponential backoff (``base_delay`` doubling up to ``max_delay``), so a host
+    that is gone for a while is not hammered. Health check, reconnect, clock, sleep and
+    randomness are injectable for tests.
+    """
+
+    def __init__(
+        self,
+        forwards: Iterable[SupervisedForward] = (),
+        source: Optional[Callable[[], Iterable[SupervisedForward]]] = None,
+        health: Callable[[SupervisedForward], bool] = forward_is_healthy,
+        reconnect: Callable[[SupervisedForward], bool] = reconnect_forward,
+        interval: float = DEFAULT_INTERVAL,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None,
+    ):
+        self.source = source
+        self.health = health
+        self.reconnect = reconnect
+        self.interval = interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.forwards: Dict[int, ForwardStats] = {}
+        for forward in forwards:
+            self.add(forward)
+
+    def add(self, forward: SupervisedForward) -> None:
+        if forward.local_port not in self.forwards:
+            self.forwards[forward.local_port] = ForwardStats(forward)
+
+    def remove(self, local_port: int) -> None:
+        self.forwards.pop(local_port, None)
+
+    def refresh(self) -> List[str]:
+        """Sync the watched forwards with ``source``; returns human-readable events."""
+        if self.source is None:
+            return []
+        events = []
+        current = {f.local_port: f for f in self.source()}
+        for port in list(self.forwards):
+            if port not in current:
+                self.remove(port)
+                events.append(f"{port}: no longer registered")
+        for port, forward in sorted(current.items()):
+            st = self.forwards.get(port)
+            if st is None or st.forward != forward:
+                self.forwards[port] = ForwardStats(forward)
+                events.append(f"{port}: watching {forward.host}:{forward.remote_port}")
+        return events
+
+    def check_once(self) -> List[str]:
+        """One health-check pass; returns human-readable events."""
+        events = self.refresh()
+        for port, st in self.forwards.items():
+            now = self.clock()
+            healthy = self.health(st.forward)
+            if healthy:
+                if not st.up:
+                    if st.down_since is not None:
+                        st.recoveries += 1
+                        st.recover_times.append(now - st.down_since)
+                        events.append(f"{port}: recovered after {now - st.down_since:.1f}s")
+                    st.up, st.up_since, st.down_since, st.attempts = True, now, None, 0
+                continue
+            if st.up or st.down_since is None:
+                if st.up and st.up_since is not None:
+                    st.uptime += now - st.up_since
+                st.up, st.up_since, st.down_since = False, None, now
+                st.attempts, st.next_attempt = 0, now
+                events.append(f"{port}: down")
+            if now >= st.next_attempt:
+                st.attempts += 1
+                st.reconnects += 1
+                ok = self.reconnect(st.forward)
+                delay = backoff_delay(st.attempts, self.base_delay, self.max_delay, self.rng)
+                st.next_attempt = self.clock() + delay
+                events.append(f"{port}: reconnect #{st.attempts} {'started' if ok else 'failed'}, next try in {delay:.1f}s")
+        return events
+
+    def run(self, iterations: Optional[int] = None, on_pass: Optional[Callable[[List[str]], None]] = None) -> None:
+        done = 0
+        while iterations is None or done < iterations:
+            events = self.check_once()
+            if on_pass:
+                on_pass(events)
+            done += 1
+            if iterations is None or done < iterations:
+                self.sleep(self._next_wait())
+
+    def _next_wait(self) -> float:
+        # Wake up early for a pending reconnect rather than rounding backoff up to the interval.
+        now = self.clock()
+        wait = self.interval
+        for st in self.forwards.values():
+            if not st.up and st.down_since is not None:
+                wait = min(wait, max(0.05, st.next_attempt - now))
+        return wait
+
+    def stats(self) -> List[dict]:
+        now = self.clock()
+        return [
+            {
+                "local_port": port,
+                "host": st.forward.host,
+                "remote_port": st.forward.remote_port,
+                "up": st.up,
+                "uptime": st.total_uptime(now),
+                "reconnects": st.reconnects,
+                "recoveries": st.recoveries,
+                "last_time_to_recover": st.last_time_to_recover,
+                "mean_time_to_recover": st.mean_time_to_recover,
+            }
+            for port, st in sorted(self.forwards.items())
+        ]
@@ -0,0 +1,217 @@
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Set, Tuple
+
+from .forward import kill_tmux_session, port_accepts, release_local_port
+from .metrics import scrape_metrics
+from .proc_net import listening_ports_in
+from .registry import get_registry
+from .ssh_utils import run_ssh_command
+from .tunnels import get_tunnel_manager
+
+DEFAULT_DRAIN_TIMEOUT = 300.0
+DRAIN_POLL = 1.0
+# The old server counts as drained after this many polls in a row without requests.
+DRAIN_QUIET_POLLS = 2
+REMOTE_PORT_RANGE = (8000, 8999)
+# How long the local port may take to be released by a killed tunnel.
+PORT_RELEASE_TIMEOUT = 5.0
+SERVER_SESSION = re.compile(r"^vllmctl_server_(\d+)$")
+IN_FLIGHT_METRICS = ("vllm:num_requests_running", "vllm:num_requests_waiting")
+
+
+@dataclass
+class SwapPlan:
+    """The forwarded endpoint being swapped, as recorded in the endpoint registry."""
+    local_port: int
+    host: str
+    remote_port: int
+    tunnel_session: Optional[str] = None  # local tmux session of a dedicated tunnel
+    mux: bool = False
+    model: Optional[str] = None
+    remote_session: Optional[str] = None  # remote tmux session of the old server
+
+
+@dataclass
+class SwapResult:
+    ok: bool
+    new_remote_port: Optional[int] = None
+    cutover_gap: Optional[float] = None  # seconds the local port did not accept connections
+    drain_time: Optional[float] = None
+    drained: bool = False
+    old_stopped: bool = False
+    error: Optional[str] = None
+
+
+def plan_swap(local_port: int, registry=None) -> SwapPlan:
+    """Look up the forward behind local_port; ValueError if vllmctl does not know it."""
+    ep = (registry or get_registry()).get(local_port)
+    if ep is None or not ep.host or not ep.remote_port:
+        raise ValueError(f"Local port {local_port} is not a forward recorded by vllmctl")
+    return SwapPlan(
+        local_port=local_port,
+        host=ep.host,
+        remote_port=ep.remote_port,
+        tunnel_session=None if ep.extra.get("mux") else ep.tmux_session,
+        mux=bool(ep.extra.get("mux")),
+        model=ep.model,
+        remote_session=ep.extra.get("remote_session"),
+    )
+
+
+def remote_ports_and_sessions(host: str, timeout: float = 10) -> Optional[Tuple[Set[int], List[str]]]:
+    """Listening ports and tmux session names on host, in one ssh call."""
+    out = run_ssh_command(
+        host, "cat /proc/net/tcp /proc/net/tcp6 2>/dev/null; echo __sessions__; tmux ls -F '#S' 2>/dev/null; true",
+        timeout=timeout
+    )
+    if "__sessions__" not in out:
+        return None
+    tables, _, sessions = out.partition("__sessions__")
+    return listening_ports_in(tables), [s.strip() for s in sessions.splitlines() if s.strip()]
+
+
+def pick_remote_port(used: Set[int], sessions: List[str], start: int, port_range=REMOTE_PORT_RANGE) -> Optional[int]:
+    """First port after ``start`` (wrapping in port_range) neither listening nor named by a server session."""
+    taken = set(used)
+    for name in sessions:
+        m = SERVER_SESSION.match(name)
+        if m:
+            taken.add(int(m.group(1)))
+    lo, hi = port_range
+    span = hi - lo + 1
+    for i in range(1, span + 1):
+        port = lo + (start - lo + i) % span
+        if port not in taken:
+            return port
+    return None
+
+
+def cutover(plan: SwapPlan, new_remote_port: int, tunnels=None, clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep) -> float:
+    """
+    Repoint plan.local_port from the old remote port to the new one on the host's
+    shared ssh master and return how long the port was closed. A multiplexed forward
+    is cancelled and re-added (connections already open through it keep running);
+    a dedicated tunnel has to be killed first, which also cuts its open connections.
+    """
+    tunnels = tunnels or get_tunnel_manager()
+    if not tunnels.ensure_master(plan.host):
+        raise RuntimeError(f"could not start the shared ssh connection to {plan.host}")
+    start = clock()
+    if plan.mux:
+        tunnels.cancel_forward(plan.host, plan.local_port, plan.remote_port)
+    elif plan.tunnel_session:
+        kill_tmux_session(plan.tunnel_session)
+    deadline = start + PORT_RELEASE_TIMEOUT
+    while port_accepts(plan.local_port) and clock() < deadline:
+        sleep(0.01)
+    if not tunnels.add_forward(plan.host, plan.local_port, new_remote_port):
+        # put the old forward back rather than leave the port dead
+        tunnels.add_forward(plan.host, plan.local_port, plan.remote_port)
+        raise RuntimeError(f"could not forward {plan.local_port} to {plan.host}:{new_remote_port}")
+    return clock() - start
+
+
+def requests_in_flight(local_port: int, scrape=scrape_metrics) -> Optional[float]:
+    """Running plus queued requests of the server behind local_port; None if it does not answer."""
+    metrics = scrape(local_port)
+    if metrics is None:
+        return None
+    return sum(metrics.get(name, 0.0) for name in IN_FLIGHT_METRICS)
+
+
+def drain(local_port: int, timeout: float = DEFAULT_DRAIN_TIMEOUT, poll: Optional[float] = None, scrape=scrape_metrics,
+          clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+          on_poll: Optional[Callable[[Optional[float]], None]] = None) -> Tuple[bool, float]:
+    """
+    Wait until the server behind local_port has no requests left; (drained, seconds waited).
+    Only DRAIN_QUIET_POLLS zero readings in a row count as drained: a scrape that fails
+    (a loaded server can miss the timeout) says nothing, so polling goes on until timeout.
+    """
+    start = clock()
+    quiet = 0
+    while True:
+        pending = requests_in_flight(local_port, scrape)
+        if on_poll:
+            on_poll(pending)
+        if pending is None:
+            pass  # unknown: neither resets nor extends the quiet streak
+        elif pending:
+            quiet = 0
+        else:
+            quiet += 1
+        if quiet >= DRAIN_QUIET_POLLS:
+            return True, clock() - start
+        if clock() - start >= timeout:
+            return False, clock() - start
+        sleep(DRAIN_POLL if poll is None else poll)
+
+
+def stop_remote_session(host: str, session: str) -> bool:
+    out = run_ssh_command(host, f"tmux kill-session -t {session} && echo stopped", timeout=10)
+    return "stopped" in out
+
+
+def swap_model(
+    plan: SwapPlan,
+    launch: Callable[..., Optional[int]],
+    new_remote_port: int,
+    drain_timeout: float = DEFAULT_DRAIN_TIMEOUT,
+    keep_old: bool = False,
+    console=None,
+    tunnels=None,
+    scrape=scrape_metrics,
+) -> SwapResult:
+    """
+    Replace the server behind plan.local_port without closing the port for longer
+    than one forward change: ``launch(remote_port)`` starts the new server beside the
+    old one and returns its temporary local port once the API answers; the port is
+    cut over; the temporary port is turned around to the old server to watch it
+    drain; then the old server is stopped.
+    """
+    tunnels = tunnels or get_tunnel_manager()
+    temp_port = launch(new_remote_port)
+    if temp_port is None:
+        return SwapResult(ok=False, new_remote_port=new_remote_port, error="the new server did not start; the old one is untouched")
+    result = SwapResult(ok=True, new_remote_port=new_remote_port)
+    temp = get_registry().get(temp_port)
+    try:
+        result.cutover_gap = cutover(plan, new_remote_port, tunnels)
+    except RuntimeError as e:
+        return SwapResult(ok=False, new_remote_port=new_remote_port, error=f"{e}; the new server stays on local port {temp_port}")
+    get_registry().update(
+        plan.local_port, model=temp.model if temp else None,
+        extra={
+            "remote_session": (temp.extra.get("remote_session") if temp else None) or f"vllmctl_server_{new_remote_port}",
+            "serve": temp.extra.get("serve") if temp else None,
+        }
+    )
+    if console:
+        console.print(f"[green]Port {plan.local_port} now serves {plan.host}:{new_remote_port} (closed for {result.cutover_gap * 1000:.0f} ms)[/green]")
+
+    # reuse the temporary port to watch the old server drain
+    tunnels.cancel_forward(plan.host, temp_port, new_remote_port)
+    watching = tunnels.add_forward(plan.host, temp_port, plan.remote_port)
+    if watching:
+        def report(pending):
+            if console and pending:
+                console.print(f"  draining {plan.host}:{plan.remote_port}: {pending:.0f} requests in flight")
+        result.drained, result.drain_time = drain(temp_port, drain_timeout, scrape=scrape, on_poll=report)
+        tunnels.cancel_forward(plan.host, temp_port, plan.remote_port)
+    release_local_port(temp_port)
+
+    if keep_old:
+        return result
+    if not watching:
+        result.error = f"could not reach {plan.host}:{plan.remote_port} to watch it drain; left running"
+        return result
+    if not result.drained:
+        result.error = f"{plan.host}:{plan.remote_port} still had requests after {drain_timeout:.0f}s; left running"
+        return result
+    session = plan.remote_session or f"vllmctl_server_{plan.remote_port}"
+    result.old_stopped = stop_remote_session(plan.host, session)
+    if not result.old_stopped:
+        result.error = f"could not stop remote session {session} on {plan.host}"
+    return result
@@ -0,0 +1,128 @@
+import shlex
+from typing import List, Optional, Tuple
+
+from rich.console import Console
+
+from .instrument import run_command
+from .registry import get_registry
+from .ssh_pool import SSHControlPool, get_ssh_pool
+
+MUX_SESSION_PREFIX = "vllmctl_mux_"
+console = Console()
+
+
+def mux_session_name(host: str) -> str:
+    return f"{MUX_SESSION_PREFIX}{host}"
+
+
+class HostTunnelManager:
+    """
+    Port forwards carried by the ssh pool's master connection to each host.
+
+    Forwards are added to and removed from the pooled master (see ``SSHControlPool``)
+    with ``ssh -O forward`` / ``ssh -O cancel``, so forwarding to a host costs no
+    handshake beyond the one its remote commands already share. ControlPersist does not
+    count a listening forward as activity, so while a host has forwards a client attached
+    to the master runs in the local tmux session ``vllmctl_mux_<host>`` and keeps it
+    open; when that session is gone, so is the master with every forward on it.
+    Forwards are recorded in the endpoint registry, which is how discovery finds them:
+    the master's command line does not list them.
+    """
+
+    def __init__(self, pool: Optional[SSHControlPool] = None):
+        self.pool = pool or get_ssh_pool()
+
+    def control_path(self, host: str) -> str:
+        return self.pool.control_path(host)
+
+    def _control(self, host: str, *args: str, timeout: float = 10):
+        return run_command(
+            ["ssh", *self.pool.client_args(host), *args, host],
+            capture_output=True, text=True, timeout=timeout
+        )
+
+    def _has_holder(self, host: str) -> bool:
+        result = run_command(["tmux", "has-session", "-t", f"={mux_session_name(host)}"], capture_output=True, text=True)
+        return result.returncode == 0
+
+    def ensure_master(self, host: str) -> bool:
+        """Open (or reuse) host's pooled master and keep it open for forwards."""
+        if not self.pool.ssh_args(host):
+            console.print(f"[red]Could not open the shared ssh connection to {host}[/red]")
+            return False
+        if self._has_holder(host):
+            return True
+        holder = " ".join(shlex.quote(a) for a in ["ssh", "-T", *self.pool.client_args(host), host, "cat"])
+        try:
+            run_command(["tmux", "new-session", "-d", "-s", mux_session_name(host), holder], check=True)
+        except Exception as e:
+            # another vllmctl may have started it in the meantime
+            if self._has_holder(host):
+                return True
+            console.print(f"[red]Failed to hold the ssh connection to {host} open: {e}[/red]")
+            return False
+        return True
+
+    def add_forward(self, host: str, local_port: int, remote_port: int) -> bool:
+        if not self.ensure_master(host):
+            return False
+        spec = f"{local_port}:localhost:{remote_port}"
+        try:
+            result = self._control(host, "-O", "forward", "-L", spec)
+        except Exception as e:
+            console.print(f"[red]Failed to add forward {spec} on {host}: {e}[/red]")
+            return False
+        if result.returncode != 0:
+            console.print(f"[red]Failed to add forward {spec} on {host}: {result.stderr.strip()}[/red]")
+            return False
+        try:
+            get_registry().register(
+                local_port, host=host, remote_port=remote_port, tmux_session=mux_session_name(host),
+                mux=True, control_path=self.control_path(host)
+            )
+        except OSError as e:
+            console.print(f"[yellow]Warning: could not record forward in the endpoint registry: {e}[/yellow]")
+        return True
+
+    def cancel_forward(self, host: str, local_port: int, remote_port: int, forget: bool = True) -> bool:
+        """
+        Remove one forward; connections already open through it keep running. With
+        ``forget=False`` its registry entry stays, for a forward about to be made again.
+        """
+        ok = False
+        if self.pool.is_alive(host):
+            try:
+                ok = self._control(host, "-O", "cancel", "-L", f"{local_port}:localhost:{remote_port}").returncode == 0
+            except Exception:
+                ok = False
+        if not forget:
+            return ok
+        try:
+            get_registry().remove([local_port])
+        except OSError:
+            pass
+        return ok
+
+    def forwards(self, host: Optional[str] = None) -> List[Tuple[str, int, int]]:
+        """(host, local_port, remote_port) of the registered multiplexed forwards."""
+        return [
+            (ep.host, ep.local_port, ep.remote_port)
+            for ep in get_registry().all().values()
+            if ep.extra.get("mux") and (host is None or ep.host == host)
+        ]
+
+    def close(self, host: str) -> None:
+        """Cancel all of host's forwards and stop holding its master open (it then expires like any other)."""
+        for _, lport, rport in self.forwards(host):
+            self.cancel_forward(host, lport, rport)
+        run_command(["tmux", "kill-session", "-t", mux_session_name(host)], capture_output=True, text=True)
+
+
+_default_manager: Optional[HostTunnelManager] = None
+
+
+def get_tunnel_manager() -> HostTunnelManager:
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = HostTunnelManager()
+    return _default_manager
@@ -3,12 +3,23 @@ import re
 import requests
 import psutil
 import sys
+from .proc_net import read_listening_sockets, proc_net_available
+from .port_scan import scan_vllm_ports
+from .http_pool import get_http_pool
+from .instrument import run_command
+from .registry import get_registry
 
 TMUX_PREFIX = "vllmctl_"
 
 def get_listening_ports():
+    """Sorted TCP ports listening on a loopback or wildcard address."""
+    if proc_net_available():
+        return sorted({s.port for s in read_listening_sockets() if s.is_local})
+    return get_listening_ports_ss()
+
+def get_listening_ports_ss():
     try:
-        result = subprocess.run([
+        result = run_command([
             "ss", "-tulpen"
         ], capture_output=True, text=True)
         if result.returncode != 0:
@@ -29,39 +40,170 @@ def get_listening_ports():
 
 def ping_vllm(port):
     try:
-        r = requests.get(f"http://127.0.0.1:{port}/v1/models", timeout=0.2)
+        r = get_http_pool().get(port, "/v1/models", timeout=0.2)
         if r.status_code == 200:
             return r.json()
     except Exception:
         pass
     return None
 
-def get_ssh_forwardings():
+# ssh options that consume an argument (see ssh(1) synopsis)
+SSH_OPTS_WITH_ARG = set("BbcDEeFIiJLlmOoPpQRSWw")
+LOOPBACK_HOSTS = {"localhost", "127.0.0.1", "::1", "[::1]"}
+
+def _split_forward_spec(spec):
+    """Split '[bind:]port:host:hostport' on colons that are not inside [IPv6] brackets."""
+    parts, cur, depth = [], "", 0
+    for ch in spec:
+        if ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+        if ch in ":/" and depth == 0:
+            parts.append(cur)
+            cur = ""
+        else:
+            cur += ch
+    parts.append(cur)
+    return parts
+
+def parse_forward_spec(spec):
+    """Returns (bind_address, local_port, target_host, target_port) or None for socket forwards."""
+    parts = _split_forward_spec(spec.strip())
+    if len(parts) == 3:
+        parts = [None] + parts
+    if len(parts) != 4:
+        return None
+    bind, lport, target, rport = parts
+    if not lport.isdigit() or not rport.isdigit():
+        return None
+    return (bind or None, int(lport), target.strip("[]") if target.startswith("[") else target, int(rport))
+
+def parse_ssh_argv(argv):
+    """
+    Parse an ssh command line. Returns a dict with 'host', 'forwards' (parsed -L specs and
+    LocalForward options), 'control_cmd' (-O argument), 'control_path' and 'master' (-M).
+    """
+    parsed = {'host': None, 'forwards': [], 'control_cmd': None, 'control_path': None, 'master': False}
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--":
+            if i + 1 < len(argv):
+                parsed['host'] = argv[i + 1]
+            break
+        if not arg.startswith("-") or len(arg) < 2:
+            parsed['host'] = arg
+            break
+        j = 1
+        while j < len(arg):
+            opt = arg[j]
+            if opt in SSH_OPTS_WITH_ARG:
+                value = arg[j + 1:]
+                if not value:
+                    i += 1
+                    value = argv[i] if i < len(argv) else ""
+                _apply_ssh_option(parsed, opt, value)
+                break
+            if opt == "M":
+                parsed['master'] = True
+            j += 1
+        i += 1
+    return parsed
+
+def _apply_ssh_option(parsed, opt, value):
+    if opt == "L":
+        spec = parse_forward_spec(value)
+        if spec:
+            parsed['forwards'].append(spec)
+    elif opt == "O":
+        parsed['control_cmd'] = value
+    elif opt == "S":
+        parsed['control_path'] = value
+    elif opt == "o":
+        key, _, val = value.replace("=", " ", 1).partition(" ")
+        key = key.lower()
+        val = val.strip()
+        if key == "localforward":
+            # LocalForward [bind:]port host:hostport
+            lspec, _, target = val.partition(" ")
+            spec = parse_forward_spec(f"{lspec}:{target.strip()}")
+            if spec:
+                parsed['forwards'].append(spec)
+        elif key == "controlpath":
+            parsed['control_path'] = val
+        elif key == "controlmaster" and val.lower() in ("yes", "auto", "autoask", "ask"):
+            parsed['master'] = True
+
+# Parsed ssh command lines keyed by (pid, create_time): a pid is only re-parsed when it
+# belongs to a new process, so watch loops pay only for processes that just appeared.
+_ssh_parse_cache = {}
+
+def registered_mux_forwards():
+    """
+    Returns {control_path: [(local_port, host, remote_port), ...]} for forwards added to a
+    shared per-host master with 'ssh -O forward'. They are not on any command line, so the
+    endpoint registry is the only record of them.
+    """
     try:
-        result = subprocess.run(["ps", "aux"], capture_output=True, text=True)
-        if result.returncode != 0:
-            raise FileNotFoundError
-        forwards = {}
-        for line in result.stdout.splitlines():
-            if "ssh -N -L" in line:
-                m = re.search(r"ssh -N -L (\d+):localhost:(\d+) ([^ ]+)", line)
-                if m:
-                    local_port = int(m.group(1))
-                    remote_port = int(m.group(2))
-                    host = m.group(3)
-                    pid = int(line.split()[1])
-                    forwards[local_port] = (host, remote_port, pid)
-        return forwards
-    except FileNotFoundError:
-        print("[vllmctl] Error: 'ps' command not found. Please install 'procps' (Linux) or ensure 'ps' is available in your PATH.")
+        endpoints = get_registry().all()
+    except Exception:
         return {}
+    found = {}
+    for ep in endpoints.values():
+        path = ep.extra.get('control_path')
+        if ep.extra.get('mux') and path and ep.host and ep.remote_port:
+            found.setdefault(path, []).append((ep.local_port, ep.host, ep.remote_port))
+    return found
+
+def get_ssh_forwardings():
+    """
+    Returns {local_port: (host, remote_port, pid)} for local ssh port forwards to a
+    loopback target on the remote side, read from the process table. Handles several
+    -L specs per process, bind addresses and -o LocalForward. An 'ssh -O forward' client
+    exits once the master has taken the forward, so those forwards come from the endpoint
+    registry and are attributed to the master that owns the control path.
+    """
+    seen = set()
+    parsed_procs = []
+    try:
+        procs = list(psutil.process_iter(['pid', 'name', 'create_time']))
     except Exception as e:
-        print(f"[vllmctl] Error running 'ps': {e}")
+        print(f"[vllmctl] Error reading the process table: {e}")
         return {}
+    for proc in procs:
+        info = proc.info
+        if info.get('name') != "ssh":
+            continue
+        key = (info['pid'], info.get('create_time'))
+        seen.add(key)
+        if key not in _ssh_parse_cache:
+            try:
+                _ssh_parse_cache[key] = parse_ssh_argv(proc.cmdline())
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                _ssh_parse_cache[key] = None
+        if _ssh_parse_cache[key]:
+            parsed_procs.append((info['pid'], _ssh_parse_cache[key]))
+    for key in list(_ssh_parse_cache):
+        if key not in seen:
+            del _ssh_parse_cache[key]
+    masters = {p['control_path']: pid for pid, p in parsed_procs if p['master'] and p['control_path']}
+    forwards = {}
+    for pid, parsed in parsed_procs:
+        if parsed['control_cmd'] is not None:
+            continue
+        for bind, lport, target, rport in parsed['forwards']:
+            if target in LOOPBACK_HOSTS and parsed['host']:
+                forwards[lport] = (parsed['host'], rport, pid)
+    for path, entries in registered_mux_forwards().items():
+        if path in masters:
+            for lport, host, rport in entries:
+                forwards.setdefault(lport, (host, rport, masters[path]))
+    return forwards
 
 def get_tmux_sessions():
     try:
-        result = subprocess.run(["tmux", "ls"], capture_output=True, text=True)
+        result = run_command(["tmux", "ls"], capture_output=True, text=True)
         if result.returncode != 0:
             raise FileNotFoundError
         sessions = []
@@ -76,13 +218,120 @@ def get_tmux_sessions():
         print(f"[vllmctl] Error running 'tmux ls': {e}")
         return []
 
-def list_local_models():
-    ports = get_listening_ports()
-    ssh_forwards = get_ssh_forwardings()
-    tmux_sessions = get_tmux_sessions()
+def get_tmux_panes():
+    """
+    Returns {session_name: [pane_pid, ...]} for every local tmux session, using a single
+    'tmux list-panes -a' call (sessions always have at least one pane).
+    """
+    try:
+        result = run_command(
+            ["tmux", "list-panes", "-a", "-F", "#{session_name}\t#{pane_pid}"],
+            capture_output=True, text=True
+        )
+    except FileNotFoundError:
+        print("[vllmctl] Error: 'tmux' command not found. Please install 'tmux'. Example: sudo apt install tmux or brew install tmux")
+        return {}
+    except Exception as e:
+        print(f"[vllmctl] Error running 'tmux list-panes': {e}")
+        return {}
+    panes = {}
+    if result.returncode != 0:
+        # "no server running" simply means there are no sessions
+        return panes
+    for line in result.stdout.splitlines():
+        name, _, pid = line.rpartition("\t")
+        if not name:
+            continue
+        panes.setdefault(name, [])
+        if pid.strip().isdigit():
+            panes[name].append(int(pid))
+    return panes
+
+class ProcessTable:
+    """One psutil.process_iter pass, indexed by pid and by parent pid."""
+
+    def __init__(self, procs):
+        self.by_pid = {}
+        self.children = {}
+        for info in procs:
+            self.by_pid[info['pid']] = info
+            self.children.setdefault(info.get('ppid'), []).append(info)
+
+    def descendants(self, pid):
+        found = []
+        stack = [pid]
+        seen = {pid}
+        while stack:
+            for child in self.children.get(stack.pop(), []):
+                if child['pid'] not in seen:
+                    seen.add(child['pid'])
+                    found.append(child)
+                    stack.append(child['pid'])
+        return found
+
+def get_process_table():
+    procs = []
+    for proc in psutil.process_iter(['pid', 'ppid', 'name', 'cmdline', 'create_time']):
+        procs.append(proc.info)
+    return ProcessTable(procs)
+
+def get_tmux_ssh_forwards(prefix=TMUX_PREFIX, panes=None, procs=None):
+    """
+    Returns {session: [(local_port, remote_port, ssh_cmdline), ...]} for every tmux session
+    whose name starts with prefix, found from one 'tmux list-panes -a' call joined with one
+    process-table snapshot (cost does not grow with the number of sessions).
+    """
+    if panes is None:
+        panes = get_tmux_panes()
+    if procs is None:
+        procs = get_process_table()
+    mux = registered_mux_forwards()
+    forwards = {}
+    for session, pane_pids in panes.items():
+        if not session.startswith(prefix):
+            continue
+        found = forwards.setdefault(session, [])
+        for pane_pid in pane_pids:
+            candidates = procs.descendants(pane_pid)
+            if pane_pid in procs.by_pid:
+                candidates.insert(0, procs.by_pid[pane_pid])
+            for info in candidates:
+                if info.get('name') != "ssh" or not info.get('cmdline'):
+                    continue
+                cmdline = " ".join(info['cmdline'])
+                parsed = parse_ssh_argv(info['cmdline'])
+                for bind, lport, target, rport in parsed['forwards']:
+                    if target in LOOPBACK_HOSTS:
+                        found.append((lport, rport, cmdline))
+                if parsed['control_path'] and parsed['control_cmd'] is None:
+                    # the client holding a shared master open carries that master's forwards
+                    for lport, host, rport in mux.get(parsed['control_path'], []):
+                        found.append((lport, rport, cmdline))
+    return forwards
+
+def scan_local_vllm(ports=None):
+    """Probe /v1/models on all (or the given) local ports concurrently; returns {port: payload}."""
+    if ports is None:
+        ports = get_listening_ports()
+    return scan_vllm_ports(ports)
+
+def list_local_models(probes=None, snapshot=None):
+    """
+    Describe local vllm endpoints. Pass a SystemSnapshot (or just ``probes``,
+    {port: /v1/models payload}) to reuse state the caller already collected.
+    """
+    if snapshot is not None:
+        probes = snapshot.models
+        ssh_forwards = snapshot.ssh_forwards
+        tmux_sessions = snapshot.tmux_sessions
+    else:
+        if probes is None:
+            probes = scan_local_vllm()
+        ssh_forwards = get_ssh_forwardings()
+        tmux_sessions = get_tmux_sessions()
     models = {}
-    for port in ports:
-        info = ping_vllm(port)
+    for port in sorted(probes):
+        info = probes[port]
         if info:
             entry = {'model': info, 'port': port}
             model_name = info['data'][0]['id'] if info.get('data') and info['data'] else 'unknown'
@@ -92,8 +341,11 @@ def list_local_models():
                 entry['server'] = host
                 entry['remote_port'] = rport
                 entry['ssh_pid'] = pid
-                tmux_name = f"{TMUX_PREFIX}{host}_{rport}"
-                entry['tmux'] = tmux_name if tmux_name in tmux_sessions else None
+                entry['tmux'] = None
+                for tmux_name in (f"{TMUX_PREFIX}{host}_{rport}_{port}", f"{TMUX_PREFIX}{host}_{rport}", f"{TMUX_PREFIX}mux_{host}"):
+                    if tmux_name in tmux_sessions:
+                        entry['tmux'] = tmux_name
+                        break
             else:
                 entry['forwarded'] = False
                 entry['server'] = None